@@ -107,7 +107,10 @@ export default function AppPage() {
     estimated_time_seconds: number;
     estimated_time_formatted: string;
     files: any[];
+    upload_token?: string | null;
   } | null>(null)
+  // Files the analysis staged on the server under upload_token
+  const [stagedFiles, setStagedFiles] = useState<File[]>([])
 
   // Refresh credits after upload/process
   const handleRefreshCredits = async () => {
@@ -126,10 +129,85 @@ export default function AppPage() {
     }
   }, [isAuthenticated, email, router])
 
-  // Poll for progress updates every 2 seconds while processing
+  // Stream progress updates (SSE) while processing, falling back to polling every 2 seconds
   useEffect(() => {
     if (!currentJobId || processingProgress.status === 'completed') return
 
+    let intervalId: ReturnType<typeof setInterval> | null = null
+    let eventSource: EventSource | null = null
+    let finished = false
+
+    const applyProgress = (data: { current: number; total: number; percentage: number; status: string }) => {
+      setProcessingProgress({
+        current: data.current,
+        total: data.total,
+        percentage: data.percentage,
+        status: data.status
+      })
+
+      // Update main progress bar
+      setProgress(data.percentage)
+
+      // Update processed files for game
+      setProcessedFiles(data.current)
+    }
+
+    const handleCompleted = async () => {
+      if (finished) return
+      finished = true
+      if (intervalId) clearInterval(intervalId)
+      eventSource?.close()
+
+      // Check final status
+      const statusResponse = await fetch(`/api/v1/status/${currentJobId}`)
+      const statusData = await statusResponse.json()
+
+      // Map backend response to expected format 
+      console.log('Raw Status Data:', statusData);
+
+      const mappedStatusData = {
+        ...statusData,
+        successful_files: statusData.successful_files?.map((file: any) => {
+          console.log('Processing file:', file);
+
+          // Si el archivo ya tiene el formato correcto, devolverlo como está
+          if (typeof file === 'object' && file.success !== undefined) {
+            console.log('File already in correct format:', file);
+            return file;
+          }
+
+          // Mapear la estructura de acuerdo al tipo de dato
+          const fileObj = typeof file === 'string' ? { processed: file } : file;
+          console.log('File object after initial mapping:', fileObj);
+
+          const mappedFile = {
+            success: true,
+            original: fileObj.original || fileObj.processed || fileObj.filename || 'unknown.jpg',
+            processed: fileObj.processed || fileObj.filename || 'unknown.jpg',
+            path: fileObj.path || `${fileObj.processed || fileObj.filename || 'unknown.jpg'}`,
+            shadow_applied: fileObj.shadow_applied || false,
+            shadow_type: fileObj.shadow_type || null
+          };
+
+          console.log('Mapped file:', mappedFile);
+          return mappedFile;
+        }) || []
+      };
+
+      console.log('Final Mapped Status Data:', mappedStatusData);
+
+      if (!Array.isArray(mappedStatusData.successful_files)) {
+        console.error('successful_files is not an array:', mappedStatusData.successful_files);
+        mappedStatusData.successful_files = [];
+      }
+      setJobStatus(mappedStatusData);
+      setIsDownloadReady(true)
+      setIsProcessing(false)
+      setIsDownloadReady(true)
+      setIsProcessing(false)
+      // Game will auto-transition to 'completed' state, don't hide it
+    }
+
     const pollProgress = async () => {
       try {
         const response = await fetch(`/api/v1/progress/${currentJobId}`, {
@@ -142,80 +220,56 @@ export default function AppPage() {
         }
 
         const data = await response.json()
-
-        setProcessingProgress({
-          current: data.current,
-          total: data.total,
-          percentage: data.percentage,
-          status: data.status
-        })
-
-        // Update main progress bar
-        setProgress(data.percentage)
-
-        // Update processed files for game
-        setProcessedFiles(data.current)
+        applyProgress(data)
 
         // Stop polling if completed
         if (data.status === 'completed') {
-          clearInterval(intervalId)
-          // Check final status
-          const statusResponse = await fetch(`/api/v1/status/${currentJobId}`)
-          const statusData = await statusResponse.json()
-
-          // Map backend response to expected format 
-          console.log('Raw Status Data:', statusData);
-
-          const mappedStatusData = {
-            ...statusData,
-            successful_files: statusData.successful_files?.map((file: any) => {
-              console.log('Processing file:', file);
-
-              // Si el archivo ya tiene el formato correcto, devolverlo como está
-              if (typeof file === 'object' && file.success !== undefined) {
-                console.log('File already in correct format:', file);
-                return file;
-              }
-
-              // Mapear la estructura de acuerdo al tipo de dato
-              const fileObj = typeof file === 'string' ? { processed: file } : file;
-              console.log('File object after initial mapping:', fileObj);
-
-              const mappedFile = {
-                success: true,
-                original: fileObj.original || fileObj.processed || fileObj.filename || 'unknown.jpg',
-                processed: fileObj.processed || fileObj.filename || 'unknown.jpg',
-                path: fileObj.path || `${fileObj.processed || fileObj.filename || 'unknown.jpg'}`,
-                shadow_applied: fileObj.shadow_applied || false,
-                shadow_type: fileObj.shadow_type || null
-              };
-
-              console.log('Mapped file:', mappedFile);
-              return mappedFile;
-            }) || []
-          };
-
-          console.log('Final Mapped Status Data:', mappedStatusData);
-
-          if (!Array.isArray(mappedStatusData.successful_files)) {
-            console.error('successful_files is not an array:', mappedStatusData.successful_files);
-            mappedStatusData.successful_files = [];
-          }
-          setJobStatus(mappedStatusData);
-          setIsDownloadReady(true)
-          setIsProcessing(false)
-          // Game will auto-transition to 'completed' state, don't hide it
+          await handleCompleted()
         }
       } catch (error) {
         console.error('Progress poll error:', error)
       }
     }
 
-    // Poll immediately, then every 2 seconds
-    pollProgress()
-    const intervalId = setInterval(pollProgress, 2000)
+    const startPolling = () => {
+      if (intervalId || finished) return
+      // Poll immediately, then every 2 seconds
+      pollProgress()
+      intervalId = setInterval(pollProgress, 2000)
+    }
+
+    if (typeof EventSource !== 'undefined') {
+      // Server pushes only changed fields, so keep the merged state locally
+      let streamed = { current: 0, total: 0, percentage: 0, status: 'starting' }
+      eventSource = new EventSource(`/api/v1/progress/${currentJobId}/stream`)
+
+      eventSource.addEventListener('progress', (event) => {
+        streamed = { ...streamed, ...JSON.parse((event as MessageEvent).data) }
+        applyProgress(streamed)
+        if (streamed.status === 'completed') {
+          handleCompleted()
+        }
+      })
+
+      eventSource.addEventListener('end', () => {
+        // Job reached a terminal status; stop the browser from reconnecting
+        eventSource?.close()
+      })
+
+      eventSource.onerror = () => {
+        // Stream unavailable (proxy, old backend) - fall back to polling
+        console.warn('Progress stream error, falling back to polling')
+        eventSource?.close()
+        startPolling()
+      }
+    } else {
+      startPolling()
+    }
 
-    return () => clearInterval(intervalId)
+    return () => {
+      if (intervalId) clearInterval(intervalId)
+      eventSource?.close()
+    }
   }, [currentJobId, processingProgress.status])
 
   // Helper function to check if file is ZIP
@@ -262,6 +316,7 @@ export default function AppPage() {
         const analysis = await response.json()
         console.log('📊 Analysis result:', analysis)
         setUploadAnalysis(analysis)
+        setStagedFiles(analysis.upload_token ? validFiles : [])
 
         // Show success message with image count
         if (analysis.total_images > 0) {
@@ -346,6 +401,7 @@ export default function AppPage() {
         const analysis = await response.json()
         console.log('📊 Analysis result:', analysis)
         setUploadAnalysis(analysis)
+        setStagedFiles(analysis.upload_token ? validFiles : [])
 
         // Show success message with image count
         if (analysis.total_images > 0) {
@@ -382,6 +438,7 @@ export default function AppPage() {
 
     // 2. Limpiar análisis de upload
     setUploadAnalysis(null)
+    setStagedFiles([])
 
     // 3. Resetear job ID y status
     setCurrentJobId(null)
@@ -522,6 +579,14 @@ export default function AppPage() {
       console.log('🌐 API Base URL:', process.env.NEXT_PUBLIC_API_URL || '')
       console.log('📤 Calling ImageProcessingApi.uploadAndProcess...')
 
+      // The staged upload can only stand in for the files if it covers all of them
+      const uploadToken =
+        uploadAnalysis?.upload_token &&
+        stagedFiles.length === uploadedFiles.length &&
+        stagedFiles.every((file, index) => file === uploadedFiles[index])
+          ? uploadAnalysis.upload_token
+          : undefined
+
       // Step 1: Upload files and start processing with progress tracking
       const result = await ImageProcessingApi.uploadAndProcess(
         uploadedFiles,
@@ -546,7 +611,8 @@ export default function AppPage() {
         (progress) => {
           console.log(`📊 Upload progress: ${progress}%`)
           setUploadProgress(progress)
-        }
+        },
+        uploadToken
       )
 
       console.log('✅ Upload result:', result)
@@ -243,6 +243,7 @@ class BrushActionRequest(BaseModel):
     action: str = Field(..., description="Action type: 'erase' or 'restore'")
     coordinates: List[Coordinate] = Field(..., description="Brush stroke coordinates")
     brush_size: int = Field(default=10, ge=1, le=100, description="Brush size in pixels")
+    inline_preview: bool = Field(default=False, description="Return the updated preview in the response")
 
     @validator('action')
     def validate_action(cls, v):
@@ -253,15 +254,18 @@ class BrushActionRequest(BaseModel):
 class BrushActionResponse(BaseModel):
     success: bool = Field(..., description="Whether action was successful")
     preview_url: str = Field(..., description="Updated preview URL")
+    preview_data: Optional[str] = Field(None, description="Updated preview as a data URL (inline_preview)")
     can_undo: bool = Field(..., description="Whether undo is available")
     can_redo: bool = Field(..., description="Whether redo is available")
 
 class EditorUndoRequest(BaseModel):
     session_id: str = Field(..., description="Editor session ID")
+    inline_preview: bool = Field(default=False, description="Return the updated preview in the response")
 
 class EditorUndoResponse(BaseModel):
     success: bool = Field(..., description="Whether operation was successful")
     preview_url: str = Field(..., description="Updated preview URL")
+    preview_data: Optional[str] = Field(None, description="Updated preview as a data URL (inline_preview)")
     can_undo: bool = Field(..., description="Whether undo is available")
     can_redo: bool = Field(..., description="Whether redo is available")
 
@@ -10,6 +10,8 @@ from .image_processor import ImageProcessor
 from .pipelines import PipelineFactory
 from ..database_sqlite.sqlite_client import sqlite_client
 from ..services.simple_processing import remove_background_simple, process_image_simple
+from ..services.job_manifest import JobManifest, describe_image
+from ..services.object_storage import publish_job_results
 
 logger = logging.getLogger(__name__)
 
@@ -77,11 +79,11 @@ class BatchProcessor:
                 sqlite_client.update_job(job_id, {"status": "failed", "error_message": "Upload directory not found"})
                 return False
 
-            # Get all image files
-            image_files = [
-                f for f in upload_dir.iterdir()
-                if f.is_file() and f.suffix.lower() in self.processor.supported_formats
-            ]
+            # Get all image files from the job manifest written at upload
+            image_files = JobManifest.load_or_scan(
+                upload_dir, self.processor.supported_formats
+            ).paths(self.processor.supported_formats)
+            processed_manifest = JobManifest(processed_dir)
 
             if not image_files:
                 logger.error(f"No valid image files found in {upload_dir}")
@@ -140,6 +142,7 @@ class BatchProcessor:
 
                         if success:
                             processed_count += 1
+                            processed_manifest.add(describe_image(output_path, source=image_file.name))
                             logger.debug(f"Processed {image_file.name} -> {output_filename}")
                         else:
                             failed_count += 1
@@ -162,6 +165,11 @@ class BatchProcessor:
                 # Brief pause between batches for system stability
                 await asyncio.sleep(0.5)
 
+            processed_manifest.save()
+
+            # Publish results so any API node (or the bucket itself) can serve them
+            await asyncio.to_thread(publish_job_results, job_id, processed_manifest.directory)
+
             # Final status update
             if failed_count == 0:
                 sqlite_client.update_job(job_id, {"status": "completed"})
@@ -8,10 +8,105 @@ import numpy as np
 from PIL import Image, ImageFilter, ImageEnhance, ImageDraw
 import logging
 from pathlib import Path
+import time
+from functools import lru_cache
 from typing import Dict, Tuple, Optional
 
 logger = logging.getLogger(__name__)
 
+def reflection_fade(height: int, opacity: float, fade_start: float = 0.0) -> np.ndarray:
+    """
+    Alpha por fila del reflejo: `opacity` hasta `fade_start` (fraccion de
+    la altura) y luego un degradado lineal hasta 0 en el borde inferior
+    """
+    progress = np.arange(height) / height
+    if fade_start < 1.0:
+        fade = np.where(progress < fade_start, 1.0, 1.0 - (progress - fade_start) / (1.0 - fade_start))
+    else:
+        fade = np.ones(height)
+    return np.clip(255 * opacity * fade, 0, 255).astype(np.uint8)
+
+@lru_cache(maxsize=256)
+def shadow_mask_lut(intensity: float, threshold: int = 10) -> Tuple[int, ...]:
+    """
+    Tabla de 256 entradas para point(): alpha * intensidad por encima del
+    umbral, 0 por debajo. Se construye una vez por (intensidad, umbral).
+    """
+    return tuple(int(x * intensity) if x > threshold else 0 for x in range(256))
+
+
+SHADOW_BLUR_SIGMA_LOWRES = 4.0  # Blur sigma (px) kept at the reduced resolution
+
+def blur_mask(mask: np.ndarray, sigma: float) -> np.ndarray:
+    """
+    Desenfoque gaussiano de una mascara float32. Con sigma grande se calcula
+    a resolucion reducida (el resultado es suave, no se pierde detalle) y se
+    vuelve a escalar con interpolacion bilineal. Los bordes se extienden
+    (como ImageFilter.GaussianBlur).
+    """
+    if sigma <= 0:
+        return mask
+    factor = int(sigma // SHADOW_BLUR_SIGMA_LOWRES)
+    if factor < 2:
+        return cv2.GaussianBlur(mask, (0, 0), sigma, borderType=cv2.BORDER_REPLICATE)
+
+    height, width = mask.shape
+    # Dimensiones multiplo del factor para que el reescalado no desplace la sombra
+    padded_h = -(-height // factor) * factor
+    padded_w = -(-width // factor) * factor
+    if (padded_h, padded_w) != (height, width):
+        mask = np.pad(mask, ((0, padded_h - height), (0, padded_w - width)), mode='edge')
+
+    small = cv2.resize(mask, (padded_w // factor, padded_h // factor), interpolation=cv2.INTER_AREA)
+    small = cv2.GaussianBlur(small, (0, 0), sigma / factor, borderType=cv2.BORDER_REPLICATE)
+    return cv2.resize(small, (padded_w, padded_h), interpolation=cv2.INTER_LINEAR)[:height, :width]
+
+def composite_shadow(img: Image.Image, intensity: float, offset: Tuple[int, int], blur_radius: float,
+                     shade: int, margin: int, threshold: int = 10,
+                     background: Optional[int] = 255) -> Image.Image:
+    """
+    Sombra + producto con mascaras de un solo canal
+
+    La sombra es la mascara alpha del producto (un canal) desenfocada con
+    blur_mask(); no se crean capas RGBA de sombra a resolucion completa.
+    Reproduce el render original: el desenfoque se limita al rectangulo del
+    producto y el gris se desenfoca junto con el negro transparente que lo
+    rodea, asi que se oscurece hacia el borde de la sombra. Con `background`
+    (gris 0-255) devuelve RGB sobre ese fondo; con None, RGBA sobre
+    transparente. El producto se pega encima.
+
+    Args:
+        offset: Desplazamiento (x, y) de la sombra respecto al producto
+        blur_radius: Sigma del desenfoque (igual que ImageFilter.GaussianBlur)
+        shade: Gris de la sombra (0-255)
+        margin: Margen alrededor del producto en el canvas resultante
+        threshold: Alpha minimo del producto que proyecta sombra
+    """
+    if img.mode != 'RGBA':
+        img = img.convert('RGBA')
+    canvas_size = (img.width + margin * 2, img.height + margin * 2)
+    position = (margin + offset[0], margin + offset[1])
+
+    # Alpha de la sombra (alpha * intensidad) y su gris, ambos desenfocados
+    strength = np.asarray(img.getchannel('A').point(shadow_mask_lut(intensity, threshold)))
+    alpha = blur_mask(strength.astype(np.float32), blur_radius)
+    tone = blur_mask(np.where(strength > 0, np.float32(shade), np.float32(0)), blur_radius)
+
+    if background is not None:
+        # Fondo mezclado con el gris de la sombra segun su alpha
+        region = background + (tone - background) * (alpha / 255)
+        canvas = Image.new('RGB', canvas_size, (background,) * 3)
+        canvas.paste(Image.fromarray(np.clip(region + 0.5, 0, 255).astype(np.uint8)).convert('RGB'), position)
+    else:
+        canvas = Image.new('RGBA', canvas_size, (0, 0, 0, 0))
+        tone_channel = Image.fromarray(np.clip(tone + 0.5, 0, 255).astype(np.uint8))
+        alpha_channel = Image.fromarray(np.clip(alpha + 0.5, 0, 255).astype(np.uint8))
+        shadow = Image.merge('RGBA', (tone_channel, tone_channel, tone_channel, alpha_channel))
+        canvas.paste(shadow, position, shadow)
+
+    canvas.paste(img, (margin, margin), img)
+    return canvas
+
 class ShadowEffects:
     def __init__(self):
         self.shadow_types = {
@@ -32,6 +127,11 @@ class ShadowEffects:
             img = Image.open(image_path).convert('RGBA')
             logger.info(f"[SHADOW] Imagen cargada: {img.size[0]}x{img.size[1]} pixels")
 
+            # 'auto': decidir con la máscara alpha ya cargada
+            if shadow_type == 'auto':
+                shadow_type, reason = detect_shadow_type(img.getchannel('A'))
+                logger.info(f"[AUTO] Sombra recomendada: '{shadow_type}' ({reason})")
+
             # Aplicar sombra según tipo
             if shadow_type in self.shadow_types:
                 result_img = self.shadow_types[shadow_type](img, **shadow_params)
@@ -66,48 +166,12 @@ class ShadowEffects:
 
         logger.info(f"[DROP SHADOW] Creando drop shadow - intensidad: {intensity}, offset: ({offset_x}, {offset_y}), blur: {blur_radius}")
 
-        # Crear canvas más grande para la sombra
+        # Canvas más grande para la sombra; sombra gris claro sobre fondo BLANCO
         shadow_margin = max(abs(offset_x), abs(offset_y)) + blur_radius + 30
-        new_width = img.width + shadow_margin * 2
-        new_height = img.height + shadow_margin * 2
-
-        # Canvas con fondo BLANCO para que la sombra sea visible
-        canvas = Image.new('RGB', (new_width, new_height), (255, 255, 255))
-
-        # Crear máscara de sombra desde el canal alpha
-        if img.mode == 'RGBA':
-            shadow_mask = img.split()[-1]  # Canal alpha
-        else:
-            # Si no tiene alpha, crear máscara desde la imagen
-            shadow_mask = img.convert('L')
-
-        # Crear sombra (imagen negra con la forma del producto)
-        shadow = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        shadow_alpha = shadow_mask.point(lambda x: int(x * intensity) if x > 5 else 0)  # USAR INTENSIDAD VARIABLE
-        shadow.paste((150, 150, 150, 255), mask=shadow_alpha)  # GRIS CLARO SUTIL
-
-        # Aplicar blur a la sombra
-        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=blur_radius))
-
-        # PRIMERO: Pegar la sombra ROJA sobre el fondo blanco
-        shadow_x = shadow_margin + offset_x
-        shadow_y = shadow_margin + offset_y
-
-        # Convertir sombra RGBA a RGB para el canvas RGB
-        shadow_rgb = Image.new('RGB', shadow.size, (255, 255, 255))
-        if shadow.mode == 'RGBA':
-            shadow_rgb.paste(shadow, mask=shadow.split()[-1])
-        else:
-            shadow_rgb = shadow
-
-        canvas.paste(shadow_rgb, (shadow_x, shadow_y))
-        logger.info("[APPLY] Sombra pegada en canvas blanco")
-
-        # SEGUNDO: Pegar producto original ENCIMA de la sombra
-        product_x = shadow_margin
-        product_y = shadow_margin
-        canvas.paste(img, (product_x, product_y), img if img.mode == 'RGBA' else None)
-        logger.info("[APPLY] Producto pegado encima de la sombra")
+        canvas = composite_shadow(
+            img, intensity, (offset_x, offset_y), blur_radius,
+            shade=150, margin=shadow_margin, threshold=5
+        )
 
         logger.info(f"[DROP SHADOW] Canvas final: {canvas.size[0]}x{canvas.size[1]} pixels")
         return canvas
@@ -140,45 +204,13 @@ class ShadowEffects:
         # Recortar reflejo a la altura deseada
         reflection = reflection.crop((0, 0, reflection.width, reflection_h))
 
-        # Crear máscara de degradado para el fade
-        fade_mask = Image.new('L', (reflection.width, reflection_h), 0)
-        for y in range(reflection_h):
-            # Opacidad que disminuye hacia abajo
-            progress = y / reflection_h
-            if progress < fade_start:
-                fade_factor = 1.0
-            else:
-                fade_factor = 1.0 - ((progress - fade_start) / (1.0 - fade_start))
-
-            opacity_value = int(255 * opacity * fade_factor)
-            for x in range(reflection.width):
-                fade_mask.putpixel((x, y), opacity_value)
-
-        # Aplicar máscara al reflejo
-        if reflection.mode != 'RGBA':
-            reflection = reflection.convert('RGBA')
-
-        # Modificar el canal alpha del reflejo
-        r, g, b, a = reflection.split()
-        # Combinar el alpha existente con la máscara de fade
-        combined_alpha = ImageEnhance.Brightness(a).enhance(opacity)
-        combined_alpha = Image.eval(combined_alpha, lambda x: int(x * (fade_mask.getpixel((0, 0)) / 255)))
-
-        # Aplicar fade a todo el reflejo
-        reflection_faded = Image.new('RGBA', reflection.size, (0, 0, 0, 0))
-        for y in range(reflection_h):
-            progress = y / reflection_h
-            if progress < fade_start:
-                fade_factor = 1.0
-            else:
-                fade_factor = 1.0 - ((progress - fade_start) / (1.0 - fade_start))
-
-            alpha_value = int(255 * opacity * fade_factor)
-
-            for x in range(reflection.width):
-                if a.getpixel((x, y)) > 10:  # Solo si el pixel original no es transparente
-                    r_val, g_val, b_val = reflection.getpixel((x, y))[:3]
-                    reflection_faded.putpixel((x, y), (r_val, g_val, b_val, alpha_value))
+        # Reflejo con fade: los pixeles visibles (alpha > 10) toman la
+        # opacidad de su fila, el resto queda transparente. Todo en NumPy.
+        pixels = np.array(reflection.convert('RGBA'))
+        visible = pixels[:, :, 3] > 10
+        pixels[:, :, 3] = reflection_fade(reflection_h, opacity, fade_start)[:, np.newaxis]
+        pixels[~visible] = 0
+        reflection_faded = Image.fromarray(pixels, 'RGBA')
 
         # Pegar reflejo en canvas
         reflection_y = img.height + gap
@@ -205,71 +237,90 @@ class ShadowEffects:
 
         offset_x, offset_y = directions.get(direction, (4, 6))
 
-        # Canvas más grande
+        # Canvas más grande, transparente; sombra gris oscuro sutil
         margin = blur_radius + 15
-        new_width = img.width + margin * 2
-        new_height = img.height + margin * 2
-
-        canvas = Image.new('RGBA', (new_width, new_height), (0, 0, 0, 0))
-
-        # Crear sombra sutil
-        if img.mode == 'RGBA':
-            shadow_mask = img.split()[-1]
-        else:
-            shadow_mask = img.convert('L')
+        canvas = composite_shadow(
+            img, intensity, (offset_x, offset_y), blur_radius,
+            shade=60, margin=margin, threshold=10, background=None
+        )
 
-        # Crear sombra con color gris oscuro sutil
-        shadow = Image.new('RGBA', img.size, (0, 0, 0, 0))
-        shadow_alpha = shadow_mask.point(lambda x: int(x * intensity) if x > 10 else 0)
-        shadow.paste((60, 60, 60, 255), mask=shadow_alpha)  # Gris oscuro en lugar de negro puro
+        logger.info(f"[NATURAL] Sombra natural aplicada con offset ({offset_x}, {offset_y})")
+        return canvas
 
-        # Blur sutil para efecto natural
-        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=blur_radius))
+def analyze_alpha_mask(alpha, threshold: int = 10) -> Optional[Dict[str, float]]:
+    """
+    Geometría del producto a partir de su máscara alpha (en memoria)
 
-        # Posicionar sombra en canvas
-        shadow_x = margin + offset_x
-        shadow_y = margin + offset_y
-        canvas.paste(shadow, (shadow_x, shadow_y), shadow)
+    Returns:
+        dict con bbox (left, top, width, height), aspect_ratio, fill_ratio
+        (área opaca / área del bbox), contact_ratio (fracción del ancho que
+        toca la franja inferior del bbox) y contact_points (tramos separados
+        de contacto: 1 para una base, varios para patas). None si no hay producto.
+    """
+    mask = np.asarray(alpha) > threshold
+    rows = np.flatnonzero(mask.any(axis=1))
+    cols = np.flatnonzero(mask.any(axis=0))
+    if rows.size == 0:
+        return None
+
+    top, bottom = int(rows[0]), int(rows[-1])
+    left, right = int(cols[0]), int(cols[-1])
+    width, height = right - left + 1, bottom - top + 1
+    box = mask[top:bottom + 1, left:right + 1]
+
+    # Franja inferior (3% de la altura) donde el producto "toca el suelo"
+    band = max(1, int(round(height * 0.03)))
+    contact = box[-band:].any(axis=0)
+    contact_points = int(contact[0]) + int(np.count_nonzero(np.diff(contact.astype(np.int8)) == 1))
+
+    return {
+        'left': left,
+        'top': top,
+        'width': width,
+        'height': height,
+        'aspect_ratio': width / height,
+        'fill_ratio': np.count_nonzero(box) / (width * height),
+        'contact_ratio': np.count_nonzero(contact) / width,
+        'contact_points': contact_points
+    }
 
-        # Producto original encima
-        canvas.paste(img, (margin, margin), img if img.mode == 'RGBA' else None)
+def detect_shadow_type(alpha, threshold: int = 10) -> Tuple[str, str]:
+    """
+    Elegir tipo de sombra desde la máscara alpha ya calculada (sin I/O)
 
-        logger.info(f"[NATURAL] Sombra natural aplicada con offset ({offset_x}, {offset_y})")
-        return canvas
+    Returns:
+        (tipo, motivo): 'drop', 'natural' o 'reflection'
+    """
+    stats = analyze_alpha_mask(alpha, threshold)
+    if stats is None:
+        return 'drop', "sin producto detectado"
+
+    aspect_ratio = stats['aspect_ratio']
+    if aspect_ratio > 1.8:
+        # Muy ancho - teclados, monitores: sombra que sigue el contorno
+        return 'natural', "producto ancho horizontal"
+    if stats['contact_points'] >= 3:
+        # Varias patas o apoyos separados - sillas, mesas, trípodes
+        return 'natural', "apoyado en varios puntos"
+    if stats['fill_ratio'] < 0.35:
+        # Contorno irregular o calado - joyas, cables, plantas
+        return 'natural', "contorno irregular"
+    if aspect_ratio < 0.6 and stats['contact_ratio'] >= 0.3:
+        # Alto y con base plana - botellas, torres de audio
+        return 'reflection', "producto alto con base plana"
+    return 'drop', "producto compacto/balanceado"
 
 def detect_best_shadow_type(image_path: str) -> str:
-    """Detectar automáticamente el mejor tipo de sombra según el producto"""
+    """Detectar automáticamente el mejor tipo de sombra según el producto (desde disco)"""
 
     try:
-        # Cargar imagen para análisis
-        img = cv2.imread(image_path, cv2.IMREAD_UNCHANGED)
-        if img is None:
-            logger.warning("[WARNING] No se pudo cargar imagen para análisis, usando drop shadow")
-            return 'drop'
-
-        height, width = img.shape[:2]
-        aspect_ratio = width / height
-
-        logger.info(f"[AUTO] Analizando imagen: {width}x{height}, ratio: {aspect_ratio:.2f}")
-
-        # Análisis basado en proportions y contenido
-        if aspect_ratio > 1.8:
-            # Muy ancho - productos como teclados, monitores
-            shadow_type = 'natural'
-            reason = "producto ancho horizontal"
-        elif aspect_ratio < 0.6:
-            # Muy alto - productos como botellas, torres de audio
-            shadow_type = 'reflection'
-            reason = "producto alto vertical"
-        elif 0.8 <= aspect_ratio <= 1.2:
-            # Cuadrado - la mayoría de productos
-            shadow_type = 'drop'
-            reason = "producto cuadrado/balanceado"
-        else:
-            # Casos intermedios
-            shadow_type = 'drop'
-            reason = "caso general"
+        with Image.open(image_path) as img:
+            if 'A' not in img.getbands():
+                logger.warning("[WARNING] Imagen sin canal alpha, usando drop shadow")
+                return 'drop'
+            alpha = img.getchannel('A')
 
+        shadow_type, reason = detect_shadow_type(alpha)
         logger.info(f"[AUTO] Sombra recomendada: '{shadow_type}' ({reason})")
         return shadow_type
 
@@ -362,11 +413,7 @@ def apply_professional_shadow(input_path: str, output_path: str,
     logger.info(f"[SHADOW] Pipeline: {pipeline}, Tipo: {shadow_type}")
 
     try:
-        # Detectar tipo automáticamente si es necesario
-        if shadow_type == 'auto':
-            shadow_type = detect_best_shadow_type(input_path)
-            logger.info(f"[AUTO] Tipo detectado automáticamente: {shadow_type}")
-
+        # 'auto' se resuelve en apply_shadow() sobre la imagen ya cargada (sin leerla dos veces)
         # Si el usuario eligió 'none', saltar todo el procesamiento de sombras
         if shadow_type == 'none':
             logger.info("[SHADOW] Usuario deshabilitó sombras (shadow_type='none'), copiando imagen original")
@@ -378,9 +425,8 @@ def apply_professional_shadow(input_path: str, output_path: str,
         # Obtener parámetros base del pipeline
         shadow_params = get_shadow_params_for_pipeline(pipeline)
 
-        # Sobrescribir tipo si se especificó uno diferente (excepto 'auto')
-        if shadow_type != 'auto':
-            shadow_params['shadow_type'] = shadow_type
+        # Sobrescribir tipo si se especificó uno ('auto' incluido)
+        shadow_params['shadow_type'] = shadow_type
 
         # Aplicar parámetros personalizados si se proporcionaron
         if custom_params:
@@ -423,46 +469,16 @@ def apply_simple_drop_shadow(image, intensity=0.5):
     print(f"[SIMPLE SHADOW] Applying basic drop shadow, intensity={intensity}")
 
     try:
-        # Ensure RGBA mode
-        if image.mode != 'RGBA':
-            image = image.convert('RGBA')
-
-        width, height = image.size
-
-        # Create shadow offset (fixed values for simplicity)
+        # Fixed values for simplicity: offset 15px, blur 20px, gray 100 on white
         offset_x = 15
         offset_y = 15
         blur_radius = 20
-
-        # Create expanded canvas for shadow
         padding = blur_radius + offset_x + offset_y
-        shadow_size = (width + padding * 2, height + padding * 2)
-
-        # Extract alpha channel for shadow mask
-        alpha = image.split()[3]
-
-        # Create shadow layer
-        shadow = Image.new('RGBA', image.size, (0, 0, 0, 0))
-        shadow_alpha = alpha.point(lambda x: int(x * intensity) if x > 10 else 0)
-        shadow.paste((100, 100, 100, 255), (0, 0), shadow_alpha)
-
-        # Apply blur
-        shadow = shadow.filter(ImageFilter.GaussianBlur(blur_radius))
-
-        # Create final canvas with WHITE background
-        result = Image.new('RGB', shadow_size, (255, 255, 255))
-
-        # Position shadow with offset
-        shadow_x = padding + offset_x
-        shadow_y = padding + offset_y
 
-        # Paste shadow (convert to RGB for white background)
-        shadow_rgb = Image.new('RGB', shadow.size, (255, 255, 255))
-        shadow_rgb.paste(shadow, mask=shadow.split()[3] if shadow.mode == 'RGBA' else None)
-        result.paste(shadow_rgb, (shadow_x, shadow_y))
-
-        # Paste original product on top
-        result.paste(image, (padding, padding), image)
+        result = composite_shadow(
+            image, intensity, (offset_x, offset_y), blur_radius,
+            shade=100, margin=padding, threshold=10
+        )
 
         print(f"[SIMPLE SHADOW] Success! Result size: {result.size}")
         return result
@@ -472,4 +488,38 @@ def apply_simple_drop_shadow(image, intensity=0.5):
         # Return image on white background as fallback
         fallback = Image.new('RGB', image.size, (255, 255, 255))
         fallback.paste(image, (0, 0), image if image.mode == 'RGBA' else None)
-        return fallback
\ No newline at end of file
+        return fallback
+
+def benchmark_mask_luts(size: Tuple[int, int] = (1000, 1000), repeats: int = 200) -> Dict[str, float]:
+    """
+    Micro-benchmark de la mascara de sombra: point() con lambda, con una
+    tabla construida en cada llamada y con la tabla cacheada. Devuelve
+    microsegundos por llamada (mejor de `repeats`).
+
+    Uso: python -m app.processing.shadow_effects
+    """
+    alpha = Image.linear_gradient('L').resize(size)
+    intensity, threshold = 0.5, 10
+
+    variants = {
+        'lambda': lambda: alpha.point(lambda x: int(x * intensity) if x > threshold else 0),
+        'table_per_call': lambda: alpha.point([int(x * intensity) if x > threshold else 0 for x in range(256)]),
+        'cached_lut': lambda: alpha.point(shadow_mask_lut(intensity, threshold)),
+    }
+    expected = variants['lambda']().tobytes()
+
+    results = {}
+    for name, run in variants.items():
+        if run().tobytes() != expected:
+            raise AssertionError(f"{name} produce una mascara distinta")
+        best = float('inf')
+        for _ in range(repeats):
+            start = time.perf_counter()
+            run()
+            best = min(best, time.perf_counter() - start)
+        results[name] = best * 1_000_000
+    return results
+
+if __name__ == "__main__":
+    for name, micros in benchmark_mask_luts().items():
+        print(f"{name:>15}: {micros:8.1f} us/llamada")
@@ -0,0 +1,130 @@
+"""
+Marketplace Variants
+Turns one segmented product (RGBA cutout) into the image each marketplace
+expects. Segmentation runs once per image; every requested variant is
+rendered from that same cutout, largest first, each downscaled from the
+previous one.
+"""
+
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from PIL import Image
+
+from .shadow_effects import ShadowEffects, apply_simple_drop_shadow, detect_shadow_type
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class MarketplaceTarget:
+    name: str
+    max_size: int  # Longest edge in pixels
+    quality: int = 95  # JPEG quality
+
+
+MARKETPLACE_TARGETS = {
+    "amazon": MarketplaceTarget("amazon", 1000),
+    "instagram": MarketplaceTarget("instagram", 1080),
+    "ebay": MarketplaceTarget("ebay", 1600),
+}
+
+
+def variant_filename(filename: str, target_name: str) -> str:
+    """Output name of a variant: img_001.jpg -> img_001_ebay.jpg"""
+    return f"{Path(filename).stem}_{target_name}.jpg"
+
+
+def resolve_targets(names: Iterable[str]) -> List[MarketplaceTarget]:
+    """Targets for marketplace names, in request order without duplicates"""
+    targets = []
+    for name in names:
+        target = MARKETPLACE_TARGETS.get(str(name).lower())
+        if target is None:
+            raise ValueError(f"Unknown marketplace: {name}. Available: {', '.join(MARKETPLACE_TARGETS)}")
+        if target not in targets:
+            targets.append(target)
+    return targets
+
+
+def resolve_shadow_type(cutout: Image.Image, shadow_params: dict = None) -> Optional[str]:
+    """
+    Shadow type to render, or None without shadow. 'auto' is decided from
+    the cutout's alpha mask, already in memory.
+    """
+    if not (shadow_params and shadow_params.get('enabled', False)):
+        return None
+    shadow_type = shadow_params.get('type', 'drop')
+    if shadow_type == 'auto':
+        shadow_type, reason = detect_shadow_type(cutout.getchannel('A'))
+        logger.info(f"[AUTO] Shadow type '{shadow_type}' ({reason})")
+    if shadow_type == 'none':
+        return None
+    return shadow_type if shadow_type in ('drop', 'natural', 'reflection') else 'drop'
+
+
+def _flatten_on_white(image: Image.Image) -> Image.Image:
+    white_bg = Image.new('RGB', image.size, (255, 255, 255))
+    white_bg.paste(image, (0, 0), image if image.mode == 'RGBA' else None)
+    return white_bg
+
+
+def compose_on_white(cutout: Image.Image, shadow_params: dict = None, shadow_type: Optional[str] = None) -> Image.Image:
+    """
+    Final RGB image: the cutout on white, with the requested shadow
+
+    Args:
+        shadow_type: Already resolved type (see resolve_shadow_type); resolved
+            from `shadow_params` when omitted
+    """
+    if shadow_type is None:
+        shadow_type = resolve_shadow_type(cutout, shadow_params)
+    if shadow_type is None:
+        return _flatten_on_white(cutout)
+
+    intensity = shadow_params.get('intensity', 0.5)
+    try:
+        if shadow_type == 'natural':
+            return _flatten_on_white(ShadowEffects().create_natural_shadow(cutout, intensity=intensity))
+        if shadow_type == 'reflection':
+            return _flatten_on_white(ShadowEffects().create_reflection_shadow(cutout, intensity=intensity))
+        return apply_simple_drop_shadow(image=cutout, intensity=intensity)
+    except Exception as shadow_error:
+        logger.error(f"[SHADOW] FAILED: {shadow_error}")
+        return _flatten_on_white(cutout)
+
+
+def fit_cutout(cutout: Image.Image, max_size: int) -> Image.Image:
+    """Copy of the cutout scaled down to `max_size` (never up)"""
+    if max(cutout.size) <= max_size:
+        return cutout
+    fitted = cutout.copy()
+    fitted.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    return fitted
+
+
+def render_variant(cutout: Image.Image, target: MarketplaceTarget, shadow_params: dict = None,
+                   shadow_type: Optional[str] = None) -> Image.Image:
+    """Image for one marketplace from a segmented cutout"""
+    return compose_on_white(fit_cutout(cutout, target.max_size), shadow_params, shadow_type)
+
+
+def render_variants(cutout: Image.Image, targets: Iterable[MarketplaceTarget],
+                    shadow_params: dict = None, shadow_type: Optional[str] = None) -> Dict[str, Image.Image]:
+    """
+    Images for several marketplaces from one cutout
+
+    Largest target first: each smaller one is resized from the previous
+    cutout size instead of from the full-resolution segmentation. The
+    shadow type is resolved once, on the full-resolution mask.
+    """
+    if shadow_type is None:
+        shadow_type = resolve_shadow_type(cutout, shadow_params)
+    variants = {}
+    current = cutout
+    for target in sorted(targets, key=lambda target: target.max_size, reverse=True):
+        current = fit_cutout(current, target.max_size)
+        variants[target.name] = compose_on_white(current, shadow_params, shadow_type)
+    return variants
@@ -1,37 +1,45 @@
-from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import FileResponse, RedirectResponse
+from fastapi.concurrency import run_in_threadpool
 import os
-import zipfile
 from pathlib import Path
-import tempfile
 
 from ..models.schemas import DownloadResponse
 from ..database_sqlite.sqlite_client import sqlite_client
 from .simple_auth import get_current_user_email
+from ..services.job_manifest import JobManifest
+from ..services.http_cache import conditional_file_response, file_etag
+from ..services.result_archive import archive_download_response
+from ..services.object_storage import object_storage
 
 router = APIRouter()
 
 PROCESSED_DIR = Path("processed")
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
 
 @router.get("/processed/{job_id}/{filename}", response_class=FileResponse)
-async def get_processed_image(job_id: str, filename: str):
-    """Serve individual processed image for preview"""
+async def get_processed_image(job_id: str, filename: str, request: Request):
+    """Serve individual processed image for preview (ETag, 304 and Range aware)"""
     processed_file = PROCESSED_DIR / job_id / filename
 
     if not processed_file.exists():
         raise HTTPException(status_code=404, detail="Processed image not found")
 
-    return FileResponse(
-        path=processed_file,
-        media_type="image/jpeg",
-        headers={
-            "Cache-Control": "public, max-age=3600"
-        }
+    manifest = JobManifest.load_cached(PROCESSED_DIR / job_id)
+    entry = manifest.get(filename) if manifest else None
+
+    return conditional_file_response(
+        request,
+        processed_file,
+        "image/jpeg",
+        etag=file_etag(processed_file, entry.sha256 if entry else None),
+        cache_control="public, max-age=3600"
     )
 
-@router.get("/download/{job_id}", response_class=FileResponse)
+@router.get("/download/{job_id}")
 async def download_processed_images(
-    job_id: str
+    job_id: str,
+    request: Request
 ):
     job = sqlite_client.get_job(job_id)
     if not job:
@@ -51,27 +59,21 @@ async def download_processed_images(
     if not processed_job_dir.exists():
         raise HTTPException(status_code=404, detail="Processed files not found")
 
-    image_files = list(processed_job_dir.glob("*"))
-    if not image_files:
+    manifest = JobManifest.load_or_scan(processed_job_dir, IMAGE_EXTENSIONS)
+    if not manifest.images:
         raise HTTPException(status_code=404, detail="No processed files found")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as temp_zip:
-        with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for image_file in image_files:
-                if image_file.is_file():
-                    arcname = f"{job.get('pipeline', 'processed')}_{image_file.name}"
-                    zipf.write(image_file, arcname)
-
-        zip_filename = f"masterpost_{job_id}_{job.get('pipeline', 'processed')}.zip"
-
-        return FileResponse(
-            path=temp_zip.name,
-            filename=zip_filename,
-            media_type="application/zip",
-            headers={
-                "Content-Disposition": f"attachment; filename={zip_filename}"
-            }
-        )
+    # Cached archive with Range support, or streamed (and cached) on first request
+    pipeline = job.get('pipeline', 'processed')
+    zip_filename = f"masterpost_{job_id}_{pipeline}.zip"
+
+    return await archive_download_response(
+        request,
+        manifest,
+        [(image_file, f"{pipeline}_{image_file.name}") for image_file in manifest.paths()],
+        filename=zip_filename,
+        label=pipeline
+    )
 
 @router.get("/download/info/{job_id}", response_model=DownloadResponse)
 async def get_download_info(
@@ -89,15 +91,14 @@ async def get_download_info(
     job_status = job.get("status")
 
     if job_status == "completed" and processed_job_dir.exists():
-        image_files = list(processed_job_dir.glob("*"))
-        total_size = sum(f.stat().st_size for f in image_files if f.is_file())
+        manifest = JobManifest.load_or_scan(processed_job_dir, IMAGE_EXTENSIONS)
 
         return DownloadResponse(
             job_id=job_id,
             status=job_status,
             download_ready=True,
-            files_count=len(image_files),
-            total_size_mb=round(total_size / (1024 * 1024), 2),
+            files_count=len(manifest.images),
+            total_size_mb=round(manifest.total_bytes / (1024 * 1024), 2),
             download_url=f"/api/v1/download/{job_id}",
             expires_at=None  # TODO: Implement expiration
         )
@@ -112,9 +113,10 @@ async def get_download_info(
             expires_at=None
         )
 
-@router.get("/download-test/{job_id}", response_class=FileResponse)
+@router.get("/download-test/{job_id}")
 async def download_processed_images_test(
-    job_id: str
+    job_id: str,
+    request: Request
 ):
     """Testing endpoint without authentication for development"""
     job = sqlite_client.get_job(job_id)
@@ -133,27 +135,21 @@ async def download_processed_images_test(
     if not processed_job_dir.exists():
         raise HTTPException(status_code=404, detail="Processed files not found")
 
-    image_files = list(processed_job_dir.glob("*"))
-    if not image_files:
+    manifest = JobManifest.load_or_scan(processed_job_dir, IMAGE_EXTENSIONS)
+    if not manifest.images:
         raise HTTPException(status_code=404, detail="No processed files found")
 
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as temp_zip:
-        with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for image_file in image_files:
-                if image_file.is_file():
-                    arcname = f"{job.get('pipeline', 'processed')}_{image_file.name}"
-                    zipf.write(image_file, arcname)
-
-        zip_filename = f"masterpost_{job_id}_{job.get('pipeline', 'processed')}.zip"
-
-        return FileResponse(
-            path=temp_zip.name,
-            filename=zip_filename,
-            media_type="application/zip",
-            headers={
-                "Content-Disposition": f"attachment; filename={zip_filename}"
-            }
-        )
+    # Cached archive with Range support, or streamed (and cached) on first request
+    pipeline = job.get('pipeline', 'processed')
+    zip_filename = f"masterpost_{job_id}_{pipeline}.zip"
+
+    return await archive_download_response(
+        request,
+        manifest,
+        [(image_file, f"{pipeline}_{image_file.name}") for image_file in manifest.paths()],
+        filename=zip_filename,
+        label=pipeline
+    )
 
 @router.delete("/download/{job_id}")
 async def cleanup_job_files(
@@ -190,20 +186,18 @@ async def cleanup_job_files(
 @router.get("/preview/{job_id}/{filename}")
 async def get_preview_image(
     job_id: str,
-    filename: str
+    filename: str,
+    request: Request
 ):
-    """Serve preview of processed image"""
-    import os
-    from fastapi.responses import FileResponse
-    
-    # Buscar el archivo en processed
-    processed_path = f"/root/masterpost-saas/backend/processed/{job_id}/{filename}"
-    
-    if os.path.exists(processed_path):
-        return FileResponse(
-            processed_path,
-            media_type="image/jpeg",
-            headers={"Cache-Control": "public, max-age=3600"}
-        )
-    else:
-        raise HTTPException(status_code=404, detail="Image not found")
+    """Serve preview of processed image (from this node, or from object storage)"""
+    processed_file = PROCESSED_DIR / job_id / filename
+
+    if processed_file.is_file():
+        return conditional_file_response(request, processed_file, "image/jpeg", cache_control="public, max-age=3600")
+
+    key = f"processed/{job_id}/{filename}"
+    if not object_storage.is_local and await run_in_threadpool(object_storage.exists, key):
+        # Processed on another node: serve it straight from the bucket
+        return RedirectResponse(object_storage.presigned_url(key), status_code=307)
+
+    raise HTTPException(status_code=404, detail="Image not found")
@@ -3,14 +3,12 @@ Hybrid processing routes for MASTERPOST.IO V2.0
 Integrates usage tracking, plan-based processing, and ZIP support
 """
 
-from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks, Depends
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, File, UploadFile, HTTPException, BackgroundTasks, Depends, Request
 from typing import List, Optional
 import os
 import uuid
 from pathlib import Path
 import shutil
-import tempfile
 import asyncio
 import json
 
@@ -20,6 +18,9 @@ from ..database.supabase_client import supabase_client
 from ..services.processing_service import processing_service
 from ..services.usage_service import usage_service
 from ..services.zip_service import zip_service
+from ..services.job_manifest import JobManifest
+from ..services.object_storage import publish_job_results
+from ..services.result_archive import archive_download_response
 from ..auth.supabase_auth import get_current_user, get_current_user_optional
 
 router = APIRouter()
@@ -322,6 +323,9 @@ async def start_hybrid_processing(
         else:
             final_status = "completed"
 
+        # Publish results so any API node (or the bucket itself) can serve them
+        await asyncio.to_thread(publish_job_results, job_id, processed_dir)
+
         # Update job with final results
         await supabase_client.update_job(job_id, {
             "status": final_status,
@@ -378,8 +382,8 @@ async def get_hybrid_status(job_id: str, current_user: User = Depends(get_curren
         "error_message": job.get("error_message")
     }
 
-@router.get("/download-hybrid/{job_id}", response_class=FileResponse)
-async def download_hybrid(job_id: str, current_user: User = Depends(get_current_user)):
+@router.get("/download-hybrid/{job_id}")
+async def download_hybrid(job_id: str, request: Request, current_user: User = Depends(get_current_user)):
     """
     Download processed images as ZIP
     """
@@ -402,35 +406,24 @@ async def download_hybrid(job_id: str, current_user: User = Depends(get_current_
         raise HTTPException(status_code=404, detail="Processed files not found")
 
     # Find all processed images
-    image_files = []
-    for ext in [".png", ".jpg", ".jpeg"]:
-        image_files.extend(processed_dir.glob(f"*{ext}"))
+    manifest = JobManifest.load_or_scan(processed_dir, [".png", ".jpg", ".jpeg"])
 
-    if not image_files:
+    if not manifest.images:
         raise HTTPException(status_code=404, detail="No processed files found")
 
-    # Create ZIP file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as temp_zip:
-        import zipfile
-        with zipfile.ZipFile(temp_zip.name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            for image_file in image_files:
-                if image_file.is_file():
-                    # Use descriptive names
-                    pipeline = job.get("pipeline", "processed")
-                    user_plan = job.get("user_plan", "free")
-                    arcname = f"masterpost_{pipeline}_{user_plan}_{image_file.name}"
-                    zipf.write(image_file, arcname)
-
-        zip_filename = f"masterpost_{job_id}_{job.get('pipeline', 'processed')}.zip"
-
-        return FileResponse(
-            path=temp_zip.name,
-            filename=zip_filename,
-            media_type="application/zip",
-            headers={
-                "Content-Disposition": f"attachment; filename={zip_filename}"
-            }
-        )
+    # Cached archive with Range support, or streamed (and cached) on first request
+    # Use descriptive names
+    pipeline = job.get("pipeline", "processed")
+    user_plan = job.get("user_plan", "free")
+    prefix = f"masterpost_{pipeline}_{user_plan}"
+
+    return await archive_download_response(
+        request,
+        manifest,
+        [(image_file, f"{prefix}_{image_file.name}") for image_file in manifest.paths()],
+        filename=f"masterpost_{job_id}_{pipeline}.zip",
+        label=prefix
+    )
 
 @router.get("/usage")
 async def get_user_usage(current_user: User = Depends(get_current_user)):
@@ -3,12 +3,14 @@ Image Editor API Routes
 Provides endpoints for manual background removal touch-ups
 """
 
+import base64
 import logging
 import json
+import os
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 
 from ..models.schemas import EditorInitRequest, EditorInitResponse, BrushActionRequest, BrushActionResponse, EditorSaveRequest, EditorSaveResponse, EditorUndoRequest, EditorUndoResponse, EditorSessionInfo
@@ -24,14 +26,22 @@ router = APIRouter(prefix="/api/v1/editor", tags=["image-editor"])
 PROCESSED_DIR = Path("processed")
 PROCESSED_DIR.mkdir(exist_ok=True)
 
-# Global editor instance
-editor = ManualImageEditor(PROCESSED_DIR)
+# Global editor instance (previews encoded as webp or jpeg)
+editor = ManualImageEditor(PROCESSED_DIR, preview_format=os.getenv("EDITOR_PREVIEW_FORMAT", "webp"))
 
 # Dependency to get editor instance
 def get_editor() -> ManualImageEditor:
     """Get the editor instance"""
     return editor
 
+def preview_data_url(editor: ManualImageEditor, session_id: str) -> Optional[str]:
+    """Current preview of a session as a data URL, for inline responses"""
+    preview = editor.get_preview(session_id)
+    if preview is None:
+        return None
+    data, media_type = preview
+    return f"data:{media_type};base64,{base64.b64encode(data).decode('ascii')}"
+
 @router.post("/init", response_model=EditorInitResponse)
 async def init_editor_session(
     request: EditorInitRequest,
@@ -116,14 +126,14 @@ async def apply_brush_action(
             )
 
         # Apply brush action
-        preview_path = editor.apply_brush_action(
+        preview = editor.apply_brush_action(
             session_id=request.session_id,
             action=request.action,
             coordinates=[(coord.x, coord.y) for coord in request.coordinates],
             brush_size=request.brush_size
         )
 
-        if not preview_path:
+        if not preview:
             raise HTTPException(
                 status_code=500,
                 detail="Failed to apply brush action"
@@ -142,6 +152,7 @@ async def apply_brush_action(
         return BrushActionResponse(
             success=True,
             preview_url=f"/api/v1/editor/preview/{request.session_id}",
+            preview_data=preview_data_url(editor, request.session_id) if request.inline_preview else None,
             can_undo=updated_session_info['can_undo'],
             can_redo=updated_session_info['can_redo']
         )
@@ -179,9 +190,9 @@ async def undo_action(
             )
 
         # Undo action
-        preview_path = editor.undo(request.session_id)
+        preview = editor.undo(request.session_id)
 
-        if not preview_path:
+        if not preview:
             raise HTTPException(
                 status_code=500,
                 detail="Failed to undo action"
@@ -200,6 +211,7 @@ async def undo_action(
         return EditorUndoResponse(
             success=True,
             preview_url=f"/api/v1/editor/preview/{request.session_id}",
+            preview_data=preview_data_url(editor, request.session_id) if request.inline_preview else None,
             can_undo=updated_session_info['can_undo'],
             can_redo=updated_session_info['can_redo']
         )
@@ -237,9 +249,9 @@ async def redo_action(
             )
 
         # Redo action
-        preview_path = editor.redo(request.session_id)
+        preview = editor.redo(request.session_id)
 
-        if not preview_path:
+        if not preview:
             raise HTTPException(
                 status_code=500,
                 detail="Failed to redo action"
@@ -258,6 +270,7 @@ async def redo_action(
         return EditorUndoResponse(
             success=True,
             preview_url=f"/api/v1/editor/preview/{request.session_id}",
+            preview_data=preview_data_url(editor, request.session_id) if request.inline_preview else None,
             can_undo=updated_session_info['can_undo'],
             can_redo=updated_session_info['can_redo']
         )
@@ -295,9 +308,9 @@ async def reset_to_original(
             )
 
         # Reset to original
-        preview_path = editor.reset_to_original(request.session_id)
+        preview = editor.reset_to_original(request.session_id)
 
-        if not preview_path:
+        if not preview:
             raise HTTPException(
                 status_code=500,
                 detail="Failed to reset image"
@@ -316,6 +329,7 @@ async def reset_to_original(
         return EditorUndoResponse(
             success=True,
             preview_url=f"/api/v1/editor/preview/{request.session_id}",
+            preview_data=preview_data_url(editor, request.session_id) if request.inline_preview else None,
             can_undo=updated_session_info['can_undo'],
             can_redo=updated_session_info['can_redo']
         )
@@ -397,28 +411,22 @@ async def get_preview_image(
         session_id: Editor session ID
 
     Returns:
-        FileResponse: Preview image file
+        Response: Preview image, served from memory
     """
     try:
         # Validate session
-        session_info = editor.get_session_info(session_id)
-        if not session_info:
+        preview = editor.get_preview(session_id)
+        if not preview:
             raise HTTPException(
                 status_code=404,
                 detail="Editor session not found"
             )
 
-        preview_path = session_info.get('preview_path')
-        if not preview_path or not Path(preview_path).exists():
-            raise HTTPException(
-                status_code=404,
-                detail="Preview image not found"
-            )
-
-        return FileResponse(
-            preview_path,
-            media_type="image/png",
-            filename=f"preview_{session_id}.png"
+        data, media_type = preview
+        return Response(
+            content=data,
+            media_type=media_type,
+            headers={"Cache-Control": "no-store"}
         )
 
     except HTTPException:
@@ -4,6 +4,7 @@ from typing import Optional
 from ..models.schemas import ProcessRequest, ProcessResponse, JobStatus, PipelineType
 from ..database_sqlite.sqlite_client import sqlite_client
 from ..processing.batch_handler import start_batch_processing
+from ..services.job_manifest import JobManifest
 from .simple_auth import get_current_user_email
 
 router = APIRouter()
@@ -94,14 +95,16 @@ async def get_job_status(job_id: str):
     if job.get("status") == "completed":
         processed_dir = Path("processed") / job_id
         if processed_dir.exists():
-            # Get all processed image files
-            for img_file in processed_dir.glob("*"):
-                if img_file.is_file() and img_file.suffix.lower() in ['.jpg', '.jpeg', '.png', '.webp']:
+            # Processed images as recorded in the job manifest
+            extensions = ['.jpg', '.jpeg', '.png', '.webp']
+            manifest = JobManifest.load_or_scan(processed_dir, extensions)
+            for image in manifest.images:
+                if Path(image.name).suffix.lower() in extensions:
                     successful_files.append({
                         "success": True,
-                        "original": img_file.name,
-                        "processed": img_file.name,
-                        "path": str(img_file.relative_to(Path("processed"))),
+                        "original": image.source or image.name,
+                        "processed": image.name,
+                        "path": f"{job_id}/{image.name}",
                         "shadow_applied": False,
                         "shadow_type": None
                     })
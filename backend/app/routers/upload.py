@@ -10,6 +10,7 @@ import logging
 from ..models.schemas import UploadResponse, JobCreate, JobResponse
 from ..database_sqlite.sqlite_client import sqlite_client
 from .simple_auth import get_current_user_email
+from ..services.job_manifest import JobManifest, describe_image
 
 router = APIRouter()
 
@@ -198,6 +199,11 @@ async def upload_images(
                 detail=f"Too many files: {len(uploaded_files)}. Maximum 500 files allowed"
             )
 
+        # Record the images once so processing never rescans the directory
+        JobManifest(job_dir, [
+            describe_image(Path(f["path"]), source=f["original_name"]) for f in uploaded_files
+        ]).save()
+
     except Exception as e:
         if job_dir.exists():
             shutil.rmtree(job_dir)
@@ -0,0 +1,588 @@
+"""
+Archive Analysis and Parallel Extraction
+Unified reader for ZIP, RAR and 7z uploads. Archives are listed without
+decompressing anything, and image members are streamed to disk one at a
+time, either all at once or as a stream of events that processing can
+consume while extraction is still running.
+
+- ZIP: members are extracted across a thread pool, one ZipFile handle
+  per worker thread
+- RAR / 7z: members are decompressed in a single sequential pass (solid
+  archives can't be read out of order cheaply) and written straight to
+  their destination file, so memory stays bounded; header validation runs
+  on a thread pool alongside
+
+Images are validated from their header only (format and dimensions); full
+decoding is left to the processing stage.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import queue
+import shutil
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from app.services.upload_storage import hash_file
+
+logger = logging.getLogger(__name__)
+
+# Optional archive formats
+try:
+    import rarfile
+except ImportError:
+    rarfile = None
+    logger.warning("rarfile not installed - RAR support disabled")
+
+try:
+    import py7zr
+    from py7zr.io import NullIO, Py7zIO, WriterFactory
+except ImportError:
+    py7zr = None
+    logger.warning("py7zr not installed - 7ZIP support disabled")
+
+# Image extensions picked up inside archives
+ARCHIVE_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tiff', '.tif'}
+ARCHIVE_SYSTEM_FILES = ('__MACOSX', '.DS_Store', 'Thumbs.db', 'desktop.ini')
+
+# (label, upper bound in bytes) for the upload size histogram
+SIZE_HISTOGRAM_BUCKETS = [
+    ("<100KB", 100 * 1024),
+    ("100KB-500KB", 500 * 1024),
+    ("500KB-1MB", 1024 * 1024),
+    ("1MB-5MB", 5 * 1024 * 1024),
+    ("5MB-10MB", 10 * 1024 * 1024),
+    (">10MB", None),
+]
+
+EXTRACT_COPY_BUFFER = 1024 * 1024  # 1MB
+SEQUENTIAL_EVENT_BUFFER = 64  # Members a 7z pass may run ahead of its consumer
+
+
+class UnsupportedArchiveError(ValueError):
+    """Archive format unknown or its optional library is not installed"""
+
+
+@dataclass
+class ArchiveMember:
+    name: str
+    size: int  # Uncompressed size
+    is_dir: bool = False
+
+
+def supported_archive_extensions() -> set:
+    """Archive formats that can be read with the installed libraries"""
+    extensions = {'.zip'}
+    if rarfile is not None:
+        extensions.add('.rar')
+    if py7zr is not None:
+        extensions.add('.7z')
+    return extensions
+
+
+def default_extract_workers() -> int:
+    """Worker threads for extraction (zlib releases the GIL while inflating)"""
+    configured = os.getenv("ZIP_EXTRACT_WORKERS")
+    if configured:
+        return max(int(configured), 1)
+    return min((os.cpu_count() or 4) * 2, 16)
+
+
+def archive_member_skip_reason(member: ArchiveMember) -> Optional[str]:
+    """Why an archive member is not an image to extract, or None if it is one"""
+    file_path = Path(member.name)
+    if member.is_dir:
+        return "directory"
+    if any(x in member.name for x in ARCHIVE_SYSTEM_FILES):
+        return "system_file"
+    if file_path.name.startswith('.'):
+        return "hidden_file"
+    if file_path.suffix.lower() not in ARCHIVE_IMAGE_EXTENSIONS:
+        return f"not_image:{file_path.suffix}"
+    return None
+
+
+def new_size_histogram() -> Dict[str, int]:
+    return {label: 0 for label, _ in SIZE_HISTOGRAM_BUCKETS}
+
+
+def add_to_size_histogram(histogram: Dict[str, int], size: int):
+    for label, upper in SIZE_HISTOGRAM_BUCKETS:
+        if upper is None or size < upper:
+            histogram[label] += 1
+            return
+
+
+def short_image_filename(index: int, member_name: str) -> str:
+    """
+    Short output name to avoid Windows 260 char path limits
+    Format: img_0001_a3f8d9e2.jpg (max 25 chars)
+    """
+    path = Path(member_name)
+    name_hash = hashlib.md5(path.name.encode()).hexdigest()[:8]
+    return f"img_{index:04d}_{name_hash}{path.suffix.lower()}"
+
+
+def _finish_member(part_path: Path, extract_path: Path) -> Tuple[bool, Dict[str, Any]]:
+    """
+    Check the header of an extracted member and move it into place
+
+    Returns:
+        (True, {"path", "format", "size", "bytes", "sha256"}) or (False, {"reason"})
+    """
+    # Header only: PIL identifies format and size without decoding pixels
+    try:
+        with Image.open(part_path) as img:
+            img_format = img.format
+            img_size = img.size
+    except Exception as img_error:
+        part_path.unlink(missing_ok=True)
+        return False, {"reason": f"corrupt:{str(img_error)}"}
+
+    # Hashed while the member is still in the page cache, for the job manifest
+    sha256 = hash_file(part_path)
+    file_bytes = part_path.stat().st_size
+    os.replace(part_path, extract_path)
+    return True, {"path": extract_path, "format": img_format, "size": img_size,
+                  "bytes": file_bytes, "sha256": sha256}
+
+
+def _part_path(extract_path: Path) -> Path:
+    return extract_path.with_name(extract_path.name + ".part")
+
+
+class ArchiveReader:
+    """Interface for reading image members out of an archive"""
+
+    def __init__(self, archive_path: Path):
+        self.archive_path = archive_path
+
+    def members(self) -> List[ArchiveMember]:
+        """All members, read from the archive directory (no decompression)"""
+        raise NotImplementedError("Subclasses must implement members method")
+
+    def extract_members(self, targets: List[Tuple[ArchiveMember, Path]],
+                        max_workers: int) -> Iterator[Tuple[ArchiveMember, bool, Dict[str, Any]]]:
+        """
+        Extract and validate `targets` ((member, destination) pairs)
+
+        Yields:
+            (member, ok, detail) in target order; detail as for _finish_member
+        """
+        raise NotImplementedError("Subclasses must implement extract_members method")
+
+
+class ZipArchiveReader(ArchiveReader):
+    """ZIP members are independent, so they are extracted fully in parallel"""
+
+    def members(self) -> List[ArchiveMember]:
+        with zipfile.ZipFile(self.archive_path, 'r') as zip_ref:
+            return [ArchiveMember(info.filename, info.file_size, info.is_dir()) for info in zip_ref.infolist()]
+
+    def extract_members(self, targets, max_workers):
+        local = threading.local()
+        handles: List[zipfile.ZipFile] = []
+        handles_lock = threading.Lock()
+
+        def get_handle() -> zipfile.ZipFile:
+            # One ZipFile per worker thread; a shared handle would serialize reads on its seek position
+            handle = getattr(local, "handle", None)
+            if handle is None:
+                handle = zipfile.ZipFile(self.archive_path, 'r')
+                local.handle = handle
+                with handles_lock:
+                    handles.append(handle)
+            return handle
+
+        def extract(target):
+            member, extract_path = target
+            part_path = _part_path(extract_path)
+            try:
+                # zipfile checks the CRC and length once the member is fully read
+                with get_handle().open(member.name) as source, open(part_path, 'wb') as output:
+                    shutil.copyfileobj(source, output, EXTRACT_COPY_BUFFER)
+                return _finish_member(part_path, extract_path)
+            except Exception as e:
+                part_path.unlink(missing_ok=True)
+                return False, {"reason": f"extract_error:{str(e)}"}
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # map() keeps archive order
+                for (member, _), (ok, detail) in zip(targets, executor.map(extract, targets)):
+                    yield member, ok, detail
+        finally:
+            for handle in handles:
+                handle.close()
+
+
+class _SequentialArchiveReader(ArchiveReader):
+    """
+    Formats decompressed in one pass: members come out in archive order and
+    are written straight to disk, while header checks run on a thread pool
+    """
+
+    def _extract_sequential(self, targets) -> Iterator[Tuple[ArchiveMember, Path, Optional[str]]]:
+        """Yields (member, part file, error) as each member is written"""
+        raise NotImplementedError("Subclasses must implement _extract_sequential method")
+
+    def extract_members(self, targets, max_workers):
+        pending = deque()
+
+        def resolve(entry):
+            member, future, error = entry
+            if future is None:
+                return member, False, {"reason": f"extract_error:{error}"}
+            return (member, *future.result())
+
+        destinations = {member.name: extract_path for member, extract_path in targets}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for member, part_path, error in self._extract_sequential(targets):
+                if error is None:
+                    pending.append((member, executor.submit(_finish_member, part_path, destinations[member.name]), None))
+                else:
+                    pending.append((member, None, error))
+
+                # Hand out finished members without waiting for the rest
+                while pending and (pending[0][1] is None or pending[0][1].done()):
+                    yield resolve(pending.popleft())
+
+            while pending:
+                yield resolve(pending.popleft())
+
+
+class RarArchiveReader(_SequentialArchiveReader):
+    def members(self) -> List[ArchiveMember]:
+        with rarfile.RarFile(self.archive_path) as rar_ref:
+            return [ArchiveMember(info.filename, info.file_size, info.is_dir()) for info in rar_ref.infolist()]
+
+    def _extract_sequential(self, targets):
+        with rarfile.RarFile(self.archive_path) as rar_ref:
+            for member, extract_path in targets:
+                part_path = _part_path(extract_path)
+                try:
+                    with rar_ref.open(member.name) as source, open(part_path, 'wb') as output:
+                        shutil.copyfileobj(source, output, EXTRACT_COPY_BUFFER)
+                    yield member, part_path, None
+                except Exception as e:
+                    part_path.unlink(missing_ok=True)
+                    yield member, part_path, str(e)
+
+
+if py7zr is not None:
+    class _SevenZipMemberWriter(Py7zIO):
+        """py7zr output sink writing one member straight to its part file"""
+
+        def __init__(self, part_path: Path, on_close, cancelled: threading.Event):
+            self.part_path = part_path
+            self._file = open(part_path, 'w+b')
+            self._on_close = on_close
+            self._cancelled = cancelled
+            self.closed = False
+
+        def write(self, s) -> int:
+            if self._cancelled.is_set():
+                raise RuntimeError("extraction cancelled")
+            return self._file.write(s)
+
+        def read(self, size: Optional[int] = None) -> bytes:
+            return self._file.read(-1 if size is None else size)
+
+        def seek(self, offset: int, whence: int = 0) -> int:
+            return self._file.seek(offset, whence)
+
+        def flush(self) -> None:
+            self._file.flush()
+
+        def size(self) -> int:
+            self._file.flush()
+            return os.fstat(self._file.fileno()).st_size
+
+        def close(self) -> None:
+            # Called by py7zr once the member is fully decompressed and its CRC
+            # checked; on a failed member py7zr leaves the writer open
+            if not self.closed:
+                self.closed = True
+                self._file.close()
+                self._on_close()
+
+        def discard(self) -> None:
+            """Drop an unfinished member: close without reporting it, remove the part file"""
+            if not self.closed:
+                self.closed = True
+                self._file.close()
+                self.part_path.unlink(missing_ok=True)
+
+    class _SevenZipWriterFactory(WriterFactory):
+        def __init__(self, part_paths: Dict[str, Path], on_member_done, cancelled: threading.Event):
+            self.part_paths = part_paths
+            self.on_member_done = on_member_done
+            self.cancelled = cancelled
+            self.writers: List[_SevenZipMemberWriter] = []
+
+        def create(self, filename: str) -> Py7zIO:
+            part_path = self.part_paths.get(filename)
+            if part_path is None:
+                return NullIO()  # Not an image we want: decompress and discard
+            writer = _SevenZipMemberWriter(part_path, lambda: self.on_member_done(filename), self.cancelled)
+            self.writers.append(writer)
+            return writer
+
+
+class SevenZipArchiveReader(_SequentialArchiveReader):
+    """
+    Solid 7z blocks are decompressed once, front to back. Instead of
+    SevenZipFile.readall() (every member in memory), a writer factory sends
+    each member to its own file and reports it done as soon as py7zr closes it.
+    """
+
+    def members(self) -> List[ArchiveMember]:
+        with py7zr.SevenZipFile(self.archive_path, 'r') as sz_ref:
+            return [ArchiveMember(info.filename, info.uncompressed or 0, info.is_directory) for info in sz_ref.list()]
+
+    def _extract_sequential(self, targets):
+        members = {member.name: member for member, _ in targets}
+        part_paths = {member.name: _part_path(extract_path) for member, extract_path in targets}
+        # Bounded: the decompressing thread waits if the consumer falls behind
+        events: "queue.Queue" = queue.Queue(maxsize=SEQUENTIAL_EVENT_BUFFER)
+        # Set when the consumer stops reading, so the thread doesn't wait on a full queue forever
+        cancelled = threading.Event()
+        reported = set()
+        done = object()
+
+        def put(event) -> bool:
+            while not cancelled.is_set():
+                try:
+                    events.put(event, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def on_member_done(name: str):
+            put((members[name], part_paths[name], None))
+
+        def run():
+            factory = _SevenZipWriterFactory(part_paths, on_member_done, cancelled)
+            error = None
+            try:
+                with py7zr.SevenZipFile(self.archive_path, 'r') as sz_ref:
+                    sz_ref.extract(targets=list(part_paths), factory=factory)
+            except Exception as e:
+                error = e
+            finally:
+                for writer in factory.writers:
+                    if error is None and not cancelled.is_set():
+                        # Older py7zr versions don't close writers per member
+                        writer.close()
+                    else:
+                        # Half-written or CRC-failed member: reported failed below
+                        writer.discard()
+                if not put((done, error)):
+                    # Consumer gone: nobody will move the finished part files into place
+                    for name, part_path in part_paths.items():
+                        if name not in reported:
+                            part_path.unlink(missing_ok=True)
+
+        thread = threading.Thread(target=run, name="7z-extract", daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                event = events.get()
+                if event[0] is done:
+                    error = event[1]
+                    break
+                reported.add(event[0].name)
+                yield event
+        finally:
+            cancelled.set()
+        thread.join()
+
+        # Members py7zr never produced (corrupt archive, CRC errors, ...)
+        for name, member in members.items():
+            if name not in reported:
+                part_paths[name].unlink(missing_ok=True)
+                yield member, part_paths[name], str(error or "member not found in archive")
+
+
+def open_archive(archive_path: Path) -> ArchiveReader:
+    """Reader for an archive, chosen by extension"""
+    ext = Path(archive_path).suffix.lower()
+    if ext == '.zip':
+        return ZipArchiveReader(archive_path)
+    if ext == '.rar' and rarfile is not None:
+        return RarArchiveReader(archive_path)
+    if ext == '.7z' and py7zr is not None:
+        return SevenZipArchiveReader(archive_path)
+    raise UnsupportedArchiveError(
+        f"Unsupported archive format: {ext}. Supported: {', '.join(sorted(supported_archive_extensions()))}"
+    )
+
+
+def analyze_archive(archive_path: Path) -> Dict[str, Any]:
+    """
+    Count images in an archive from its directory only
+
+    For ZIP only the central directory at the end of the file is read;
+    RAR and 7z headers are read the same way. No member is decompressed.
+    Uses the same filters as extract_images_from_archive.
+    """
+    image_sizes = [
+        member.size for member in open_archive(archive_path).members()
+        if archive_member_skip_reason(member) is None and member.size > 0
+    ]
+
+    histogram = new_size_histogram()
+    for size in image_sizes:
+        add_to_size_histogram(histogram, size)
+
+    return {
+        "image_sizes": image_sizes,
+        "uncompressed_bytes": sum(image_sizes),
+        "size_histogram": histogram
+    }
+
+
+def iter_extract_images(archive_path: Path, extract_to: Path, max_workers: int = None,
+                        start_index: int = 0) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Extract image members, yielding one event per member
+
+    Members are filtered from the archive directory first, then extracted
+    and validated. Events come in archive order.
+
+    Yields:
+        (status, member name, detail) where status is "skipped" or "failed"
+        (detail has "reason") or "extracted" (detail has "path", "format", "size")
+    """
+    reader = open_archive(archive_path)
+    all_members = reader.members()
+
+    logger.info(f"📁 Total files in archive: {len(all_members)}")
+
+    # 1. Pick image members from the directory (no decompression)
+    targets = []
+    for member in all_members:
+        reason = archive_member_skip_reason(member)
+        if reason is not None:
+            yield "skipped", member.name, {"reason": reason}
+        elif member.size == 0:
+            yield "failed", member.name, {"reason": "empty_file"}
+        else:
+            short_filename = short_image_filename(start_index + len(targets), member.name)
+            targets.append((member, extract_to / short_filename))
+
+    if not targets:
+        return
+
+    # 2. Extract and validate
+    workers = min(max_workers or default_extract_workers(), len(targets))
+    logger.info(f"🧵 Extracting {len(targets)} images with {workers} workers ({type(reader).__name__})")
+
+    for member, ok, detail in reader.extract_members(targets, workers):
+        yield ("extracted" if ok else "failed"), member.name, detail
+
+
+async def stream_extracted_images(archive_paths: List[Path], extract_to: Path) -> AsyncIterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Async view of iter_extract_images over several archives
+
+    Extraction runs in a background thread and events are handed to the
+    event loop as soon as each member is on disk, so consumers can start
+    working on the first images while the rest are still being extracted.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    def extract_all():
+        try:
+            start_index = 0
+            for archive_path in archive_paths:
+                try:
+                    for status, name, detail in iter_extract_images(archive_path, extract_to, start_index=start_index):
+                        if status != "skipped":
+                            start_index += 1
+                        loop.call_soon_threadsafe(events.put_nowait, (status, name, detail))
+                except Exception as e:
+                    # One unreadable archive shouldn't stop the others
+                    logger.error(f"❌ Error opening archive {archive_path}: {e}")
+                    loop.call_soon_threadsafe(events.put_nowait, ("failed", archive_path.name, {"reason": f"archive_error:{str(e)}"}))
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, done)
+
+    extraction = loop.run_in_executor(None, extract_all)
+    while True:
+        event = await events.get()
+        if event is done:
+            break
+        yield event
+
+    # Surface unexpected errors from the extraction thread
+    await extraction
+
+
+def extract_images_from_archive(archive_path: Path, extract_to: Path, max_workers: int = None,
+                                on_extracted: Callable[[str, Dict[str, Any]], None] = None) -> tuple:
+    """
+    Extract ALL images from an archive with SHORT FILENAMES to avoid Windows path length limits.
+    Uses format: img_0001_a3f8d9e2.jpg (max 25 chars)
+
+    on_extracted(member name, detail) is called for every extracted image,
+    e.g. to record it in the job manifest.
+
+    Returns: (extracted_images: List[Path], failed_images: List[dict])
+    """
+    extracted_images = []
+    failed_images = []
+    skipped_files = []
+
+    logger.info("=" * 80)
+    logger.info(f"🔍 ANALYZING ARCHIVE: {archive_path.name}")
+
+    try:
+        for status, name, detail in iter_extract_images(archive_path, extract_to, max_workers):
+            if status == "extracted":
+                logger.info(f"   ✅ {detail['format']} {detail['size']} -> {detail['path'].name}")
+                extracted_images.append(detail["path"])
+                if on_extracted is not None:
+                    on_extracted(name, detail)
+            elif status == "failed":
+                logger.info(f"   ❌ FAILED: {name}: {detail['reason']}")
+                failed_images.append({"file": name, "reason": detail["reason"]})
+            else:
+                skipped_files.append({"file": name, "reason": detail["reason"]})
+    except Exception as e:
+        logger.error(f"❌ Error opening archive {archive_path}: {e}")
+        failed_images.append({"file": archive_path.name, "reason": f"archive_error:{str(e)}"})
+        return extracted_images, failed_images
+
+    # Summary
+    logger.info("=" * 80)
+    logger.info(f"📊 EXTRACTION SUMMARY:")
+    logger.info(f"   ✅ Extracted: {len(extracted_images)}")
+    logger.info(f"   ❌ Failed: {len(failed_images)}")
+    logger.info(f"   ⏭️  Skipped: {len(skipped_files)}")
+    logger.info(f"   📁 Total processed: {len(extracted_images) + len(failed_images) + len(skipped_files)}")
+
+    if skipped_files:
+        logger.info(f"⏭️  SKIPPED FILES (showing first 10):")
+        for skip in skipped_files[:10]:
+            skip_file = skip['file'] if len(skip['file']) <= 80 else skip['file'][:77] + "..."
+            logger.info(f"   - {skip_file}: {skip['reason']}")
+        if len(skipped_files) > 10:
+            logger.info(f"   ... and {len(skipped_files) - 10} more")
+
+    logger.info("=" * 80)
+
+    return extracted_images, failed_images
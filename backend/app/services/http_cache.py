@@ -0,0 +1,173 @@
+"""
+Conditional and Range Responses
+Strong ETags, 304 Not Modified and single byte-range (206) responses for
+files served from disk: previews, processed images and result archives.
+Lets browsers and CDNs revalidate instead of refetching, and lets clients
+resume a large archive download where it stopped.
+"""
+
+import logging
+import os
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+RANGE_READ_SIZE = 256 * 1024
+
+
+class RangeNotSatisfiableError(ValueError):
+    def __init__(self, size: int):
+        self.size = size
+        super().__init__(f"Range not satisfiable for {size} bytes")
+
+
+def strong_etag(*parts) -> str:
+    """Quoted strong ETag from content-derived parts (hashes, versions)"""
+    return '"' + "-".join(str(part) for part in parts) + '"'
+
+
+def file_etag(path: Path, content_hash: Optional[str] = None, stat_result: os.stat_result = None) -> str:
+    """
+    ETag for a file: its content hash when known (e.g. from the job
+    manifest), otherwise size and mtime of a file that is only ever
+    replaced, never rewritten in place
+    """
+    if content_hash:
+        return strong_etag(content_hash[:32])
+    stat_result = stat_result or path.stat()
+    return strong_etag(f"{stat_result.st_size:x}", f"{stat_result.st_mtime_ns:x}")
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match comparison (weak: W/ prefixes are ignored)"""
+    if if_none_match.strip() == "*":
+        return True
+    bare = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == bare:
+            return True
+    return False
+
+
+def parse_byte_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parse a single `bytes=` range into an inclusive (start, end)
+
+    Returns None when the header should be ignored (other units, several
+    ranges, malformed); the full file is sent then.
+
+    Raises:
+        RangeNotSatisfiableError: range starts past the end of the file, or
+            the file is empty (no byte range of it exists)
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, _, last = spec.strip().partition("-")
+    try:
+        suffix = int(last) if first == "" else None
+        start = int(first) if first != "" else None
+        end = int(last) if first != "" and last else size - 1
+    except ValueError:
+        return None
+
+    if suffix is not None:
+        # Last N bytes (an empty file has none to send)
+        if suffix <= 0 or size == 0:
+            raise RangeNotSatisfiableError(size)
+        return max(size - suffix, 0), size - 1
+    if start >= size:
+        raise RangeNotSatisfiableError(size)
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+
+def _if_range_allows(if_range: Optional[str], etag: str, last_modified: str) -> bool:
+    """If-Range: serve the range only if the client's copy is still current"""
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == etag  # Strong comparison; weak tags never match
+    return if_range == last_modified
+
+
+def _iter_file_range(path: Path, start: int, end: int) -> Iterator[bytes]:
+    remaining = end - start + 1
+    with open(path, "rb") as f:
+        f.seek(start)
+        while remaining > 0:
+            block = f.read(min(RANGE_READ_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+def conditional_file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    etag: Optional[str] = None,
+    cache_control: str = "no-cache",
+    filename: Optional[str] = None,
+    headers: Optional[Dict[str, str]] = None
+) -> Response:
+    """
+    Serve `path` honoring If-None-Match, Range and If-Range
+
+    Returns 304 when the client's ETag matches, 206 for a satisfiable
+    single range, 416 for a range past the end, and the full file
+    otherwise. Every response advertises Accept-Ranges and the ETag.
+    """
+    stat_result = path.stat()
+    etag = etag or file_etag(path, stat_result=stat_result)
+    last_modified = formatdate(stat_result.st_mtime, usegmt=True)
+
+    base_headers = {
+        **(headers or {}),
+        "ETag": etag,
+        "Last-Modified": last_modified,
+        "Cache-Control": cache_control,
+        "Accept-Ranges": "bytes"
+    }
+    if filename:
+        base_headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=base_headers)
+
+    range_header = request.headers.get("range")
+    if range_header and _if_range_allows(request.headers.get("if-range"), etag, last_modified):
+        size = stat_result.st_size
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except RangeNotSatisfiableError:
+            return Response(
+                status_code=416,
+                headers={**base_headers, "Content-Range": f"bytes */{size}"}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return StreamingResponse(
+                _iter_file_range(path, start, end),
+                status_code=206,
+                media_type=media_type,
+                headers={
+                    **base_headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1)
+                }
+            )
+
+    return FileResponse(path, media_type=media_type, headers=base_headers, stat_result=stat_result)
@@ -0,0 +1,257 @@
+"""
+Job Image Manifest
+One compact JSON file per job directory listing its images: name, size,
+dimensions and content hash. It is written when files land in the
+directory, and later stages (process, download, status) read it instead of
+globbing and stat-ing every entry again.
+"""
+
+import json
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from PIL import Image
+
+from app.services.upload_storage import hash_file
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+MANIFEST_CACHE_SIZE = 128  # Parsed manifests kept for per-request lookups
+
+_manifest_cache: "OrderedDict[str, tuple]" = OrderedDict()
+_manifest_cache_lock = threading.Lock()
+
+# Per-directory (= per-job) locks for load -> modify -> save, with the
+# number of holders so unused locks are dropped
+_directory_locks: Dict[str, list] = {}
+_directory_locks_guard = threading.Lock()
+
+
+@contextmanager
+def _directory_lock(directory: Path) -> Iterator[None]:
+    key = str(Path(directory).resolve())
+    with _directory_locks_guard:
+        entry = _directory_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+    try:
+        with entry[0]:
+            yield
+    finally:
+        with _directory_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _directory_locks[key]
+
+
+@dataclass
+class ManifestImage:
+    name: str  # File name inside the job directory
+    size: int
+    width: int
+    height: int
+    sha256: str
+    source: Optional[str] = None  # Original upload or archive member name
+    variant: Optional[str] = None  # Marketplace of a multi-target output
+
+
+def describe_image(path: Path, sha256: Optional[str] = None, size: Optional[int] = None,
+                   dimensions: Optional[tuple] = None, source: Optional[str] = None,
+                   variant: Optional[str] = None) -> ManifestImage:
+    """
+    Manifest entry for a file on disk
+
+    Whatever the caller already knows (hash from a streaming upload, size
+    from the archive header check) is reused; only the rest is read.
+    """
+    if size is None:
+        size = path.stat().st_size
+    if dimensions is None:
+        try:
+            with Image.open(path) as img:  # Header only, no decoding
+                dimensions = img.size
+        except Exception:
+            dimensions = (0, 0)
+    if sha256 is None:
+        sha256 = hash_file(path)
+    return ManifestImage(
+        name=path.name,
+        size=size,
+        width=dimensions[0],
+        height=dimensions[1],
+        sha256=sha256,
+        source=source,
+        variant=variant
+    )
+
+
+class JobManifest:
+    """Images of one job directory, kept in `<directory>/manifest.json`"""
+
+    def __init__(self, directory: Path, images: Optional[List[ManifestImage]] = None):
+        self.directory = directory
+        self.images: List[ManifestImage] = list(images or [])
+        self._by_name: Optional[Dict[str, ManifestImage]] = None
+
+    @property
+    def path(self) -> Path:
+        return self.directory / MANIFEST_FILE
+
+    @classmethod
+    def load(cls, directory: Path) -> Optional["JobManifest"]:
+        """Manifest of a directory, or None if it has none (or it is unreadable)"""
+        try:
+            with open(directory / MANIFEST_FILE) as f:
+                data = json.load(f)
+            images = [ManifestImage(**entry) for entry in data["images"]]
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        return cls(directory, images)
+
+    @classmethod
+    def load_cached(cls, directory: Path) -> Optional["JobManifest"]:
+        """
+        load() memoized on the manifest file's mtime, for lookups on every
+        request (previews, ETags). The returned manifest is shared: read only.
+        """
+        try:
+            mtime_ns = (directory / MANIFEST_FILE).stat().st_mtime_ns
+        except OSError:
+            return None
+
+        key = str(directory)
+        with _manifest_cache_lock:
+            cached = _manifest_cache.get(key)
+            if cached is not None and cached[0] == mtime_ns:
+                _manifest_cache.move_to_end(key)
+                return cached[1]
+
+        manifest = cls.load(directory)
+        if manifest is not None:
+            with _manifest_cache_lock:
+                _manifest_cache[key] = (mtime_ns, manifest)
+                _manifest_cache.move_to_end(key)
+                while len(_manifest_cache) > MANIFEST_CACHE_SIZE:
+                    _manifest_cache.popitem(last=False)
+        return manifest
+
+    @classmethod
+    def scan(cls, directory: Path, extensions: Iterable[str], save: bool = True) -> "JobManifest":
+        """
+        Build a manifest from the directory contents, saving it if `save`
+
+        Fallback for jobs created before manifests existed; the directory
+        is only walked once, later calls load the saved file. Callers pass
+        save=False while the job may still be writing to the directory, so
+        a partial listing is never persisted. Hidden (temporary) files and
+        files that disappear during the walk are skipped.
+        """
+        extensions = {ext.lower() for ext in extensions}
+        images = []
+        for path in sorted(directory.iterdir()):
+            if path.suffix.lower() not in extensions or path.name.startswith("."):
+                continue
+            try:
+                if path.is_file():
+                    images.append(describe_image(path))
+            except OSError as e:
+                logger.warning(f"[MANIFEST] Skipping {path}: {e}")
+        manifest = cls(directory, images)
+        if save:
+            manifest.save()
+            logger.info(f"[MANIFEST] Built manifest for {directory} from {len(images)} files")
+        return manifest
+
+    @classmethod
+    @contextmanager
+    def updating(cls, directory: Path) -> Iterator["JobManifest"]:
+        """
+        Load (or start) a directory's manifest, let the caller change it and
+        save it, holding the directory's lock throughout, so concurrent
+        writers of one job (upload session completes, ingest next to
+        processing) never lose each other's entries
+        """
+        with _directory_lock(directory):
+            manifest = cls.load(directory) or cls(directory)
+            yield manifest
+            manifest.save()
+
+    @classmethod
+    def load_or_scan(cls, directory: Path, extensions: Iterable[str], save: bool = True) -> "JobManifest":
+        return cls.load(directory) or cls.scan(directory, extensions, save=save)
+
+    def add(self, image: ManifestImage):
+        # Re-adding a name replaces the entry (e.g. an image reprocessed in place)
+        existing = self.get(image.name)
+        if existing is not None:
+            self.images[self.images.index(existing)] = image
+        else:
+            self.images.append(image)
+        self._by_name[image.name] = image
+
+    def extend(self, images: Iterable[ManifestImage]):
+        for image in images:
+            self.add(image)
+
+    def remove(self, name: str):
+        self.images = [image for image in self.images if image.name != name]
+        self._by_name = None
+
+    def get(self, name: str) -> Optional[ManifestImage]:
+        if self._by_name is None:
+            self._by_name = {image.name: image for image in self.images}
+        return self._by_name.get(name)
+
+    def paths(self, extensions: Optional[Iterable[str]] = None) -> List[Path]:
+        """Image paths in manifest order, optionally limited to some extensions"""
+        if extensions is None:
+            return [self.directory / image.name for image in self.images]
+        extensions = {ext.lower() for ext in extensions}
+        return [
+            self.directory / image.name
+            for image in self.images
+            if Path(image.name).suffix.lower() in extensions
+        ]
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(image.size for image in self.images)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "version": MANIFEST_VERSION,
+            "count": len(self.images),
+            "total_bytes": self.total_bytes,
+            "images": [asdict(image) for image in self.images]
+        }
+
+    def save(self):
+        """
+        Write atomically so readers never see a half-written manifest; the
+        temporary file is unique, so concurrent writers never truncate each
+        other's (use updating() to also keep their entries)
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "w", dir=self.directory, prefix=".manifest.", suffix=".tmp", delete=False
+        ) as f:
+            tmp_path = Path(f.name)
+            try:
+                json.dump(self.to_dict(), f, separators=(",", ":"))
+            except BaseException:
+                f.close()
+                tmp_path.unlink(missing_ok=True)
+                raise
+        try:
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
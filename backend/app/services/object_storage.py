@@ -0,0 +1,556 @@
+"""
+Object Storage
+Pluggable storage for job files, addressed by keys like
+`processed/<job_id>/<filename>`:
+- LocalObjectStorage: a directory on this host, PROCESSED_DIR by default
+  (`processed/<job_id>/<filename>` is `<root>/<job_id>/<filename>`)
+- S3ObjectStorage: any S3-compatible service (AWS S3, MinIO, R2, ...)
+
+Both support streaming reads and writes, multipart uploads and
+presigned-URL downloads, so results written by a worker node can be served
+by any API node, or directly by the storage service.
+
+Select with OBJECT_STORAGE=local|s3 (S3_* variables for the s3 backend)
+"""
+
+import hashlib
+import hmac
+import logging
+import os
+import secrets
+import shutil
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+logger = logging.getLogger(__name__)
+
+READ_CHUNK_SIZE = 1024 * 1024
+MULTIPART_PART_SIZE = 8 * 1024 * 1024  # S3 requires >= 5 MB for every part but the last
+DEFAULT_URL_EXPIRES_SECONDS = 3600
+LOCAL_SIGNED_URL_PATH = "/api/v1/storage/objects"
+MULTIPART_DIR = ".multipart"
+
+
+class ObjectNotFoundError(KeyError):
+    pass
+
+
+@dataclass
+class ObjectInfo:
+    key: str
+    size: int
+    etag: str
+    last_modified: float
+
+
+def _clean_key(key: str) -> str:
+    """Reject keys that would escape the storage root"""
+    key = key.strip("/")
+    parts = key.split("/")
+    if not key or any(part in ("", ".", "..") for part in parts):
+        raise ValueError(f"Invalid object key: {key!r}")
+    return key
+
+
+class ObjectStorage:
+    """Interface for object storage drivers"""
+
+    is_local = False  # Keys map to files on this host (no upload/download needed)
+
+    def open(self, key: str) -> BinaryIO:
+        raise NotImplementedError("Subclasses must implement open method")
+
+    def iter_bytes(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        """Stream an object, optionally only the inclusive byte range start-end"""
+        raise NotImplementedError("Subclasses must implement iter_bytes method")
+
+    def write_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        """Store an object from an iterable of chunks; returns its size"""
+        raise NotImplementedError("Subclasses must implement write_stream method")
+
+    def put_file(self, key: str, path: Path):
+        raise NotImplementedError("Subclasses must implement put_file method")
+
+    def get_file(self, key: str, path: Path):
+        raise NotImplementedError("Subclasses must implement get_file method")
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        raise NotImplementedError("Subclasses must implement stat method")
+
+    def list(self, prefix: str) -> List[ObjectInfo]:
+        raise NotImplementedError("Subclasses must implement list method")
+
+    def delete(self, key: str):
+        raise NotImplementedError("Subclasses must implement delete method")
+
+    def delete_prefix(self, prefix: str) -> int:
+        raise NotImplementedError("Subclasses must implement delete_prefix method")
+
+    def presigned_url(self, key: str, expires_seconds: int = DEFAULT_URL_EXPIRES_SECONDS,
+                      filename: Optional[str] = None) -> str:
+        """Time-limited URL a client can download the object from without auth"""
+        raise NotImplementedError("Subclasses must implement presigned_url method")
+
+    # Multipart upload: parts can be sent by different requests / nodes
+    def create_multipart_upload(self, key: str) -> str:
+        raise NotImplementedError("Subclasses must implement create_multipart_upload method")
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        """Upload part `part_number` (1-based); returns its ETag"""
+        raise NotImplementedError("Subclasses must implement upload_part method")
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]):
+        raise NotImplementedError("Subclasses must implement complete_multipart_upload method")
+
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        raise NotImplementedError("Subclasses must implement abort_multipart_upload method")
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def put_directory(self, prefix: str, directory: Path) -> int:
+        """Upload every file under `directory` as `<prefix>/<relative path>`"""
+        count = 0
+        for path in sorted(directory.rglob("*")):
+            if path.is_file() and not path.name.startswith("."):
+                self.put_file(f"{prefix}/{path.relative_to(directory).as_posix()}", path)
+                count += 1
+        return count
+
+    def get_info(self):
+        return {"backend": self.__class__.__name__}
+
+
+class LocalObjectStorage(ObjectStorage):
+    """
+    Objects are files under `root`. With `key_prefix`, keys are
+    `<key_prefix>/<path under root>` and any other key is rejected; keys
+    never resolve outside `root` (symlinks included), since presigned URLs
+    serve them without auth. Presigned URLs point at this API
+    (LOCAL_SIGNED_URL_PATH) and carry an HMAC signature and expiry.
+    """
+
+    is_local = True
+
+    def __init__(self, root: Path, signing_key: Optional[str] = None, base_url: str = "",
+                 key_prefix: str = ""):
+        self.root = Path(root)
+        self.base_url = base_url.rstrip("/")
+        self.key_prefix = key_prefix.strip("/")
+        if not signing_key:
+            # Per-process key: URLs signed by one worker fail on the others
+            logger.warning("[OBJECT STORAGE] No OBJECT_STORAGE_SIGNING_KEY set, using a random key")
+            signing_key = secrets.token_hex(32)
+        self._signing_key = signing_key.encode()
+
+    def path_for(self, key: str) -> Path:
+        key = _clean_key(key)
+        if self.key_prefix:
+            if not key.startswith(self.key_prefix + "/"):
+                raise ValueError(f"Invalid object key: {key!r} (not under {self.key_prefix}/)")
+            key = key[len(self.key_prefix) + 1:]
+        path = self.root / key
+        root = self.root.resolve()
+        resolved = path.resolve()
+        if resolved != root and root not in resolved.parents:
+            raise ValueError(f"Invalid object key: {key!r} (outside the storage root)")
+        return path
+
+    def _key_for(self, path: Path) -> str:
+        key = path.relative_to(self.root).as_posix()
+        return f"{self.key_prefix}/{key}" if self.key_prefix else key
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return open(self.path_for(key), "rb")
+        except FileNotFoundError:
+            raise ObjectNotFoundError(key)
+
+    def iter_bytes(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        with self.open(key) as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                block = f.read(chunk_size if remaining is None else min(chunk_size, remaining))
+                if not block:
+                    break
+                if remaining is not None:
+                    remaining -= len(block)
+                yield block
+
+    def write_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        path = self.path_for(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{uuid.uuid4().hex}.part")
+        size = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        return size
+
+    def put_file(self, key: str, path: Path):
+        target = self.path_for(key)
+        if target.resolve() == Path(path).resolve():
+            return  # Already in place (keys mirror the working directories)
+        with open(path, "rb") as f:
+            self.write_stream(key, iter(lambda: f.read(READ_CHUNK_SIZE), b""))
+
+    def get_file(self, key: str, path: Path):
+        source = self.path_for(key)
+        if not source.exists():
+            raise ObjectNotFoundError(key)
+        if source.resolve() != Path(path).resolve():
+            shutil.copyfile(source, path)
+
+    def _info(self, key: str, path: Path) -> ObjectInfo:
+        stat_result = path.stat()
+        return ObjectInfo(
+            key=key,
+            size=stat_result.st_size,
+            etag=f"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}",
+            last_modified=stat_result.st_mtime
+        )
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        path = self.path_for(key)
+        try:
+            return self._info(key, path) if path.is_file() else None
+        except OSError:
+            return None
+
+    def list(self, prefix: str) -> List[ObjectInfo]:
+        directory = self.path_for(prefix)
+        if not directory.is_dir():
+            return []
+        return [
+            self._info(self._key_for(path), path)
+            for path in sorted(directory.rglob("*"))
+            if path.is_file() and not path.name.startswith(".")
+        ]
+
+    def delete(self, key: str):
+        self.path_for(key).unlink(missing_ok=True)
+
+    def delete_prefix(self, prefix: str) -> int:
+        objects = self.list(prefix)
+        shutil.rmtree(self.path_for(prefix), ignore_errors=True)
+        return len(objects)
+
+    # ---- signed URLs --------------------------------------------------------
+
+    def _signature(self, key: str, expires: int, filename: str) -> str:
+        message = f"{key}\n{expires}\n{filename}".encode()
+        return hmac.new(self._signing_key, message, hashlib.sha256).hexdigest()
+
+    def presigned_url(self, key: str, expires_seconds: int = DEFAULT_URL_EXPIRES_SECONDS,
+                      filename: Optional[str] = None) -> str:
+        key = _clean_key(key)
+        self.path_for(key)  # Never sign a key the route would refuse to serve
+        expires = int(time.time()) + expires_seconds
+        params = {"expires": expires, "signature": self._signature(key, expires, filename or "")}
+        if filename:
+            params["filename"] = filename
+        return f"{self.base_url}{LOCAL_SIGNED_URL_PATH}/{quote(key)}?{urlencode(params)}"
+
+    def verify_signature(self, key: str, expires: int, signature: str, filename: Optional[str] = None) -> bool:
+        if expires < time.time():
+            return False
+        expected = self._signature(_clean_key(key), expires, filename or "")
+        return hmac.compare_digest(expected, signature)
+
+    # ---- multipart ----------------------------------------------------------
+
+    def _upload_dir(self, upload_id: str) -> Path:
+        if not upload_id.isalnum():
+            raise ValueError(f"Invalid upload id: {upload_id!r}")
+        return self.root / MULTIPART_DIR / upload_id
+
+    def create_multipart_upload(self, key: str) -> str:
+        _clean_key(key)
+        upload_id = uuid.uuid4().hex
+        self._upload_dir(upload_id).mkdir(parents=True)
+        return upload_id
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        upload_dir = self._upload_dir(upload_id)
+        if not upload_dir.is_dir():
+            raise ObjectNotFoundError(upload_id)
+        tmp_path = upload_dir / f".{uuid.uuid4().hex}"
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, upload_dir / f"{part_number:05d}")
+        return hashlib.md5(data).hexdigest()
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]):
+        upload_dir = self._upload_dir(upload_id)
+        part_paths = [upload_dir / f"{part_number:05d}" for part_number, _ in sorted(parts)]
+        missing = [path.name for path in part_paths if not path.exists()]
+        if missing:
+            raise ObjectNotFoundError(f"Missing parts {missing} of upload {upload_id}")
+
+        def chunks():
+            for part_path in part_paths:
+                with open(part_path, "rb") as f:
+                    yield from iter(lambda: f.read(READ_CHUNK_SIZE), b"")
+
+        self.write_stream(key, chunks())
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        shutil.rmtree(self._upload_dir(upload_id), ignore_errors=True)
+
+    def get_info(self):
+        return {"backend": "local", "root": str(self.root.resolve()), "key_prefix": self.key_prefix}
+
+
+class S3ObjectStorage(ObjectStorage):
+    """
+    S3-compatible bucket through boto3. `endpoint_url` points it at MinIO
+    or another S3-compatible service; keys are stored under `prefix`.
+    """
+
+    def __init__(self, bucket: str, endpoint_url: Optional[str] = None, region: Optional[str] = None,
+                 access_key: Optional[str] = None, secret_key: Optional[str] = None, prefix: str = ""):
+        import boto3
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.prefix = prefix.strip("/")
+        self._client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            aws_access_key_id=access_key,
+            aws_secret_access_key=secret_key,
+            # Path-style addressing works with MinIO and other self-hosted services
+            config=Config(s3={"addressing_style": "path"}, signature_version="s3v4")
+        )
+        # Fail fast so a misconfigured bucket stops startup instead of the first upload
+        self._client.head_bucket(Bucket=bucket)
+
+    def _key(self, key: str) -> str:
+        key = _clean_key(key)
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def _is_not_found(self, error: Exception) -> bool:
+        code = getattr(error, "response", {}).get("Error", {}).get("Code")
+        return code in ("404", "NoSuchKey", "NotFound")
+
+    def open(self, key: str) -> BinaryIO:
+        try:
+            return self._client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"]
+        except Exception as e:
+            if self._is_not_found(e):
+                raise ObjectNotFoundError(key)
+            raise
+
+    def iter_bytes(self, key: str, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = READ_CHUNK_SIZE) -> Iterator[bytes]:
+        request = {"Bucket": self.bucket, "Key": self._key(key)}
+        if start or end is not None:
+            request["Range"] = f"bytes={start}-{'' if end is None else end}"
+        try:
+            body = self._client.get_object(**request)["Body"]
+        except Exception as e:
+            if self._is_not_found(e):
+                raise ObjectNotFoundError(key)
+            raise
+        try:
+            yield from body.iter_chunks(chunk_size)
+        finally:
+            body.close()
+
+    def write_stream(self, key: str, chunks: Iterable[bytes]) -> int:
+        """
+        Buffers one part at a time: objects smaller than a part are a single
+        PUT, larger ones a multipart upload, so memory stays at one part
+        """
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        size = 0
+        try:
+            for chunk in chunks:
+                buffer += chunk
+                size += len(chunk)
+                while len(buffer) >= MULTIPART_PART_SIZE:
+                    if upload_id is None:
+                        upload_id = self.create_multipart_upload(key)
+                    part_number = len(parts) + 1
+                    parts.append((part_number, self.upload_part(key, upload_id, part_number, bytes(buffer[:MULTIPART_PART_SIZE]))))
+                    del buffer[:MULTIPART_PART_SIZE]
+
+            if upload_id is None:
+                self._client.put_object(Bucket=self.bucket, Key=self._key(key), Body=bytes(buffer))
+                return size
+            if buffer:
+                part_number = len(parts) + 1
+                parts.append((part_number, self.upload_part(key, upload_id, part_number, bytes(buffer))))
+            self.complete_multipart_upload(key, upload_id, parts)
+        except BaseException:
+            if upload_id is not None:
+                self.abort_multipart_upload(key, upload_id)
+            raise
+        return size
+
+    def put_file(self, key: str, path: Path):
+        # boto3's transfer manager switches to parallel multipart for large files
+        self._client.upload_file(str(path), self.bucket, self._key(key))
+
+    def get_file(self, key: str, path: Path):
+        try:
+            self._client.download_file(self.bucket, self._key(key), str(path))
+        except Exception as e:
+            if self._is_not_found(e):
+                raise ObjectNotFoundError(key)
+            raise
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            head = self._client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except Exception as e:
+            if self._is_not_found(e):
+                return None
+            raise
+        return ObjectInfo(
+            key=key,
+            size=head["ContentLength"],
+            etag=head["ETag"].strip('"'),
+            last_modified=head["LastModified"].timestamp()
+        )
+
+    def list(self, prefix: str) -> List[ObjectInfo]:
+        full_prefix = self._key(prefix) + "/"
+        strip = len(self.prefix) + 1 if self.prefix else 0
+        objects = []
+        for page in self._client.get_paginator("list_objects_v2").paginate(Bucket=self.bucket, Prefix=full_prefix):
+            for entry in page.get("Contents", []):
+                objects.append(ObjectInfo(
+                    key=entry["Key"][strip:],
+                    size=entry["Size"],
+                    etag=entry["ETag"].strip('"'),
+                    last_modified=entry["LastModified"].timestamp()
+                ))
+        return objects
+
+    def delete(self, key: str):
+        self._client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = [self._key(info.key) for info in self.list(prefix)]
+        for start in range(0, len(keys), 1000):  # DeleteObjects limit
+            batch = keys[start:start + 1000]
+            self._client.delete_objects(
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True}
+            )
+        return len(keys)
+
+    def presigned_url(self, key: str, expires_seconds: int = DEFAULT_URL_EXPIRES_SECONDS,
+                      filename: Optional[str] = None) -> str:
+        params = {"Bucket": self.bucket, "Key": self._key(key)}
+        if filename:
+            params["ResponseContentDisposition"] = f'attachment; filename="{filename}"'
+        return self._client.generate_presigned_url("get_object", Params=params, ExpiresIn=expires_seconds)
+
+    def create_multipart_upload(self, key: str) -> str:
+        return self._client.create_multipart_upload(Bucket=self.bucket, Key=self._key(key))["UploadId"]
+
+    def upload_part(self, key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        response = self._client.upload_part(
+            Bucket=self.bucket, Key=self._key(key), UploadId=upload_id, PartNumber=part_number, Body=data
+        )
+        return response["ETag"]
+
+    def complete_multipart_upload(self, key: str, upload_id: str, parts: List[Tuple[int, str]]):
+        self._client.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": number, "ETag": etag} for number, etag in sorted(parts)]}
+        )
+
+    def abort_multipart_upload(self, key: str, upload_id: str):
+        self._client.abort_multipart_upload(Bucket=self.bucket, Key=self._key(key), UploadId=upload_id)
+
+    def get_info(self):
+        return {"backend": "s3", "bucket": self.bucket, "endpoint_url": self.endpoint_url, "prefix": self.prefix}
+
+
+def create_object_storage() -> ObjectStorage:
+    """Build the object storage configured through environment variables"""
+    backend = os.getenv("OBJECT_STORAGE", "local").lower()
+
+    if backend == "s3":
+        bucket = os.getenv("S3_BUCKET", "masterpost")
+        # No fallback: nodes on local storage would each see only their own results
+        try:
+            storage = S3ObjectStorage(
+                bucket,
+                endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+                region=os.getenv("S3_REGION") or None,
+                access_key=os.getenv("S3_ACCESS_KEY_ID") or None,
+                secret_key=os.getenv("S3_SECRET_ACCESS_KEY") or None,
+                prefix=os.getenv("S3_PREFIX", "")
+            )
+        except ImportError as e:
+            raise RuntimeError("OBJECT_STORAGE=s3 requires boto3 (pip install boto3)") from e
+        except Exception as e:
+            raise RuntimeError(f"OBJECT_STORAGE=s3 but bucket {bucket} is unavailable: {e}") from e
+        logger.info(f"[OBJECT STORAGE] Using S3-compatible bucket {bucket}")
+        return storage
+    if backend != "local":
+        raise RuntimeError(f"Unknown OBJECT_STORAGE '{backend}' (expected 'local' or 's3')")
+
+    # Only job results are served from local storage: the root is the
+    # processed directory, and `processed/<job_id>/...` keys map into it
+    root = Path(os.getenv("LOCAL_STORAGE_ROOT", "processed"))
+    logger.info(f"[OBJECT STORAGE] Using local object storage at {root.resolve()}")
+
+    signing_key = os.getenv("OBJECT_STORAGE_SIGNING_KEY")
+    if not signing_key and os.getenv("JWT_SECRET"):
+        logger.error(
+            "[OBJECT STORAGE] OBJECT_STORAGE_SIGNING_KEY is not set, signing download URLs with JWT_SECRET. "
+            "Set a dedicated secret: as it is, leaking either one exposes both"
+        )
+        signing_key = os.getenv("JWT_SECRET")
+    return LocalObjectStorage(
+        root,
+        signing_key=signing_key,
+        base_url=os.getenv("BACKEND_URL", ""),
+        key_prefix="processed"
+    )
+
+
+def publish_job_results(job_id: str, processed_dir: Path, storage: Optional[ObjectStorage] = None) -> int:
+    """
+    Completion hook: copy a finished job's outputs to `processed/<job_id>/`
+
+    Local storage already serves PROCESSED_DIR, so nothing is copied there.
+    Every code path that completes a job calls this, so any API node (or the
+    bucket itself) can serve the results.
+
+    Returns:
+        Number of files published
+    """
+    storage = storage or object_storage
+    if storage.is_local:
+        return 0
+    published = storage.put_directory(f"processed/{job_id}", Path(processed_dir))
+    logger.info(f"[OBJECT STORAGE] Published {published} files of job {job_id}")
+    return published
+
+
+# Global instance
+object_storage = create_object_storage()
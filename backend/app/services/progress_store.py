@@ -0,0 +1,208 @@
+"""
+Job Progress Store
+Pluggable storage for per-job progress snapshots:
+- InMemoryProgressStore: single process, TTL eviction and a size cap
+- RedisProgressStore: shared between uvicorn workers / hosts
+
+Select with PROGRESS_STORE=memory|redis (REDIS_URL for the redis backend)
+
+set() never blocks on the network, so update_progress() can be called from
+the event loop; get() and list_jobs() may, so async code calls them in a
+threadpool.
+"""
+
+import concurrent.futures
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_SECONDS = 6 * 3600  # Keep finished jobs answerable for 6 hours
+DEFAULT_MAX_JOBS = 10000
+
+
+class ProgressStore:
+    """Interface for progress snapshot storage"""
+
+    def set(self, job_id: str, snapshot: Dict[str, Any]):
+        raise NotImplementedError("Subclasses must implement set method")
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError("Subclasses must implement get method")
+
+    def delete(self, job_id: str):
+        raise NotImplementedError("Subclasses must implement delete method")
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """All live snapshots, each including its job_id"""
+        raise NotImplementedError("Subclasses must implement list_jobs method")
+
+    def get_info(self) -> Dict[str, Any]:
+        return {"backend": self.__class__.__name__}
+
+
+class InMemoryProgressStore(ProgressStore):
+    """
+    Process-local store.
+    Entries expire `ttl_seconds` after their last update, and the least
+    recently updated entries are evicted once `max_jobs` is exceeded.
+    """
+
+    def __init__(self, ttl_seconds: int = DEFAULT_TTL_SECONDS, max_jobs: int = DEFAULT_MAX_JOBS):
+        self.ttl_seconds = ttl_seconds
+        self.max_jobs = max_jobs
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._expires_at: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def _evict_locked(self, now: float):
+        # Entries are kept in update order, so expired ones are at the front
+        while self._entries:
+            job_id = next(iter(self._entries))
+            if self._expires_at[job_id] > now and len(self._entries) <= self.max_jobs:
+                break
+            del self._entries[job_id]
+            del self._expires_at[job_id]
+            self.evicted += 1
+
+    def set(self, job_id: str, snapshot: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._entries[job_id] = snapshot
+            self._entries.move_to_end(job_id)
+            self._expires_at[job_id] = now + self.ttl_seconds
+            self._evict_locked(now)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            snapshot = self._entries.get(job_id)
+            if snapshot is None:
+                return None
+            if self._expires_at[job_id] <= now:
+                self._evict_locked(now)
+                return None
+            return dict(snapshot)
+
+    def delete(self, job_id: str):
+        with self._lock:
+            self._entries.pop(job_id, None)
+            self._expires_at.pop(job_id, None)
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._evict_locked(now)
+            return [{"job_id": job_id, **snapshot} for job_id, snapshot in self._entries.items()]
+
+    def get_info(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "backend": "memory",
+            "jobs": size,
+            "max_jobs": self.max_jobs,
+            "ttl_seconds": self.ttl_seconds,
+            "evicted": self.evicted
+        }
+
+
+class RedisProgressStore(ProgressStore):
+    """
+    Redis-backed store so any worker process can answer /progress.
+    Each job is one key holding the JSON snapshot, with a TTL refreshed on update.
+    Writes go through one background thread, in order, so set() returns
+    without waiting for a Redis round trip.
+    """
+
+    KEY_PREFIX = "masterpost:progress:"
+
+    def __init__(self, redis_url: str, ttl_seconds: int = DEFAULT_TTL_SECONDS):
+        import redis
+
+        self.ttl_seconds = ttl_seconds
+        self.redis_url = redis_url
+        self._client = redis.Redis.from_url(redis_url, socket_timeout=2, decode_responses=True)
+        # Fail fast so create_progress_store() can fall back to memory
+        self._client.ping()
+        self._writer = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="progress-redis")
+
+    def _key(self, job_id: str) -> str:
+        return f"{self.KEY_PREFIX}{job_id}"
+
+    def set(self, job_id: str, snapshot: Dict[str, Any]):
+        self._writer.submit(self._write, job_id, json.dumps(snapshot))
+
+    def _write(self, job_id: str, payload: str):
+        try:
+            self._client.set(self._key(job_id), payload, ex=self.ttl_seconds)
+        except Exception as e:
+            logger.error(f"[PROGRESS STORE] Redis set failed for {job_id}: {e}")
+
+    def flush(self):
+        """Wait until every queued write has reached Redis"""
+        self._writer.submit(lambda: None).result()
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            raw = self._client.get(self._key(job_id))
+        except Exception as e:
+            logger.error(f"[PROGRESS STORE] Redis get failed for {job_id}: {e}")
+            return None
+        return json.loads(raw) if raw else None
+
+    def delete(self, job_id: str):
+        # Queued behind pending writes, so a late set() cannot resurrect the job
+        self._writer.submit(self._remove, job_id)
+
+    def _remove(self, job_id: str):
+        try:
+            self._client.delete(self._key(job_id))
+        except Exception as e:
+            logger.error(f"[PROGRESS STORE] Redis delete failed for {job_id}: {e}")
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        jobs = []
+        try:
+            keys = list(self._client.scan_iter(match=f"{self.KEY_PREFIX}*", count=500))
+            if keys:
+                for key, raw in zip(keys, self._client.mget(keys)):
+                    if raw:
+                        jobs.append({"job_id": key[len(self.KEY_PREFIX):], **json.loads(raw)})
+        except Exception as e:
+            logger.error(f"[PROGRESS STORE] Redis scan failed: {e}")
+        return jobs
+
+    def get_info(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis",
+            "redis_url": self.redis_url.split("@")[-1],  # Hide credentials
+            "ttl_seconds": self.ttl_seconds
+        }
+
+
+def create_progress_store() -> ProgressStore:
+    """Build the progress store configured through environment variables"""
+    backend = os.getenv("PROGRESS_STORE", "memory").lower()
+    ttl_seconds = int(os.getenv("PROGRESS_TTL_SECONDS", DEFAULT_TTL_SECONDS))
+    max_jobs = int(os.getenv("PROGRESS_MAX_JOBS", DEFAULT_MAX_JOBS))
+
+    if backend == "redis":
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        try:
+            store = RedisProgressStore(redis_url, ttl_seconds=ttl_seconds)
+            logger.info("[PROGRESS STORE] Using Redis progress store")
+            return store
+        except ImportError:
+            logger.warning("redis not installed - falling back to in-memory progress store")
+        except Exception as e:
+            logger.warning(f"Redis unavailable ({e}) - falling back to in-memory progress store")
+
+    logger.info(f"[PROGRESS STORE] Using in-memory progress store (ttl={ttl_seconds}s, max_jobs={max_jobs})")
+    return InMemoryProgressStore(ttl_seconds=ttl_seconds, max_jobs=max_jobs)
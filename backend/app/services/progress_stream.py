@@ -0,0 +1,218 @@
+"""
+Job Progress Streaming (Server-Sent Events)
+Pushes progress deltas and per-image completion events to connected clients
+instead of having the frontend poll /api/v1/progress on a timer
+"""
+
+import asyncio
+import json
+import logging
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Statuses after which no more updates will be published for a job
+TERMINAL_STATUSES = {"completed", "error"}
+
+
+class ProgressSubscription:
+    """
+    A single connected client watching one job.
+
+    Progress snapshots are coalesced: only the latest one is kept, so a slow
+    client skips intermediate percentages instead of queueing them. Per-image
+    events go into a bounded buffer; overflow is counted and reported once.
+    """
+
+    def __init__(self, job_id: str, loop: asyncio.AbstractEventLoop, max_events: int = 100):
+        self.job_id = job_id
+        self._loop = loop
+        self._wakeup = asyncio.Event()
+        self._lock = threading.Lock()
+        self._latest: Optional[Dict[str, Any]] = None
+        self._events: deque = deque(maxlen=max_events)
+        self._dropped = 0
+
+    def push_progress(self, snapshot: Dict[str, Any]):
+        """Replace the pending snapshot (safe to call from any thread)"""
+        with self._lock:
+            self._latest = snapshot
+        self._notify()
+
+    def push_event(self, event: Dict[str, Any]):
+        """Queue a per-image event (safe to call from any thread)"""
+        with self._lock:
+            if len(self._events) == self._events.maxlen:
+                self._dropped += 1
+            self._events.append(event)
+        self._notify()
+
+    def _notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        except RuntimeError:
+            # Event loop already closed - client is gone
+            pass
+
+    async def next_batch(self, timeout: float) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]], int]:
+        """
+        Wait for pending updates and drain them
+
+        Returns:
+            (latest snapshot or None, image events, number of dropped events)
+        """
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+
+        with self._lock:
+            latest, self._latest = self._latest, None
+            events = list(self._events)
+            self._events.clear()
+            dropped, self._dropped = self._dropped, 0
+
+        return latest, events, dropped
+
+
+class ProgressBroadcaster:
+    """Fan-out of job progress updates to every subscription for that job"""
+
+    def __init__(self):
+        self._subscribers: Dict[str, Set[ProgressSubscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, job_id: str) -> ProgressSubscription:
+        """Register a new subscription (must be called from the event loop)"""
+        subscription = ProgressSubscription(job_id, asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.setdefault(job_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: ProgressSubscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.job_id)
+            if subscribers:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.job_id]
+
+    def _get_subscribers(self, job_id: str) -> List[ProgressSubscription]:
+        with self._lock:
+            return list(self._subscribers.get(job_id, ()))
+
+    def publish_progress(self, job_id: str, snapshot: Dict[str, Any]):
+        """Publish a full progress snapshot for a job"""
+        for subscription in self._get_subscribers(job_id):
+            subscription.push_progress(snapshot)
+
+    def publish_image(self, job_id: str, event: Dict[str, Any]):
+        """Publish a per-image completion event for a job"""
+        for subscription in self._get_subscribers(job_id):
+            subscription.push_event(event)
+
+    def subscriber_count(self, job_id: Optional[str] = None) -> int:
+        with self._lock:
+            if job_id is not None:
+                return len(self._subscribers.get(job_id, ()))
+            return sum(len(s) for s in self._subscribers.values())
+
+
+def format_sse(event: str, data: Any) -> str:
+    """Format a single Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+def _progress_delta(previous: Optional[Dict[str, Any]], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Fields of `current` that changed since `previous`"""
+    if previous is None:
+        return dict(current)
+    return {key: value for key, value in current.items() if previous.get(key) != value}
+
+
+async def stream_job_progress(
+    broadcaster: "ProgressBroadcaster",
+    job_id: str,
+    get_snapshot: Callable[[str], Optional[Dict[str, Any]]],
+    min_interval: float = 0.5,
+    store_poll_interval: float = 2.0,
+    heartbeat_interval: float = 15.0
+) -> AsyncIterator[str]:
+    """
+    Async generator producing the SSE stream for one job
+
+    Args:
+        broadcaster: Broadcaster that update_progress publishes to
+        job_id: Job to watch
+        get_snapshot: Returns the current progress snapshot for a job (or None);
+            may block (Redis), so it is called in the default executor
+        min_interval: Minimum seconds between frames; updates inside the
+            window are coalesced into the next frame
+        store_poll_interval: Seconds without local events before re-reading
+            the progress store (picks up jobs running in another worker)
+        heartbeat_interval: Seconds of silence before a keep-alive comment
+
+    Yields:
+        SSE-formatted strings
+    """
+    subscription = broadcaster.subscribe(job_id)
+    last_sent: Optional[Dict[str, Any]] = None
+    idle = 0.0
+    loop = asyncio.get_running_loop()
+
+    try:
+        # Subscribe before reading the snapshot so no update is lost in between
+        snapshot = await loop.run_in_executor(None, get_snapshot, job_id)
+        if snapshot is None:
+            snapshot = {"status": "unknown", "current": 0, "total": 0, "percentage": 0}
+        yield format_sse("progress", {"job_id": job_id, **snapshot})
+        last_sent = snapshot
+
+        while last_sent.get("status") not in TERMINAL_STATUSES:
+            wait = min(store_poll_interval, heartbeat_interval)
+            latest, events, dropped = await subscription.next_batch(wait)
+
+            if latest is None and not events and not dropped:
+                # No local events: the job may be running in another worker
+                stored = await loop.run_in_executor(None, get_snapshot, job_id)
+                if stored is None and last_sent.get("status") == "unknown":
+                    # Unknown or expired job id, still absent from the store: don't wait forever
+                    break
+                if stored is not None and stored != last_sent:
+                    latest = stored
+                else:
+                    idle += wait
+                    if idle >= heartbeat_interval:
+                        idle = 0.0
+                        yield ": keep-alive\n\n"
+                    continue
+
+            idle = 0.0
+
+            for event in events:
+                yield format_sse("image", event)
+
+            if dropped:
+                yield format_sse("images_dropped", {"count": dropped})
+
+            if latest is not None:
+                delta = _progress_delta(last_sent, latest)
+                if delta:
+                    yield format_sse("progress", delta)
+                last_sent = latest
+
+            # Let updates pile up for a moment so fast jobs don't flood the client
+            if last_sent.get("status") not in TERMINAL_STATUSES:
+                await asyncio.sleep(min_interval)
+
+        yield format_sse("end", {"job_id": job_id, "status": last_sent.get("status")})
+
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+# Global broadcaster instance
+progress_broadcaster = ProgressBroadcaster()
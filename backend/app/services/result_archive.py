@@ -0,0 +1,193 @@
+"""
+Result Archives
+The download ZIP of a job is built while the job runs: each processed image
+is appended as soon as it is written (STORED for formats that are already
+compressed). At completion the archive is finalized under the job's
+completion version, so a download is a plain file send and repeated
+downloads reuse the same file until the job's results change.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import threading
+import uuid
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+
+from app.services.http_cache import conditional_file_response, strong_etag
+from app.services.job_manifest import JobManifest, ManifestImage
+from app.services.zip_stream import stream_zip, zip_compression_for
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_LABEL = "results"  # Archives are <label>-<version>.zip in the processed directory
+BUILDING_ARCHIVE = "results.zip.part"
+
+
+def completion_version(manifest: JobManifest) -> str:
+    """
+    Version of a job's results: changes whenever an image is added,
+    removed or rewritten (content hashes come from the manifest)
+    """
+    digest = hashlib.sha256()
+    for image in sorted(manifest.images, key=lambda image: image.name):
+        digest.update(f"{image.name}:{image.sha256}\n".encode())
+    return digest.hexdigest()[:16]
+
+
+def archive_member_name(image: ManifestImage) -> str:
+    """
+    Entry name of an image in the archive: multi-target outputs are grouped
+    per marketplace (img_001_ebay.jpg -> ebay/img_001.jpg)
+    """
+    if not image.variant:
+        return image.name
+    path = Path(image.name)
+    stem = path.stem[:-len(image.variant) - 1] if path.stem.endswith(f"_{image.variant}") else path.stem
+    return f"{image.variant}/{stem}{path.suffix}"
+
+
+def archive_members(manifest: JobManifest) -> List[Tuple[Path, str]]:
+    """(path, entry name) of every image of a manifest"""
+    return [(manifest.directory / image.name, archive_member_name(image)) for image in manifest.images]
+
+
+def archive_path(processed_dir: Path, version: str, label: str = ARCHIVE_LABEL) -> Path:
+    """
+    Archive location; `label` tells apart archives of the same results with
+    different entry names (e.g. the router downloads prefix the pipeline)
+    """
+    label = re.sub(r"[^A-Za-z0-9_]+", "_", label)
+    return processed_dir / f"{label}-{version}.zip"
+
+
+def cached_archive(processed_dir: Path, version: str, label: str = ARCHIVE_LABEL) -> Optional[Path]:
+    """Finished archive for this version of the results, if there is one"""
+    path = archive_path(processed_dir, version, label)
+    return path if path.exists() else None
+
+
+def _remove_stale_archives(keep: Path):
+    label = keep.name.rsplit("-", 1)[0]
+    for path in keep.parent.glob(f"{label}-*.zip"):
+        if path != keep:
+            path.unlink(missing_ok=True)
+
+
+class ResultArchiveBuilder:
+    """
+    Appends processed images to `<processed_dir>/results.zip.part` as they
+    finish. Safe to call from the batch processor's worker threads.
+    """
+
+    def __init__(self, processed_dir: Path):
+        self.processed_dir = processed_dir
+        self.part_path = processed_dir / BUILDING_ARCHIVE
+        self._lock = threading.Lock()
+        self._names = set()
+        self._zip = zipfile.ZipFile(self.part_path, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+
+    def add(self, path: Path, arcname: Optional[str] = None):
+        arcname = arcname or path.name
+        with self._lock:
+            if self._zip is None or arcname in self._names:
+                return
+            self._zip.write(path, arcname, compress_type=zip_compression_for(arcname))
+            self._names.add(arcname)
+
+    def finalize(self, version: str) -> Path:
+        """Write the central directory and publish the archive under `version`"""
+        with self._lock:
+            self._zip.close()
+            self._zip = None
+        path = archive_path(self.processed_dir, version)
+        os.replace(self.part_path, path)
+        _remove_stale_archives(keep=path)
+        logger.info(f"[RESULT ARCHIVE] {path} ready ({len(self._names)} images)")
+        return path
+
+    def abort(self):
+        with self._lock:
+            if self._zip is not None:
+                self._zip.close()
+                self._zip = None
+        self.part_path.unlink(missing_ok=True)
+
+
+def stream_and_cache_archive(processed_dir: Path, version: str, files: Iterable[Tuple[Path, str]],
+                             label: str = ARCHIVE_LABEL) -> Iterator[bytes]:
+    """
+    Stream a ZIP to the client and keep a copy as the cached archive
+
+    Used when no finished archive exists (e.g. jobs from before archives
+    were built during processing). The copy only becomes the cached
+    archive once the whole stream was sent.
+    """
+    part_path = processed_dir / f".{uuid.uuid4().hex}.zip.part"
+    try:
+        with open(part_path, "wb") as cache:
+            for chunk in stream_zip(files):
+                cache.write(chunk)
+                yield chunk
+        path = archive_path(processed_dir, version, label)
+        os.replace(part_path, path)
+        _remove_stale_archives(keep=path)
+    finally:
+        part_path.unlink(missing_ok=True)
+
+
+def build_archive(processed_dir: Path, version: str, files: Iterable[Tuple[Path, str]],
+                  label: str = ARCHIVE_LABEL) -> Path:
+    """Write the cached archive without sending it anywhere"""
+    for _ in stream_and_cache_archive(processed_dir, version, files, label):
+        pass
+    return archive_path(processed_dir, version, label)
+
+
+async def archive_download_response(
+    request: Request,
+    manifest: JobManifest,
+    files: List[Tuple[Path, str]],
+    filename: str,
+    label: str = ARCHIVE_LABEL,
+    complete: bool = True
+) -> Response:
+    """
+    Download response for a job's result archive
+
+    A finished archive for the current version is sent as a file, with
+    ETag / 304 and Range / If-Range support so interrupted downloads can
+    resume. Without one, the archive is streamed while it is generated
+    (and cached for the next request if the job is complete); a Range
+    request on a complete job builds the archive first so it can be
+    served partially.
+    """
+    processed_dir = manifest.directory
+    version = completion_version(manifest)
+    archive = cached_archive(processed_dir, version, label)
+
+    if archive is None and complete and request.headers.get("range"):
+        archive = await run_in_threadpool(build_archive, processed_dir, version, files, label)
+
+    if archive is not None:
+        stat_result = archive.stat()
+        # The version covers the content; size and mtime tell apart rebuilds of it
+        etag = strong_etag(version, f"{stat_result.st_size:x}", f"{stat_result.st_mtime_ns:x}")
+        return conditional_file_response(
+            request, archive, "application/zip",
+            etag=etag, cache_control="private, no-cache", filename=filename
+        )
+
+    stream = stream_and_cache_archive(processed_dir, version, files, label) if complete else stream_zip(files)
+    return StreamingResponse(
+        stream,
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
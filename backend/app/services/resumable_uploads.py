@@ -0,0 +1,315 @@
+"""
+Resumable Chunked Uploads
+Upload sessions for large archives over unreliable connections. The client
+creates a session, PUTs chunks at explicit offsets with a SHA-256 per chunk,
+and after a failure asks for the current offset and resends only what is
+missing. Data is appended to a per-session `.part` file inside the job's
+upload directory, so a completed session looks exactly like a regular
+/upload.
+"""
+
+import asyncio
+import concurrent.futures
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+from app.services.upload_storage import StoredUpload, UploadTooLargeError, hash_file, safe_filename
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024  # 8MB suggested to clients
+MAX_CHUNK_SIZE = 32 * 1024 * 1024  # 32MB hard limit per PUT
+DEFAULT_SESSION_TTL = 24 * 3600  # Resume window
+WRITE_BLOCK_SIZE = 1024 * 1024  # Request pieces are batched into blocks written off the event loop
+SESSION_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class ResumableUploadError(ValueError):
+    """Base class for upload session errors"""
+
+
+class UploadSessionNotFoundError(ResumableUploadError):
+    pass
+
+
+class ChunkOffsetMismatchError(ResumableUploadError):
+    """Chunk does not start where the stored data ends"""
+
+    def __init__(self, expected_offset: int):
+        self.expected_offset = expected_offset
+        super().__init__(f"Chunk must start at offset {expected_offset}")
+
+
+class ChunkChecksumMismatchError(ResumableUploadError):
+    pass
+
+
+class IncompleteUploadError(ResumableUploadError):
+    pass
+
+
+class ResumableUploadStore:
+    """
+    Session metadata lives in `<upload_dir>/.resumable/<session_id>.json`;
+    data goes to `<upload_dir>/<job_id>/.<session_id>.part`, so sessions
+    uploading the same filename to one job never share a file. The size of
+    the part file is the committed offset, so sessions survive restarts.
+    """
+
+    def __init__(self, upload_dir: Path, ttl_seconds: int = DEFAULT_SESSION_TTL,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_chunk_size: int = MAX_CHUNK_SIZE):
+        self.upload_dir = upload_dir
+        self.sessions_dir = upload_dir / ".resumable"
+        self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.chunk_size = chunk_size
+        self.max_chunk_size = max_chunk_size
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Chunk writes and hashing, off the event loop
+        self._io = concurrent.futures.ThreadPoolExecutor(max_workers=4, thread_name_prefix="resumable-io")
+
+    def _session_file(self, session_id: str) -> Path:
+        return self.sessions_dir / f"{session_id}.json"
+
+    def _part_path(self, session: Dict[str, Any]) -> Path:
+        # Sessions created before part files were keyed by session id have no part_name
+        part_name = session.get("part_name", f"{session['filename']}.part")
+        return self.upload_dir / session["job_id"] / part_name
+
+    @staticmethod
+    def _claim_destination(directory: Path, filename: str) -> Path:
+        """
+        Reserve a file name in the job directory that no other upload uses:
+        `name.ext`, then `name_1.ext`, `name_2.ext`, ... (created exclusively,
+        so two sessions completing at once never pick the same name)
+        """
+        stem, suffix = Path(filename).stem, Path(filename).suffix
+        candidate, counter = filename, 0
+        while True:
+            destination = directory / candidate
+            try:
+                os.close(os.open(destination, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return destination
+            except FileExistsError:
+                counter += 1
+                candidate = f"{stem}_{counter}{suffix}"
+
+    @staticmethod
+    def _write_block(part, hasher, block: bytes):
+        hasher.update(block)
+        part.write(block)
+
+    def _save(self, session: Dict[str, Any]):
+        session_file = self._session_file(session["session_id"])
+        tmp_file = session_file.with_suffix(".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(session, f)
+        os.replace(tmp_file, session_file)
+
+    def _lock(self, session_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(session_id, asyncio.Lock())
+
+    def create(self, filename: str, size: int, max_size: int,
+               job_id: Optional[str] = None, sha256: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Open a new upload session
+
+        Args:
+            filename: Client filename (directory parts are stripped)
+            size: Total size the client will send
+            max_size: Size limit for this kind of file
+            job_id: Existing job to add the file to; a new job is created if None
+            sha256: Optional checksum of the whole file, verified on completion
+        """
+        if size <= 0:
+            raise ResumableUploadError("size must be positive")
+        if size > max_size:
+            raise UploadTooLargeError(filename, max_size)
+
+        if job_id is None:
+            job_id = str(uuid.uuid4())
+        else:
+            try:
+                job_id = str(uuid.UUID(job_id))
+            except ValueError:
+                raise UploadSessionNotFoundError(f"Invalid job_id {job_id}")
+            if not (self.upload_dir / job_id).is_dir():
+                raise UploadSessionNotFoundError(f"Job {job_id} not found")
+
+        now = time.time()
+        session_id = uuid.uuid4().hex
+        session = {
+            "session_id": session_id,
+            "job_id": job_id,
+            "filename": safe_filename(filename),
+            "original_filename": filename,
+            "part_name": f".{session_id}.part",
+            "size": size,
+            "sha256": sha256.lower() if sha256 else None,
+            "created_at": now,
+            "updated_at": now
+        }
+
+        part_path = self._part_path(session)
+        part_path.parent.mkdir(parents=True, exist_ok=True)
+        part_path.touch()
+        self._save(session)
+
+        logger.info(f"[RESUMABLE] Session {session['session_id']} for {filename} ({size} bytes) -> job {job_id}")
+        return self.describe(session)
+
+    def get(self, session_id: str) -> Dict[str, Any]:
+        """Raw session metadata (raises if unknown or expired)"""
+        if not SESSION_ID_PATTERN.match(session_id or ""):
+            raise UploadSessionNotFoundError(f"Upload session {session_id} not found")
+        try:
+            with open(self._session_file(session_id)) as f:
+                session = json.load(f)
+        except (OSError, ValueError):
+            raise UploadSessionNotFoundError(f"Upload session {session_id} not found")
+
+        if time.time() - session["updated_at"] > self.ttl_seconds:
+            self.discard(session)
+            raise UploadSessionNotFoundError(f"Upload session {session_id} expired")
+        return session
+
+    def describe(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Client view of a session, including the committed offset"""
+        part_path = self._part_path(session)
+        offset = part_path.stat().st_size if part_path.exists() else 0
+        return {
+            "session_id": session["session_id"],
+            "job_id": session["job_id"],
+            "filename": session["original_filename"],
+            "size": session["size"],
+            "offset": offset,
+            "complete": offset == session["size"],
+            "chunk_size": self.chunk_size,
+            "max_chunk_size": self.max_chunk_size,
+            "expires_at": session["updated_at"] + self.ttl_seconds
+        }
+
+    async def write_chunk(self, session_id: str, offset: int, chunks: AsyncIterator[bytes],
+                          checksum: str) -> Dict[str, Any]:
+        """
+        Append one chunk at `offset`
+
+        The chunk is streamed to the part file while it is hashed; if the
+        checksum does not match (or the stream breaks) the file is cut back
+        to `offset`, so the committed offset only ever covers verified data.
+
+        Raises:
+            ChunkOffsetMismatchError: offset is not the committed offset
+            ChunkChecksumMismatchError: data does not match `checksum`
+            UploadTooLargeError: chunk exceeds max_chunk_size or the declared size
+        """
+        async with self._lock(session_id):
+            session = self.get(session_id)
+            part_path = self._part_path(session)
+            committed = part_path.stat().st_size if part_path.exists() else 0
+            if offset != committed:
+                raise ChunkOffsetMismatchError(committed)
+
+            # File writes and hashing run on the IO threads, a block at a time
+            hasher = hashlib.sha256()
+            written = 0
+            pending = []
+            pending_size = 0
+            block_write = None
+            with open(part_path, "ab") as part:
+                try:
+                    async for data in chunks:
+                        written += len(data)
+                        if written > self.max_chunk_size:
+                            raise UploadTooLargeError("chunk", self.max_chunk_size)
+                        if committed + written > session["size"]:
+                            raise UploadTooLargeError(session["original_filename"], session["size"])
+                        pending.append(data)
+                        pending_size += len(data)
+                        if pending_size >= WRITE_BLOCK_SIZE:
+                            block_write = self._io.submit(self._write_block, part, hasher, b"".join(pending))
+                            await asyncio.wrap_future(block_write)
+                            pending, pending_size = [], 0
+                    if pending:
+                        block_write = self._io.submit(self._write_block, part, hasher, b"".join(pending))
+                        await asyncio.wrap_future(block_write)
+
+                    if hasher.hexdigest() != (checksum or "").lower():
+                        raise ChunkChecksumMismatchError("Chunk checksum mismatch")
+                except BaseException:
+                    if block_write is not None:
+                        # A cancelled request leaves its block write running: let it finish first
+                        concurrent.futures.wait([block_write])
+                    part.truncate(committed)
+                    raise
+
+            session["updated_at"] = time.time()
+            self._save(session)
+            return self.describe(session)
+
+    async def complete(self, session_id: str) -> StoredUpload:
+        """
+        Finish a session: move the part file into place in the job directory
+
+        An existing file of the same name (a regular upload, or another
+        session) is never replaced: the upload gets a `_1`, `_2`, ... suffix.
+
+        Raises:
+            IncompleteUploadError: not all bytes have been received
+            ChunkChecksumMismatchError: whole-file sha256 given at creation does not match
+        """
+        async with self._lock(session_id):
+            session = self.get(session_id)
+            part_path = self._part_path(session)
+            received = part_path.stat().st_size if part_path.exists() else 0
+            if received != session["size"]:
+                raise IncompleteUploadError(f"Received {received} of {session['size']} bytes")
+
+            # Hash off the event loop; chunks were verified, this is for the file record
+            sha256 = await asyncio.wrap_future(self._io.submit(hash_file, part_path))
+            if session["sha256"] and sha256 != session["sha256"]:
+                raise ChunkChecksumMismatchError("File checksum mismatch")
+
+            destination = self._claim_destination(part_path.parent, session["filename"])
+            os.replace(part_path, destination)
+            self._session_file(session_id).unlink(missing_ok=True)
+            self._locks.pop(session_id, None)
+
+            logger.info(f"[RESUMABLE] Session {session_id} complete: {destination}")
+            return StoredUpload(path=destination, size=received, sha256=sha256)
+
+    def discard(self, session: Dict[str, Any]):
+        """Drop a session and its partial data"""
+        self._part_path(session).unlink(missing_ok=True)
+        self._session_file(session["session_id"]).unlink(missing_ok=True)
+        self._locks.pop(session["session_id"], None)
+        job_dir = self.upload_dir / session["job_id"]
+        try:
+            job_dir.rmdir()  # Only if nothing else was uploaded to the job
+        except OSError:
+            pass
+
+    def purge_expired(self) -> int:
+        """Remove sessions idle for longer than the TTL; returns how many were removed"""
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for session_file in self.sessions_dir.glob("*.json"):
+            try:
+                with open(session_file) as f:
+                    session = json.load(f)
+                if session["updated_at"] < cutoff:
+                    self.discard(session)
+                    removed += 1
+            except (OSError, ValueError, KeyError):
+                continue
+        if removed:
+            logger.info(f"[RESUMABLE] Purged {removed} expired upload sessions")
+        return removed
+
@@ -9,10 +9,13 @@ from PIL import Image, ImageFilter
 import io
 import logging
 import os
+import time
 from pathlib import Path
+from typing import Dict, List
 
 # Import shadow effects module (working version with class-based approach)
 from ..processing.shadow_effects import apply_professional_shadow, ShadowEffects
+from ..processing.variants import MarketplaceTarget, compose_on_white, render_variants, resolve_shadow_type
 
 # Import Qwen premium service
 try:
@@ -93,7 +96,90 @@ def apply_simple_shadow(img_rgba: Image.Image, shadow_type: str = 'drop', intens
 
     return canvas
 
-def remove_background_simple(input_path: str, output_path: str, shadow_params: dict = None, pipeline: str = "amazon") -> tuple[bool, str]:
+def segment_product(input_path: str, timings: dict = None) -> Image.Image:
+    """
+    Remove the background with rembg and refine the cutout's edges
+
+    Args:
+        input_path: Path to input image
+        timings: Optional dict filled with segment / refine seconds and
+            source megapixels
+
+    Returns:
+        Image.Image: RGBA cutout at the source resolution
+    """
+    if timings is None:
+        timings = {}
+    stage_start = time.perf_counter()
+
+    # Read original image
+    with open(input_path, 'rb') as input_file:
+        input_data = input_file.read()
+
+    # Remove background with rembg (using pre-loaded session for speed)
+    logger.info("Removing background with rembg...")
+    if REMBG_SESSION:
+        output_data = remove(input_data, session=REMBG_SESSION)
+    else:
+        output_data = remove(input_data)  # Fallback if session failed to load
+
+    # Open image without background (RGBA)
+    img_no_bg = Image.open(io.BytesIO(output_data))
+    logger.info(f"Background removed, image size: {img_no_bg.size}")
+    timings["megapixels"] = img_no_bg.width * img_no_bg.height / 1_000_000
+    timings["segment"] = time.perf_counter() - stage_start
+    stage_start = time.perf_counter()
+
+    # Ensure image is in RGBA mode
+    if img_no_bg.mode != 'RGBA':
+        img_no_bg = img_no_bg.convert('RGBA')
+
+    # Clean edges to reduce halo effect
+    if img_no_bg.mode == 'RGBA':
+        # Get alpha channel
+        alpha = img_no_bg.split()[3]
+
+        # Erode alpha slightly to remove edge artifacts
+        alpha = alpha.filter(ImageFilter.MinFilter(3))  # Shrink edges by 1-2px
+
+        # Apply slight blur to alpha for smoother transition
+        alpha = alpha.filter(ImageFilter.GaussianBlur(0.5))
+
+        # Reconstruct image with cleaned alpha
+        r, g, b, _ = img_no_bg.split()
+        img_no_bg = Image.merge('RGBA', (r, g, b, alpha))
+
+        logger.info("[HALO-REMOVAL] Edge refinement applied to reduce halo")
+
+    # ALTERNATIVE: More aggressive halo removal (uncomment if needed)
+    # if img_no_bg.mode == 'RGBA':
+    #     import numpy as np
+    #
+    #     # Convert to numpy for processing
+    #     img_array = np.array(img_no_bg)
+    #     alpha = img_array[:, :, 3]
+    #
+    #     # Create binary mask (fully opaque or fully transparent)
+    #     threshold = 200  # Adjust between 150-250
+    #     alpha_binary = np.where(alpha > threshold, 255, 0).astype(np.uint8)
+    #
+    #     # Erode to remove halo
+    #     alpha_pil = Image.fromarray(alpha_binary)
+    #     alpha_pil = alpha_pil.filter(ImageFilter.MinFilter(5))  # Stronger erosion
+    #
+    #     # Slight blur for natural edge
+    #     alpha_pil = alpha_pil.filter(ImageFilter.GaussianBlur(1))
+    #
+    #     # Apply back to image
+    #     img_array[:, :, 3] = np.array(alpha_pil)
+    #     img_no_bg = Image.fromarray(img_array)
+    #
+    #     logger.info("[HALO-REMOVAL] Aggressive halo removal applied")
+
+    timings["refine"] = time.perf_counter() - stage_start
+    return img_no_bg
+
+def remove_background_simple(input_path: str, output_path: str, shadow_params: dict = None, pipeline: str = "amazon", timings: dict = None, details: dict = None) -> tuple[bool, str]:
     """
     Simple local background removal using rembg + white background + optional shadows
 
@@ -108,117 +194,42 @@ def remove_background_simple(input_path: str, output_path: str, shadow_params: d
             - distance (int): Shadow distance in pixels
             - blur_radius (int): Blur level
         pipeline: Pipeline type (amazon, instagram, ebay, transparent)
+        timings: Optional dict filled with per-stage seconds
+            (segment, refine, shadow, save) and source megapixels
+        details: Optional dict filled with the shadow type actually applied
+            ('auto' resolved from the mask, None without shadow)
 
     Returns:
         tuple[bool, str]: (success, actual_output_path)
     """
+    if timings is None:
+        timings = {}
+    if details is None:
+        details = {}
+
     try:
         logger.info(f"Starting simple background removal: {input_path}")
         logger.info(f"[DEBUG] Shadow params passed to remove_background_simple: {shadow_params}")
 
-        # Read original image
-        with open(input_path, 'rb') as input_file:
-            input_data = input_file.read()
-
-        # Remove background with rembg (using pre-loaded session for speed)
-        logger.info("Removing background with rembg...")
-        if REMBG_SESSION:
-            output_data = remove(input_data, session=REMBG_SESSION)
-        else:
-            output_data = remove(input_data)  # Fallback if session failed to load
-
-        # Open image without background (RGBA)
-        img_no_bg = Image.open(io.BytesIO(output_data))
-        logger.info(f"Background removed, image size: {img_no_bg.size}")
-
-        # Ensure image is in RGBA mode
-        if img_no_bg.mode != 'RGBA':
-            img_no_bg = img_no_bg.convert('RGBA')
-
-        # Clean edges to reduce halo effect
-        if img_no_bg.mode == 'RGBA':
-            # Get alpha channel
-            alpha = img_no_bg.split()[3]
-
-            # Erode alpha slightly to remove edge artifacts
-            alpha = alpha.filter(ImageFilter.MinFilter(3))  # Shrink edges by 1-2px
-
-            # Apply slight blur to alpha for smoother transition
-            alpha = alpha.filter(ImageFilter.GaussianBlur(0.5))
-
-            # Reconstruct image with cleaned alpha
-            r, g, b, _ = img_no_bg.split()
-            img_no_bg = Image.merge('RGBA', (r, g, b, alpha))
-
-            logger.info("[HALO-REMOVAL] Edge refinement applied to reduce halo")
-
-        # ALTERNATIVE: More aggressive halo removal (uncomment if needed)
-        # if img_no_bg.mode == 'RGBA':
-        #     import numpy as np
-        #
-        #     # Convert to numpy for processing
-        #     img_array = np.array(img_no_bg)
-        #     alpha = img_array[:, :, 3]
-        #
-        #     # Create binary mask (fully opaque or fully transparent)
-        #     threshold = 200  # Adjust between 150-250
-        #     alpha_binary = np.where(alpha > threshold, 255, 0).astype(np.uint8)
-        #
-        #     # Erode to remove halo
-        #     alpha_pil = Image.fromarray(alpha_binary)
-        #     alpha_pil = alpha_pil.filter(ImageFilter.MinFilter(5))  # Stronger erosion
-        #
-        #     # Slight blur for natural edge
-        #     alpha_pil = alpha_pil.filter(ImageFilter.GaussianBlur(1))
-        #
-        #     # Apply back to image
-        #     img_array[:, :, 3] = np.array(alpha_pil)
-        #     img_no_bg = Image.fromarray(img_array)
-        #
-        #     logger.info("[HALO-REMOVAL] Aggressive halo removal applied")
+        img_no_bg = segment_product(input_path, timings)
+        stage_start = time.perf_counter()
 
         # Standard pipelines (amazon, instagram, ebay) - resize and add white background
         # Resize image maintaining aspect ratio (keep as RGBA)
         img_no_bg.thumbnail((1000, 1000), Image.Resampling.LANCZOS)
         logger.info(f"Image resized to: {img_no_bg.size}")
+        timings["refine"] += time.perf_counter() - stage_start
+        stage_start = time.perf_counter()
 
-        # Apply shadow effect if enabled
-        if shadow_params and shadow_params.get('enabled', False):
-            logger.info("=" * 60)
-            logger.info(f"[SHADOW] Applying simple drop shadow")
-            logger.info(f"   Intensity: {shadow_params.get('intensity', 0.5)}")
-            logger.info("=" * 60)
-
-            try:
-                from ..processing.shadow_effects import apply_simple_drop_shadow
-
-                img_with_shadow = apply_simple_drop_shadow(
-                    image=img_no_bg,
-                    intensity=shadow_params.get('intensity', 0.5)
-                )
-
-                logger.info("=" * 60)
-                logger.info(f"[SHADOW] Success!")
-                logger.info("=" * 60)
-
-                # Use image with shadow
-                img_final = img_with_shadow
-
-            except Exception as shadow_error:
-                logger.error("=" * 60)
-                logger.error(f"[SHADOW] FAILED: {shadow_error}")
-                logger.error("=" * 60)
-                import traceback
-                traceback.print_exc()
-                # Create white background as fallback
-                white_bg = Image.new('RGB', img_no_bg.size, (255, 255, 255))
-                white_bg.paste(img_no_bg, (0, 0), img_no_bg)
-                img_final = white_bg
-        else:
-            # Create white background (no shadow)
-            white_bg = Image.new('RGB', img_no_bg.size, (255, 255, 255))
-            white_bg.paste(img_no_bg, (0, 0), img_no_bg)
-            img_final = white_bg
+        # Apply shadow effect if enabled (white background otherwise)
+        shadow_type = resolve_shadow_type(img_no_bg, shadow_params)
+        details["shadow_type"] = shadow_type
+        if shadow_type:
+            logger.info(f"[SHADOW] Applying {shadow_type} shadow, intensity {shadow_params.get('intensity', 0.5)}")
+        img_final = compose_on_white(img_no_bg, shadow_params, shadow_type)
+
+        timings["shadow"] = time.perf_counter() - stage_start
+        stage_start = time.perf_counter()
 
         # Ensure output directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -226,6 +237,7 @@ def remove_background_simple(input_path: str, output_path: str, shadow_params: d
         # Save result as JPEG
         img_final.save(output_path, 'JPEG', quality=95)
         logger.info(f"Image saved successfully: {output_path}")
+        timings["save"] = time.perf_counter() - stage_start
 
         return True, output_path
 
@@ -246,8 +258,10 @@ def process_image_simple(input_path: str, output_path: str, pipeline: str = "ama
                      If False, use local rembg (Basic, 1 credit)
 
     Returns:
-        dict: Processing result with cost information
+        dict: Processing result with cost information and per-stage timings
     """
+    started_at = time.perf_counter()
+
     # PREMIUM PROCESSING with Qwen API
     if use_premium:
         if not QWEN_AVAILABLE or not qwen_service.available:
@@ -270,6 +284,7 @@ def process_image_simple(input_path: str, output_path: str, pipeline: str = "ama
                     "credits_used": 3,
                     "shadow_applied": False,  # Qwen handles shadows in prompt
                     "shadow_type": None,
+                    "timings": {"total": time.perf_counter() - started_at},
                     "message": "Background removed successfully with Premium AI"
                 }
             else:
@@ -283,7 +298,12 @@ def process_image_simple(input_path: str, output_path: str, pipeline: str = "ama
         logger.info(f"🔧 Using BASIC processing (local rembg) for: {Path(input_path).name}")
 
         # Process image with shadow parameters (or None for no shadow)
-        success, actual_output_path = remove_background_simple(input_path, output_path, shadow_params, pipeline)
+        timings = {}
+        details = {}
+        success, actual_output_path = remove_background_simple(
+            input_path, output_path, shadow_params, pipeline, timings=timings, details=details
+        )
+        timings["total"] = time.perf_counter() - started_at
 
         if not success:
             return {
@@ -294,7 +314,7 @@ def process_image_simple(input_path: str, output_path: str, pipeline: str = "ama
                 "error": "Failed to process image with local background removal"
             }
 
-        shadow_enabled = shadow_params and shadow_params.get('enabled', False)
+        shadow_type = details.get("shadow_type")
 
         result = {
             "success": True,
@@ -304,9 +324,67 @@ def process_image_simple(input_path: str, output_path: str, pipeline: str = "ama
             "output_path": actual_output_path,  # Use the actual output path (may be .png for transparent)
             "cost": 0.0,  # No API cost for local processing
             "credits_used": 1,
-            "shadow_applied": shadow_enabled,
-            "shadow_type": shadow_params.get('type', 'drop') if shadow_enabled else None,
-            "message": f"Background removed successfully" + (f" with {shadow_params.get('type', 'drop')} shadow" if shadow_enabled else "")
+            "shadow_applied": shadow_type is not None,
+            "shadow_type": shadow_type,
+            "timings": timings,
+            "message": f"Background removed successfully" + (f" with {shadow_type} shadow" if shadow_type else "")
+        }
+
+        return result
+
+
+def process_image_variants(input_path: str, outputs: Dict[str, str], targets: List[MarketplaceTarget], shadow_params: dict = None) -> dict:
+    """
+    Segment an image once and write one output per marketplace
+
+    Args:
+        input_path: Path to input image
+        outputs: Output path per marketplace name
+        targets: Marketplaces to render (see app.processing.variants)
+        shadow_params: Optional shadow parameters dict
+
+    Returns:
+        dict: Processing result with the written path per marketplace and
+            per-stage timings (shadow covers rendering every variant)
+    """
+    started_at = time.perf_counter()
+    timings = {}
+
+    try:
+        logger.info(f"🔧 Rendering {len(targets)} marketplace variants for: {Path(input_path).name}")
+        cutout = segment_product(input_path, timings)
+
+        stage_start = time.perf_counter()
+        shadow_type = resolve_shadow_type(cutout, shadow_params)
+        variants = render_variants(cutout, targets, shadow_params, shadow_type)
+        timings["shadow"] = time.perf_counter() - stage_start
+
+        stage_start = time.perf_counter()
+        quality = {target.name: target.quality for target in targets}
+        for name, image in variants.items():
+            os.makedirs(os.path.dirname(outputs[name]), exist_ok=True)
+            image.save(outputs[name], 'JPEG', quality=quality[name])
+        timings["save"] = time.perf_counter() - stage_start
+    except Exception as e:
+        logger.error(f"Error processing {input_path}: {e}")
+        return {
+            "success": False,
+            "method": "local_rembg",
+            "input_path": input_path,
+            "error": "Failed to process image with local background removal"
         }
 
-        return result
\ No newline at end of file
+    timings["total"] = time.perf_counter() - started_at
+    return {
+        "success": True,
+        "method": "local_rembg",
+        "pipeline": "multi",
+        "input_path": input_path,
+        "outputs": {target.name: outputs[target.name] for target in targets},
+        "cost": 0.0,
+        "credits_used": 1,  # One segmentation, however many variants
+        "shadow_applied": shadow_type is not None,
+        "shadow_type": shadow_type,
+        "timings": timings,
+        "message": f"Background removed once, {len(targets)} marketplace variants rendered"
+    }
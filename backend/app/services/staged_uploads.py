@@ -0,0 +1,105 @@
+"""
+Staged Uploads
+Files spooled by /analyze-upload are kept on disk under an upload token so
+/upload can adopt them instead of the client sending the same bytes twice.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGED_MANIFEST = "staged.json"
+TOKEN_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class StagedUploadStore:
+    """Directory-per-token storage for analyzed uploads"""
+
+    def __init__(self, root: Path, ttl_seconds: int = 3600):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def create(self) -> str:
+        """Create an empty staging area and return its token"""
+        token = uuid.uuid4().hex
+        (self.root / token).mkdir()
+        return token
+
+    def path_for(self, token: str) -> Optional[Path]:
+        """Staging directory for a token, or None if the token is malformed"""
+        if not TOKEN_PATTERN.match(token or ""):
+            return None
+        return self.root / token
+
+    def save_manifest(self, token: str, files: List[Dict[str, Any]]):
+        staging_dir = self.path_for(token)
+        with open(staging_dir / STAGED_MANIFEST, "w") as f:
+            json.dump({"created_at": time.time(), "files": files}, f)
+
+    def load(self, token: str) -> Optional[Dict[str, Any]]:
+        """Manifest of a live staging area, or None if unknown/expired"""
+        staging_dir = self.path_for(token)
+        if staging_dir is None:
+            return None
+        manifest_path = staging_dir / STAGED_MANIFEST
+        try:
+            with open(manifest_path) as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if time.time() - manifest.get("created_at", 0) > self.ttl_seconds:
+            self.discard(token)
+            return None
+        return manifest
+
+    def adopt(self, token: str, destination: Path) -> List[Dict[str, Any]]:
+        """
+        Move staged files into `destination` and drop the staging area
+
+        Returns:
+            Manifest entries with their new `path`
+        """
+        manifest = self.load(token)
+        if manifest is None:
+            raise FileNotFoundError(f"Upload token {token} not found or expired")
+
+        staging_dir = self.path_for(token)
+        destination.mkdir(parents=True, exist_ok=True)
+        adopted = []
+        for entry in manifest["files"]:
+            source = staging_dir / entry["stored_name"]
+            target = destination / entry["stored_name"]
+            os.replace(source, target)  # Same filesystem: no copy
+            adopted.append({**entry, "path": str(target)})
+
+        self.discard(token)
+        return adopted
+
+    def discard(self, token: str):
+        staging_dir = self.path_for(token)
+        if staging_dir is not None and staging_dir.exists():
+            shutil.rmtree(staging_dir, ignore_errors=True)
+
+    def purge_expired(self) -> int:
+        """Remove staging areas older than the TTL; returns how many were removed"""
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for staging_dir in self.root.iterdir():
+            try:
+                if staging_dir.is_dir() and staging_dir.stat().st_mtime < cutoff:
+                    shutil.rmtree(staging_dir, ignore_errors=True)
+                    removed += 1
+            except OSError:
+                continue
+        if removed:
+            logger.info(f"[STAGED UPLOADS] Purged {removed} expired staging areas")
+        return removed
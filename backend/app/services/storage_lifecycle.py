@@ -0,0 +1,318 @@
+"""
+Storage Lifecycle Manager
+Background garbage collection for job storage. Each directory class has its
+own retention (TTL); when a filesystem goes over the high watermark, entries
+are evicted until usage is back under the low watermark, derived artifacts
+(thumbnails, cached archives, extraction leftovers) first and originals
+only after that, oldest first. Entries touched within the grace period
+(e.g. an upload waiting for POST /process) are never evicted. Reclaimed
+bytes are kept as metrics.
+"""
+
+import asyncio
+import logging
+import os
+import shutil
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HIGH_WATERMARK = 0.85
+DEFAULT_LOW_WATERMARK = 0.75
+DEFAULT_INTERVAL_SECONDS = 600
+DEFAULT_GRACE_SECONDS = 3600
+
+
+@dataclass
+class StorageClass:
+    """
+    A set of entries (files or directories) matched by `pattern` under `root`
+
+    Args:
+        name: Label used in metrics and env configuration
+        ttl_seconds: Entries untouched for longer are removed (0 disables TTL)
+        derived: Regenerable artifacts, evicted before originals under pressure
+        exclude: Entry names never touched (e.g. areas with their own cleanup)
+    """
+    name: str
+    root: Path
+    ttl_seconds: int
+    derived: bool = False
+    pattern: str = "*"
+    exclude: Set[str] = field(default_factory=set)
+
+    def entries(self) -> Iterable[Path]:
+        if not self.root.exists():
+            return []
+        return (
+            path for path in self.root.glob(self.pattern)
+            if path.name not in self.exclude and not path.name.startswith(".")
+        )
+
+
+def _entry_size(path: Path) -> int:
+    """Bytes used by a file or directory tree"""
+    try:
+        if not path.is_dir():
+            return path.stat().st_size
+    except OSError:
+        return 0
+
+    total = 0
+    stack = [str(path)]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        else:
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError:
+                        continue
+        except OSError:
+            continue
+    return total
+
+
+def _entry_mtime(path: Path) -> float:
+    """
+    Last modification of an entry or its direct children: appending to a
+    file does not touch its directory's mtime
+    """
+    mtime = path.stat().st_mtime
+    if path.is_dir() and not path.is_symlink():
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        mtime = max(mtime, entry.stat(follow_symlinks=False).st_mtime)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+    return mtime
+
+
+def _remove_entry(path: Path) -> int:
+    """Delete a file or directory; returns the bytes reclaimed"""
+    size = _entry_size(path)
+    if path.is_dir() and not path.is_symlink():
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        path.unlink(missing_ok=True)
+    return 0 if path.exists() else size
+
+
+class StorageLifecycleManager:
+    """
+    Periodic TTL + watermark garbage collector
+
+    Args:
+        classes: Directory classes to manage
+        high_watermark / low_watermark: Disk usage fractions that start / stop eviction
+        interval_seconds: Time between background runs
+        grace_seconds: Entries modified more recently are never evicted under
+            pressure (uploads not yet processed, results just written)
+        is_protected: Returns True for entries that must not be removed now
+            (e.g. directories of jobs that are still processing)
+        protection_for_pass: Alternative to is_protected for checks that need
+            an expensive lookup (e.g. the active job list): called once per
+            run, returns the is_protected check used for that run
+    """
+
+    def __init__(
+        self,
+        classes: List[StorageClass],
+        high_watermark: float = DEFAULT_HIGH_WATERMARK,
+        low_watermark: float = DEFAULT_LOW_WATERMARK,
+        interval_seconds: int = DEFAULT_INTERVAL_SECONDS,
+        grace_seconds: int = DEFAULT_GRACE_SECONDS,
+        is_protected: Optional[Callable[[Path], bool]] = None,
+        protection_for_pass: Optional[Callable[[], Callable[[Path], bool]]] = None,
+        disk_usage: Callable[[Path], Any] = shutil.disk_usage
+    ):
+        if low_watermark > high_watermark:
+            raise ValueError("low_watermark must not exceed high_watermark")
+        self.classes = classes
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        self.interval_seconds = interval_seconds
+        self.grace_seconds = grace_seconds
+        self.is_protected = is_protected or (lambda path: False)
+        self.protection_for_pass = protection_for_pass
+        self._pass_protected = self.is_protected
+        self._disk_usage = disk_usage
+        self._lock = threading.Lock()  # One run at a time
+        self._task: Optional[asyncio.Task] = None
+        self._metrics: Dict[str, Any] = {
+            "runs": 0,
+            "last_run_at": None,
+            "last_run_seconds": None,
+            "reclaimed_bytes": 0,
+            "reclaimed_entries": 0,
+            "by_class": {
+                storage_class.name: {"ttl_bytes": 0, "ttl_entries": 0, "pressure_bytes": 0, "pressure_entries": 0}
+                for storage_class in classes
+            },
+            "disk": {}
+        }
+
+    # ---- collection -------------------------------------------------------
+
+    def run_once(self) -> Dict[str, Any]:
+        """One TTL pass followed by watermark eviction; returns what was reclaimed"""
+        with self._lock:
+            started = time.time()
+            if self.protection_for_pass is not None:
+                self._pass_protected = self.protection_for_pass()
+            reclaimed = {"ttl_bytes": 0, "ttl_entries": 0, "pressure_bytes": 0, "pressure_entries": 0}
+
+            for storage_class in self.classes:
+                if storage_class.ttl_seconds <= 0:
+                    continue
+                cutoff = started - storage_class.ttl_seconds
+                for path, mtime in self._aged_entries(storage_class):
+                    if mtime < cutoff:
+                        self._reclaim(storage_class, path, "ttl", reclaimed)
+
+            for device_root, device_classes in self._classes_by_device().items():
+                self._relieve_pressure(device_root, device_classes, reclaimed)
+
+            elapsed = time.time() - started
+            self._metrics["runs"] += 1
+            self._metrics["last_run_at"] = started
+            self._metrics["last_run_seconds"] = round(elapsed, 3)
+
+        if reclaimed["ttl_entries"] or reclaimed["pressure_entries"]:
+            logger.info(
+                f"[STORAGE] Reclaimed {reclaimed['ttl_bytes'] + reclaimed['pressure_bytes']} bytes "
+                f"({reclaimed['ttl_entries']} expired, {reclaimed['pressure_entries']} evicted) in {elapsed:.2f}s"
+            )
+        return reclaimed
+
+    def _aged_entries(self, storage_class: StorageClass) -> List[Tuple[Path, float]]:
+        aged = []
+        for path in storage_class.entries():
+            try:
+                aged.append((path, _entry_mtime(path)))
+            except OSError:
+                continue
+        return aged
+
+    def _reclaim(self, storage_class: StorageClass, path: Path, reason: str, reclaimed: Dict[str, int]) -> int:
+        if self._pass_protected(path):
+            return 0
+        size = _remove_entry(path)
+        class_metrics = self._metrics["by_class"][storage_class.name]
+        class_metrics[f"{reason}_bytes"] += size
+        class_metrics[f"{reason}_entries"] += 1
+        self._metrics["reclaimed_bytes"] += size
+        self._metrics["reclaimed_entries"] += 1
+        reclaimed[f"{reason}_bytes"] += size
+        reclaimed[f"{reason}_entries"] += 1
+        logger.debug(f"[STORAGE] Removed {path} ({size} bytes, {reason})")
+        return size
+
+    def _classes_by_device(self) -> Dict[Path, List[StorageClass]]:
+        """Group classes per filesystem: watermarks are per disk"""
+        devices: Dict[int, Tuple[Path, List[StorageClass]]] = {}
+        for storage_class in self.classes:
+            try:
+                device = storage_class.root.stat().st_dev
+            except OSError:
+                continue
+            devices.setdefault(device, (storage_class.root, []))[1].append(storage_class)
+        return {root: classes for root, classes in devices.values()}
+
+    def _usage_fraction(self, root: Path) -> float:
+        usage = self._disk_usage(root)
+        fraction = usage.used / usage.total if usage.total else 0.0
+        self._metrics["disk"][str(root)] = {
+            "total_bytes": usage.total,
+            "used_bytes": usage.used,
+            "free_bytes": usage.free,
+            "used_fraction": round(fraction, 4)
+        }
+        return fraction
+
+    def _relieve_pressure(self, device_root: Path, classes: List[StorageClass], reclaimed: Dict[str, int]):
+        if self._usage_fraction(device_root) < self.high_watermark:
+            return
+
+        # Derived artifacts first, then originals; oldest first within each
+        candidates = []
+        newest = time.time() - self.grace_seconds
+        for storage_class in classes:
+            for path, mtime in self._aged_entries(storage_class):
+                if mtime > newest:
+                    continue
+                candidates.append((not storage_class.derived, mtime, storage_class, path))
+        candidates.sort(key=lambda candidate: (candidate[0], candidate[1]))
+
+        logger.warning(
+            f"[STORAGE] Disk usage of {device_root} above {self.high_watermark:.0%}, "
+            f"evicting down to {self.low_watermark:.0%} ({len(candidates)} candidates)"
+        )
+        for _, _, storage_class, path in candidates:
+            if self._usage_fraction(device_root) <= self.low_watermark:
+                break
+            self._reclaim(storage_class, path, "pressure", reclaimed)
+
+    # ---- background loop ----------------------------------------------------
+
+    async def _run_forever(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(None, self.run_once)
+            except Exception as e:
+                logger.error(f"[STORAGE] Lifecycle run failed: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self):
+        """Start the background loop on the running event loop"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run_forever())
+            logger.info(
+                f"[STORAGE] Lifecycle manager started: {len(self.classes)} classes, "
+                f"every {self.interval_seconds}s, watermarks {self.low_watermark:.0%}-{self.high_watermark:.0%}"
+            )
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval_seconds,
+            "grace_seconds": self.grace_seconds,
+            "high_watermark": self.high_watermark,
+            "low_watermark": self.low_watermark,
+            "classes": {
+                storage_class.name: {
+                    "root": str(storage_class.root),
+                    "pattern": storage_class.pattern,
+                    "ttl_seconds": storage_class.ttl_seconds,
+                    "derived": storage_class.derived
+                }
+                for storage_class in self.classes
+            }
+        }
+
+
+def retention_seconds(name: str, default_hours: float) -> int:
+    """Retention for a storage class from STORAGE_TTL_<NAME>_HOURS"""
+    return int(float(os.getenv(f"STORAGE_TTL_{name.upper()}_HOURS", default_hours)) * 3600)
@@ -0,0 +1,270 @@
+"""
+Historical Throughput Model
+Learns per-image processing time from production timings and turns it into
+upload ETAs with a confidence interval.
+
+Samples are keyed by (megapixel bucket, pipeline, shadow, premium). Each
+estimate combines the per-image latency model with the observed parallel
+speedup of recent batches and the number of images already queued.
+"""
+
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper edges of the megapixel buckets (last bucket is open-ended)
+MEGAPIXEL_BUCKETS = (0.5, 1.0, 2.0, 4.0, 8.0, 16.0)
+
+# Prior from production data before any samples exist:
+# 100 images = 230 seconds wall time -> 2.3 seconds per image
+PRIOR_SECONDS_PER_IMAGE = 2.3
+PRIOR_STD_RATIO = 0.35  # Assume +-35% spread until we have data
+PRIOR_BYTES_PER_MEGAPIXEL = 350_000  # Typical product JPEG
+
+MIN_SAMPLES = 5  # Samples needed before a bucket is trusted
+HISTORY_LIMIT = 20000  # Rows loaded into memory at startup
+Z_90 = 1.645  # 90% two-sided interval
+
+
+@dataclass
+class RunningStats:
+    """Welford running mean / variance"""
+    count: int = 0
+    mean: float = 0.0
+    m2: float = 0.0
+
+    def add(self, value: float):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+
+def megapixel_bucket(megapixels: float) -> int:
+    """Index of the megapixel bucket a value falls into"""
+    for index, edge in enumerate(MEGAPIXEL_BUCKETS):
+        if megapixels <= edge:
+            return index
+    return len(MEGAPIXEL_BUCKETS)
+
+
+class ThroughputModel:
+    """Per-image latency statistics persisted in a small SQLite database"""
+
+    def __init__(self, db_path: str = None):
+        self.db_path = Path(db_path or os.getenv("THROUGHPUT_DB_PATH", "data/throughput_stats.db"))
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._stats: Dict[Tuple, RunningStats] = {}
+        self._bytes_per_mp = RunningStats()
+        self._speedup = RunningStats()
+        self._init_database()
+        self._load_history()
+
+    def _get_connection(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.db_path), timeout=5)
+
+    def _init_database(self):
+        conn = self._get_connection()
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS image_timings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recorded_at REAL NOT NULL,
+                    megapixels REAL NOT NULL,
+                    file_bytes INTEGER,
+                    pipeline TEXT NOT NULL,
+                    shadow INTEGER NOT NULL,
+                    premium INTEGER NOT NULL,
+                    total_seconds REAL NOT NULL,
+                    segment_seconds REAL,
+                    shadow_seconds REAL,
+                    save_seconds REAL
+                );
+                CREATE TABLE IF NOT EXISTS batch_timings (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    recorded_at REAL NOT NULL,
+                    images INTEGER NOT NULL,
+                    wall_seconds REAL NOT NULL,
+                    busy_seconds REAL NOT NULL
+                );
+            """)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _load_history(self):
+        conn = self._get_connection()
+        try:
+            rows = conn.execute(
+                "SELECT megapixels, file_bytes, pipeline, shadow, premium, total_seconds "
+                "FROM image_timings ORDER BY id DESC LIMIT ?",
+                (HISTORY_LIMIT,)
+            ).fetchall()
+            batches = conn.execute(
+                "SELECT wall_seconds, busy_seconds FROM batch_timings ORDER BY id DESC LIMIT 200"
+            ).fetchall()
+        finally:
+            conn.close()
+
+        for megapixels, file_bytes, pipeline, shadow, premium, total_seconds in rows:
+            self._add_sample(megapixels, file_bytes, pipeline, bool(shadow), bool(premium), total_seconds)
+        for wall_seconds, busy_seconds in batches:
+            if wall_seconds > 0:
+                self._speedup.add(busy_seconds / wall_seconds)
+
+        logger.info(f"[THROUGHPUT] Loaded {len(rows)} image timings, {len(batches)} batch timings")
+
+    def _add_sample(self, megapixels: float, file_bytes: Optional[int], pipeline: str,
+                    shadow: bool, premium: bool, seconds: float):
+        bucket = megapixel_bucket(megapixels)
+        for key in self._lookup_keys(bucket, pipeline, shadow, premium):
+            self._stats.setdefault(key, RunningStats()).add(seconds)
+        if file_bytes and megapixels > 0:
+            self._bytes_per_mp.add(file_bytes / megapixels)
+
+    @staticmethod
+    def _lookup_keys(bucket: int, pipeline: str, shadow: bool, premium: bool) -> List[Tuple]:
+        """Keys from most to least specific; samples are counted under all of them"""
+        return [
+            (bucket, pipeline, shadow, premium),
+            (bucket, "*", shadow, premium),
+            (bucket, "*", "*", premium),
+            ("*", "*", "*", premium),
+        ]
+
+    def record_image(self, megapixels: float, pipeline: str, shadow: bool, premium: bool,
+                     timings: Dict[str, float], file_bytes: Optional[int] = None):
+        """Record one processed image (called from worker threads)"""
+        total_seconds = timings.get("total")
+        if not total_seconds or megapixels <= 0:
+            return
+
+        with self._lock:
+            self._add_sample(megapixels, file_bytes, pipeline, shadow, premium, total_seconds)
+
+        try:
+            conn = self._get_connection()
+            try:
+                conn.execute(
+                    "INSERT INTO image_timings (recorded_at, megapixels, file_bytes, pipeline, shadow, premium, "
+                    "total_seconds, segment_seconds, shadow_seconds, save_seconds) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (time.time(), megapixels, file_bytes, pipeline, int(shadow), int(premium), total_seconds,
+                     timings.get("segment"), timings.get("shadow"), timings.get("save"))
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"[THROUGHPUT] Failed to persist image timing: {e}")
+
+    def record_batch(self, images: int, wall_seconds: float, busy_seconds: float):
+        """Record a finished batch: wall time vs. summed per-image time gives the parallel speedup"""
+        if images <= 0 or wall_seconds <= 0 or busy_seconds <= 0:
+            return
+
+        with self._lock:
+            self._speedup.add(busy_seconds / wall_seconds)
+
+        try:
+            conn = self._get_connection()
+            try:
+                conn.execute(
+                    "INSERT INTO batch_timings (recorded_at, images, wall_seconds, busy_seconds) VALUES (?, ?, ?, ?)",
+                    (time.time(), images, wall_seconds, busy_seconds)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning(f"[THROUGHPUT] Failed to persist batch timing: {e}")
+
+    def megapixels_from_bytes(self, file_bytes: int) -> float:
+        """Estimate megapixels from an (uncompressed) image file size"""
+        with self._lock:
+            ratio = self._bytes_per_mp.mean if self._bytes_per_mp.count >= MIN_SAMPLES else PRIOR_BYTES_PER_MEGAPIXEL
+        return max(file_bytes / ratio, 0.01)
+
+    def _image_stats(self, megapixels: float, pipeline: str, shadow: bool, premium: bool) -> Tuple[float, float, int]:
+        """(mean latency, variance, samples) for one image, falling back to broader keys"""
+        bucket = megapixel_bucket(megapixels)
+        for key in self._lookup_keys(bucket, pipeline, shadow, premium):
+            stats = self._stats.get(key)
+            if stats and stats.count >= MIN_SAMPLES:
+                return stats.mean, stats.variance, stats.count
+
+        # No history yet: the production prior is wall time, so undo the speedup
+        mean = PRIOR_SECONDS_PER_IMAGE * self._current_speedup()
+        return mean, (mean * PRIOR_STD_RATIO) ** 2, 0
+
+    def _current_speedup(self) -> float:
+        if self._speedup.count >= 3:
+            return max(self._speedup.mean, 1.0)
+        return 1.0
+
+    def estimate(self, image_megapixels: List[float], pipeline: str = "amazon", shadow: bool = False,
+                 premium: bool = False, queued_images: int = 0) -> Dict[str, float]:
+        """
+        Estimate wall-clock seconds to process a set of images
+
+        Args:
+            image_megapixels: Megapixels of every image in the upload
+            pipeline: Processing pipeline (amazon, ebay, instagram)
+            shadow: Whether shadows are enabled
+            premium: Whether premium (Qwen) processing is used
+            queued_images: Images of other jobs still waiting/processing
+
+        Returns:
+            dict with estimated_seconds, low_seconds, high_seconds (90% interval),
+            seconds_per_image, samples and speedup
+        """
+        with self._lock:
+            speedup = self._current_speedup()
+            total_mean = 0.0
+            total_variance = 0.0  # Per-image noise, independent between images
+            total_mean_error = 0.0  # Error of the bucket means, shared by all images
+            min_samples = None
+
+            for megapixels in image_megapixels:
+                mean, variance, samples = self._image_stats(megapixels, pipeline, shadow, premium)
+                total_mean += mean
+                total_variance += variance
+                total_mean_error += math.sqrt(variance / samples) if samples else math.sqrt(variance)
+                min_samples = samples if min_samples is None else min(min_samples, samples)
+
+            # Images already queued compete for the same workers; assume typical size
+            if queued_images > 0:
+                queue_mean, queue_variance, queue_samples = self._image_stats(1.0, "*", False, premium)
+                total_mean += queued_images * queue_mean
+                total_variance += queued_images * queue_variance
+                total_mean_error += queued_images * math.sqrt(queue_variance / max(queue_samples, 1))
+
+        estimated = total_mean / speedup
+        spread = Z_90 * math.sqrt(total_variance + total_mean_error ** 2) / speedup
+        count = len(image_megapixels)
+
+        return {
+            "estimated_seconds": estimated,
+            "low_seconds": max(estimated - spread, 0.0),
+            "high_seconds": estimated + spread,
+            "seconds_per_image": (estimated / count) if count else 0.0,
+            "samples": min_samples or 0,
+            "speedup": speedup,
+            "queued_images": queued_images
+        }
+
+
+# Global model instance
+throughput_model = ThroughputModel()
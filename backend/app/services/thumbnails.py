@@ -0,0 +1,112 @@
+"""
+Thumbnail Derivatives
+Downscaled WebP / JPEG copies of processed images at a few fixed sizes, so
+galleries don't load the full 1000-1600px outputs for a 150px grid.
+Derivatives are generated when an image finishes processing or on first
+request, stored in a `thumbs/` directory beside the output and named after
+the source's content hash: a URL carrying that hash can be cached forever.
+"""
+
+import logging
+import os
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from PIL import Image, features
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZES = (160, 320, 640)  # Longest edge in pixels
+THUMBNAIL_DIR = "thumbs"
+THUMBNAIL_QUALITY = {"webp": 80, "jpeg": 82}
+VERSION_LENGTH = 12  # Hex characters of the source hash used in names and URLs
+
+
+class ThumbnailService:
+    """Generates and locates fixed-size thumbnails of processed images"""
+
+    def __init__(self, sizes: Iterable[int] = THUMBNAIL_SIZES):
+        self.sizes = tuple(sorted(sizes))
+        self.webp_supported = features.check("webp")
+
+    def snap_size(self, requested: int) -> int:
+        """Smallest fixed size covering the requested one (largest if none does)"""
+        for size in self.sizes:
+            if size >= requested:
+                return size
+        return self.sizes[-1]
+
+    def pick_format(self, accept: str) -> str:
+        """WebP for clients that accept it, JPEG otherwise"""
+        if self.webp_supported and "image/webp" in (accept or ""):
+            return "webp"
+        return "jpeg"
+
+    def default_format(self) -> str:
+        return "webp" if self.webp_supported else "jpeg"
+
+    @staticmethod
+    def short_version(version: str) -> str:
+        return version[:VERSION_LENGTH]
+
+    def path_for(self, source: Path, version: str, size: int, fmt: str) -> Path:
+        extension = "webp" if fmt == "webp" else "jpg"
+        return source.parent / THUMBNAIL_DIR / f"{source.stem}_{size}_{self.short_version(version)}.{extension}"
+
+    def generate(self, source: Path, version: str, formats: Iterable[str] = None,
+                 sizes: Iterable[int] = None) -> Dict[Tuple[int, str], Path]:
+        """
+        Write thumbnails of `source` for every size x format
+
+        The source is decoded once (JPEG at reduced scale via draft()) and
+        each size is resized from the previous, larger one.
+        """
+        formats = list(formats or [self.default_format()])
+        sizes = sorted(sizes or self.sizes, reverse=True)
+        written = {}
+
+        with Image.open(source) as img:
+            img.draft("RGB", (sizes[0], sizes[0]))  # No-op for non-JPEG sources
+            current = img.convert("RGBA") if img.mode in ("RGBA", "LA", "P") else img.convert("RGB")
+
+        for size in sizes:
+            if max(current.size) > size:
+                current = current.copy()
+                current.thumbnail((size, size), Image.LANCZOS)
+            for fmt in formats:
+                path = self.path_for(source, version, size, fmt)
+                self._save(current, path, fmt)
+                written[(size, fmt)] = path
+
+        return written
+
+    def get(self, source: Path, version: str, size: int, fmt: str) -> Path:
+        """Path of a thumbnail, generating it on first request"""
+        path = self.path_for(source, version, size, fmt)
+        if not path.exists():
+            self.generate(source, version, formats=[fmt], sizes=[size])
+        return path
+
+    def _save(self, image: Image.Image, path: Path, fmt: str):
+        path.parent.mkdir(exist_ok=True)
+        if fmt == "jpeg" and image.mode == "RGBA":
+            # JPEG has no alpha: flatten onto white like the processed outputs
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel("A"))
+            image = background
+
+        # Unique temp name: concurrent first requests may render the same thumbnail
+        tmp_path = path.with_name(f".{uuid.uuid4().hex}{path.suffix}")
+        try:
+            if fmt == "webp":
+                image.save(tmp_path, "WEBP", quality=THUMBNAIL_QUALITY["webp"], method=4)
+            else:
+                image.save(tmp_path, "JPEG", quality=THUMBNAIL_QUALITY["jpeg"], optimize=True)
+            os.replace(tmp_path, path)
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+
+# Global instance
+thumbnail_service = ThumbnailService()
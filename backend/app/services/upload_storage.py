@@ -0,0 +1,161 @@
+"""
+Streaming Upload Storage
+Writes uploaded files to disk in fixed-size chunks, hashing along the way and
+enforcing size limits while the data streams in, so peak memory per upload
+stays at a few MB regardless of archive size.
+"""
+
+import hashlib
+import logging
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi import HTTPException, UploadFile
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB
+HASH_READ_SIZE = 1024 * 1024
+MAX_ARCHIVE_SIZE = 500 * 1024 * 1024  # 500MB for ZIP archives
+MAX_IMAGE_SIZE = 50 * 1024 * 1024  # 50MB for individual images
+
+
+class UploadTooLargeError(ValueError):
+    """Raised when an upload exceeds its size limit mid-stream"""
+
+    def __init__(self, filename: str, max_size: int):
+        self.filename = filename
+        self.max_size = max_size
+        super().__init__(f"{filename} exceeds the maximum size of {max_size // (1024 * 1024)}MB")
+
+
+@dataclass
+class StoredUpload:
+    path: Path
+    size: int
+    sha256: str
+
+
+def safe_filename(filename: Optional[str], default: str = "upload") -> str:
+    """Strip directory components from a client-supplied filename"""
+    name = Path(filename or "").name
+    return name if name and name not in (".", "..") else default
+
+
+def hash_file(path: Path) -> str:
+    """SHA-256 of a file on disk, read in fixed-size blocks"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_READ_SIZE), b""):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+async def save_upload_to_disk(
+    upload: UploadFile,
+    destination: Path,
+    max_size: int,
+    chunk_size: int = UPLOAD_CHUNK_SIZE
+) -> StoredUpload:
+    """
+    Copy an UploadFile to `destination` chunk by chunk
+
+    Data goes to a `.part` file first and is renamed on success, so a
+    partially written upload never looks complete to later stages.
+
+    Raises:
+        UploadTooLargeError: upload is larger than max_size (nothing is kept)
+    """
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    part_path = destination.with_name(destination.name + ".part")
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        with open(part_path, "wb") as buffer:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise UploadTooLargeError(upload.filename or destination.name, max_size)
+                hasher.update(chunk)
+                buffer.write(chunk)
+
+        os.replace(part_path, destination)
+
+    except BaseException:
+        part_path.unlink(missing_ok=True)
+        raise
+
+    return StoredUpload(path=destination, size=size, sha256=hasher.hexdigest())
+
+
+class RequestSizeLimitMiddleware:
+    """
+    ASGI middleware rejecting oversized request bodies while they stream in
+
+    Checks Content-Length up front and counts received bytes for chunked
+    requests, so an oversized upload is cut off before the multipart parser
+    spools it to disk.
+
+    Args:
+        app: ASGI application
+        limits: Path prefix -> maximum body size in bytes
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    def _limit_for(self, path: str) -> Optional[int]:
+        for prefix, limit in self.limits.items():
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope.get("path", ""))
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            await self._send_too_large(send, limit)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    # FastAPI re-raises HTTPException from body parsing as-is
+                    raise HTTPException(status_code=413, detail=f"Request body exceeds {limit // (1024 * 1024)}MB")
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    @staticmethod
+    async def _send_too_large(send, limit: int):
+        body = f'{{"detail":"Request body exceeds {limit // (1024 * 1024)}MB"}}'.encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
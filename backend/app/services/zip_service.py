@@ -12,11 +12,21 @@ import os
 from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 import mimetypes
-from PIL import Image
 
 from .usage_service import usage_service
 from .processing_service import processing_service
-from ..models.user_models import PlanType
+from .batch_processor import SmartBatchProcessor
+from .archive_extraction import (
+    ARCHIVE_IMAGE_EXTENSIONS,
+    analyze_archive,
+    archive_member_skip_reason,
+    extract_images_from_archive,
+    open_archive,
+    stream_extracted_images,
+    supported_archive_extensions
+)
+from .zip_stream import zip_compression_for
+from ..models.user_models import PlanType, PLAN_CONFIGS
 
 logger = logging.getLogger(__name__)
 
@@ -27,30 +37,12 @@ class ZipProcessingService:
     """
 
     def __init__(self):
-        # Check for optional dependencies
-        self.has_rarfile = False
-        self.has_py7zr = False
+        # Supported formats depend on the optional rarfile / py7zr libraries
+        self.supported_formats = supported_archive_extensions()
+        self.has_rarfile = '.rar' in self.supported_formats
+        self.has_py7zr = '.7z' in self.supported_formats
 
-        try:
-            import rarfile
-            self.has_rarfile = True
-        except ImportError:
-            logger.warning("rarfile not installed - RAR support disabled")
-
-        try:
-            import py7zr
-            self.has_py7zr = True
-        except ImportError:
-            logger.warning("py7zr not installed - 7ZIP support disabled")
-
-        # Set supported formats based on available libraries
-        self.supported_formats = {'.zip'}
-        if self.has_rarfile:
-            self.supported_formats.add('.rar')
-        if self.has_py7zr:
-            self.supported_formats.add('.7z')
-
-        self.image_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.bmp', '.tiff', '.gif'}
+        self.image_extensions = ARCHIVE_IMAGE_EXTENSIONS
         self.max_file_size = 500 * 1024 * 1024  # 500MB max archive size
         self.temp_dir = Path(tempfile.gettempdir()) / "masterpost_extracts"
         self.temp_dir.mkdir(exist_ok=True)
@@ -148,25 +140,22 @@ class ZipProcessingService:
             extract_dir = self.temp_dir / f"extract_{job_id}"
             extract_dir.mkdir(exist_ok=True)
 
-            # Extract archive
-            if progress_callback:
-                await progress_callback("extracting", 0, 0, "Extracting archive...")
-
-            image_files = await self._extract_archive(archive_path, str(extract_dir))
+            # Count images from the archive directory (nothing is decompressed yet)
+            expected_images = len(analyze_archive(Path(archive_path))["image_sizes"])
 
-            if not image_files:
+            if not expected_images:
                 return {
                     "success": False,
                     "error": "No valid image files found in archive",
                     "files_processed": 0
                 }
 
-            # Final usage check before processing
-            usage_check = await usage_service.check_usage_limits(user_id, len(image_files))
+            # Usage check before any work is done
+            usage_check = await usage_service.check_usage_limits(user_id, expected_images)
             if not usage_check.can_process:
                 return {
                     "success": False,
-                    "error": f"Cannot process {len(image_files)} images. Monthly limit exceeded.",
+                    "error": f"Cannot process {expected_images} images. Monthly limit exceeded.",
                     "usage_info": usage_check
                 }
 
@@ -174,22 +163,52 @@ class ZipProcessingService:
             output_dir = Path("processed") / job_id
             output_dir.mkdir(parents=True, exist_ok=True)
 
-            # Process images using hybrid service
             if progress_callback:
-                await progress_callback("processing", 0, len(image_files), "Starting image processing...")
+                await progress_callback("processing", 0, expected_images, "Extracting and processing images...")
+
+            # Pipelined: each image is processed as soon as it is extracted
+            extraction_failures = []
+
+            async def extracted_images():
+                async for status, name, detail in stream_extracted_images([Path(archive_path)], extract_dir):
+                    if status == "extracted":
+                        yield str(detail["path"])
+                    elif status == "failed":
+                        extraction_failures.append({
+                            "success": False,
+                            "original_path": name,
+                            "error": detail["reason"]
+                        })
+
+            def process_extracted_image(image_path: str) -> Dict[str, Any]:
+                output_path = output_dir / f"{Path(image_path).stem}_processed.jpg"
+                result = processing_service.process_single_image(
+                    image_path=image_path,
+                    output_path=str(output_path),
+                    user_plan=user_plan,
+                    pipeline=pipeline
+                )
+                result["original_path"] = image_path
+                # The extracted copy is no longer needed; keeps temp disk use bounded
+                Path(image_path).unlink(missing_ok=True)
+                return result
 
-            async def process_progress_callback(current: int, total: int, result: Dict[str, Any]):
+            def report_progress(current: int, total: int):
                 if progress_callback:
-                    status = "processing"
-                    message = f"Processing image {current}/{total}: {Path(result.get('original_path', '')).name}"
-                    await progress_callback(status, current, total, message)
-
-            results = await processing_service.process_batch(
-                image_paths=image_files,
-                output_dir=str(output_dir),
-                user_plan=user_plan,
-                callback=process_progress_callback
+                    asyncio.ensure_future(
+                        progress_callback("processing", current, total, f"Processed {current}/{total} images")
+                    )
+
+            # Plan-appropriate concurrency
+            plan_config = PLAN_CONFIGS.get(user_plan, PLAN_CONFIGS[PlanType.FREE])
+            results = await SmartBatchProcessor().process_stream_async(
+                items=extracted_images(),
+                process_func=process_extracted_image,
+                expected_total=expected_images,
+                progress_callback=report_progress,
+                max_workers=5 if plan_config.priority_processing else 2
             )
+            results.extend(extraction_failures)
 
             # Track usage
             successful_count = sum(1 for r in results if r.get("success", False))
@@ -207,7 +226,7 @@ class ZipProcessingService:
 
             summary = {
                 "success": len(successful_files) > 0,
-                "total_files": len(image_files),
+                "total_files": len(results),
                 "processed_files": len(successful_files),
                 "failed_files": len(failed_files),
                 "output_directory": str(output_dir),
@@ -259,30 +278,10 @@ class ZipProcessingService:
             List of image file paths in archive
         """
         try:
-            archive_path = Path(archive_path)
-            image_files = []
-
-            if archive_path.suffix.lower() == '.zip':
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    for file_info in zip_ref.filelist:
-                        if not file_info.is_dir() and self._is_image_file(file_info.filename):
-                            image_files.append(file_info.filename)
-
-            elif archive_path.suffix.lower() == '.rar' and self.has_rarfile:
-                import rarfile
-                with rarfile.RarFile(archive_path, 'r') as rar_ref:
-                    for file_info in rar_ref.infolist():
-                        if not file_info.is_dir() and self._is_image_file(file_info.filename):
-                            image_files.append(file_info.filename)
-
-            elif archive_path.suffix.lower() == '.7z' and self.has_py7zr:
-                import py7zr
-                with py7zr.SevenZipFile(archive_path, 'r') as sz_ref:
-                    for file_info in sz_ref.list():
-                        if not file_info.is_dir and self._is_image_file(file_info.filename):
-                            image_files.append(file_info.filename)
-
-            return image_files
+            return [
+                member.name for member in open_archive(Path(archive_path)).members()
+                if archive_member_skip_reason(member) is None
+            ]
 
         except Exception as e:
             logger.error(f"Failed to preview archive {archive_path}: {str(e)}")
@@ -300,61 +299,16 @@ class ZipProcessingService:
             List of extracted image file paths
         """
         try:
-            archive_path = Path(archive_path)
-            extract_path = Path(extract_dir)
-            image_files = []
-
-            if archive_path.suffix.lower() == '.zip':
-                with zipfile.ZipFile(archive_path, 'r') as zip_ref:
-                    zip_ref.extractall(extract_path)
-
-            elif archive_path.suffix.lower() == '.rar' and self.has_rarfile:
-                import rarfile
-                with rarfile.RarFile(archive_path, 'r') as rar_ref:
-                    rar_ref.extractall(extract_path)
-
-            elif archive_path.suffix.lower() == '.7z' and self.has_py7zr:
-                import py7zr
-                with py7zr.SevenZipFile(archive_path, 'r') as sz_ref:
-                    sz_ref.extractall(extract_path)
-
-            # Find all extracted image files
-            for root, dirs, files in os.walk(extract_path):
-                for file in files:
-                    if self._is_image_file(file):
-                        file_path = Path(root) / file
-                        # Validate image can be opened
-                        if await self._validate_image_file(str(file_path)):
-                            image_files.append(str(file_path))
-
-            return image_files
+            loop = asyncio.get_running_loop()
+            extracted, _ = await loop.run_in_executor(
+                None, extract_images_from_archive, Path(archive_path), Path(extract_dir)
+            )
+            return [str(path) for path in extracted]
 
         except Exception as e:
             logger.error(f"Failed to extract archive {archive_path}: {str(e)}")
             return []
 
-    def _is_image_file(self, filename: str) -> bool:
-        """Check if file is a supported image format"""
-        return Path(filename).suffix.lower() in self.image_extensions
-
-    async def _validate_image_file(self, file_path: str) -> bool:
-        """
-        Validate that file is a valid image
-
-        Args:
-            file_path: Path to image file
-
-        Returns:
-            True if valid image
-        """
-        try:
-            with Image.open(file_path) as img:
-                # Try to load the image to verify it's valid
-                img.verify()
-                return True
-        except Exception:
-            return False
-
     async def create_results_archive(self, processed_dir: str, job_id: str) -> str:
         """
         Create ZIP archive of processed images
@@ -373,7 +327,7 @@ class ZipProcessingService:
             with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zip_ref:
                 for file_path in processed_path.glob("*"):
                     if file_path.is_file():
-                        zip_ref.write(file_path, file_path.name)
+                        zip_ref.write(file_path, file_path.name, compress_type=zip_compression_for(file_path.name))
 
             return str(archive_path)
 
@@ -0,0 +1,101 @@
+"""
+Streaming ZIP Archives
+Builds a ZIP archive on the fly and yields it in chunks, so downloads start
+sending bytes right away and no temporary copy of the archive is written.
+
+The archive is written to an unseekable sink: zipfile then sets the data
+descriptor flag on every entry (CRC and sizes follow the entry data instead
+of being patched into the local header) and adds ZIP64 records whenever an
+entry or the central directory offset crosses the 4GB / 65535-entry limits.
+"""
+
+import logging
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ZIP_STREAM_READ_SIZE = 1024 * 1024  # 1MB per read from the source file
+
+# Deflating these again costs CPU and saves almost nothing
+ALREADY_COMPRESSED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif", ".zip", ".7z", ".rar"}
+
+
+def zip_compression_for(name: str) -> int:
+    """STORED for already-compressed formats, DEFLATED for everything else"""
+    if Path(name).suffix.lower() in ALREADY_COMPRESSED_EXTENSIONS:
+        return zipfile.ZIP_STORED
+    return zipfile.ZIP_DEFLATED
+
+
+class _ZipStreamSink:
+    """Write-only, unseekable file object that buffers bytes until drained"""
+
+    def __init__(self):
+        self._chunks = []
+        self._offset = 0
+
+    def write(self, data) -> int:
+        if data:
+            self._chunks.append(bytes(data))
+            self._offset += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        # zipfile records entry offsets with tell(); seek() is never available
+        return self._offset
+
+    def seekable(self) -> bool:
+        return False
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(
+    files: Iterable[Tuple[Path, str]],
+    compression: Optional[int] = None,
+    read_size: int = ZIP_STREAM_READ_SIZE
+) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of `files` ((path, name in archive) pairs) chunk by chunk
+
+    Memory stays at roughly one read block plus compressor state per
+    archive. Files that disappear before they are reached are skipped.
+    Without an explicit `compression` each entry gets zip_compression_for().
+    """
+    sink = _ZipStreamSink()
+    added = 0
+
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+        for path, arcname in files:
+            try:
+                # Known size lets zipfile decide on ZIP64 for the entry up front
+                info = zipfile.ZipInfo.from_file(path, arcname)
+                source = open(path, "rb")
+            except OSError as e:
+                logger.warning(f"[ZIP STREAM] Skipping {path}: {e}")
+                continue
+
+            info.compress_type = compression if compression is not None else zip_compression_for(arcname)
+            with source, archive.open(info, "w") as entry:
+                for block in iter(lambda: source.read(read_size), b""):
+                    entry.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            added += 1
+            data = sink.drain()  # Data descriptor
+            if data:
+                yield data
+
+    # Central directory (and ZIP64 end records when needed)
+    yield sink.drain()
+    logger.info(f"[ZIP STREAM] Streamed {added} files, {sink.tell()} bytes")
@@ -0,0 +1,112 @@
+"""
+Benchmark for the reflection shadow renderer
+Compares ShadowEffects.create_reflection_shadow (NumPy) with the previous
+per-pixel getpixel/putpixel implementation: checks the output is identical
+and that the new renderer is at least 10x faster.
+
+Run from backend/: python benchmark_reflection_shadow.py
+"""
+import sys
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+from PIL import Image, ImageDraw, ImageChops
+
+from app.processing.shadow_effects import ShadowEffects
+
+REQUIRED_SPEEDUP = 10.0
+SIZES = [(500, 500), (1000, 1000)]  # 1000x1000 -> 1000x400 reflection
+REPEATS = 3
+
+
+def legacy_reflection_shadow(img: Image.Image, reflection_height: float = 0.4,
+                             opacity: float = 0.2, fade_start: float = 0.0) -> Image.Image:
+    """Previous implementation (per-pixel loops), kept as the reference"""
+    reflection_h = int(img.height * reflection_height)
+    gap = 10
+    total_height = img.height + reflection_h + gap
+
+    canvas = Image.new('RGBA', (img.width, total_height), (0, 0, 0, 0))
+    canvas.paste(img, (0, 0), img if img.mode == 'RGBA' else None)
+
+    reflection = img.copy().transpose(Image.FLIP_TOP_BOTTOM)
+    reflection = reflection.crop((0, 0, reflection.width, reflection_h))
+    if reflection.mode != 'RGBA':
+        reflection = reflection.convert('RGBA')
+    a = reflection.split()[3]
+
+    reflection_faded = Image.new('RGBA', reflection.size, (0, 0, 0, 0))
+    for y in range(reflection_h):
+        progress = y / reflection_h
+        if progress < fade_start:
+            fade_factor = 1.0
+        else:
+            fade_factor = 1.0 - ((progress - fade_start) / (1.0 - fade_start))
+
+        alpha_value = int(255 * opacity * fade_factor)
+
+        for x in range(reflection.width):
+            if a.getpixel((x, y)) > 10:
+                r_val, g_val, b_val = reflection.getpixel((x, y))[:3]
+                reflection_faded.putpixel((x, y), (r_val, g_val, b_val, alpha_value))
+
+    canvas.paste(reflection_faded, (0, img.height + gap), reflection_faded)
+    return canvas
+
+
+def make_product(size) -> Image.Image:
+    """Cutout-like test image: colored shape with soft edges on transparency"""
+    width, height = size
+    img = Image.new('RGBA', size, (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    draw.ellipse((width * 0.15, height * 0.1, width * 0.85, height * 0.95), fill=(180, 40, 30, 255))
+    draw.rectangle((width * 0.35, height * 0.3, width * 0.65, height * 0.6), fill=(20, 90, 200, 200))
+    draw.ellipse((width * 0.4, height * 0.7, width * 0.6, height * 0.9), fill=(240, 220, 30, 8))
+    return img
+
+
+def best_of(func, *args, **kwargs):
+    best = None
+    result = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main() -> bool:
+    print("\n" + "=" * 60)
+    print("REFLECTION SHADOW BENCHMARK")
+    print("=" * 60 + "\n")
+
+    effects = ShadowEffects()
+    ok = True
+    for size in SIZES:
+        img = make_product(size)
+        for fade_start in (0.0, 0.3):
+            legacy_seconds, expected = best_of(legacy_reflection_shadow, img, opacity=0.2, fade_start=fade_start)
+            new_seconds, actual = best_of(
+                effects.create_reflection_shadow, img, intensity=0.2, fade_start=fade_start
+            )
+            identical = ImageChops.difference(expected, actual).getbbox() is None
+            speedup = legacy_seconds / new_seconds
+
+            status = "[OK]" if identical and speedup >= REQUIRED_SPEEDUP else "[FAIL]"
+            ok = ok and status == "[OK]"
+            print(
+                f"{status} {size[0]}x{size[1]} fade_start={fade_start}: "
+                f"legacy {legacy_seconds * 1000:.1f} ms, numpy {new_seconds * 1000:.1f} ms, "
+                f"{speedup:.0f}x, identical={identical}"
+            )
+
+    print(f"\n{'PASSED' if ok else 'FAILED'} (required speedup: {REQUIRED_SPEEDUP:.0f}x)")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
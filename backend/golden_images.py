@@ -0,0 +1,259 @@
+"""
+Golden-image regression harness for shadows and pipelines
+Renders every shadow type and pipeline on fixed synthetic products and
+compares the result against the goldens stored in golden_images/ (lossless
+WebP; PSNR, size). Timing is reported next to the diff, and against the timing recorded
+when the goldens were generated, so an optimisation can be shown to keep the
+output. tests/test_golden_images.py runs the same comparison under pytest.
+
+The goldens were rendered by the renderers from before the NumPy/OpenCV
+rewrites ("source": "baseline" in manifest.json). Cases whose output was
+changed on purpose later, rather than kept, were rendered after the change
+and say so in their source: 'auto' picks the shadow from the alpha mask
+and the basic pipeline honours the shadow type (both from the in-memory
+auto-detection change). The explicit-type pipeline cases still pin those
+shadows to the baseline.
+
+Run from backend/:
+    python golden_images.py              # compare against the goldens
+    python golden_images.py --update     # regenerate goldens (after an intended visual change)
+    python golden_images.py --update --source "..." -k basic/   # record why they changed
+    python golden_images.py -k natural   # only cases whose name contains "natural"
+"""
+import argparse
+import contextlib
+import io
+import json
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add backend to path
+sys.path.insert(0, str(Path(__file__).parent))
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from app.processing.shadow_effects import ShadowEffects, apply_professional_shadow, apply_simple_drop_shadow
+from app.processing.variants import MARKETPLACE_TARGETS, compose_on_white, render_variants
+
+GOLDEN_DIR = Path(__file__).parent / "golden_images"
+MANIFEST_PATH = GOLDEN_DIR / "manifest.json"
+MIN_PSNR = 45.0  # dB; identical output reports inf
+REPEATS = 3
+
+
+def _textured(size, color) -> Image.Image:
+    """Deterministic shaded texture so blur or resampling changes show up in the PSNR"""
+    width, height = size
+    y, x = np.mgrid[0:height, 0:width]
+    shade = 0.75 + 0.25 * np.sin(x / 30.0) * np.cos(y / 45.0)
+    pixels = np.clip(np.array(color, dtype=np.float32) * shade[:, :, np.newaxis], 0, 255)
+    return Image.fromarray(pixels.astype(np.uint8), 'RGB')
+
+
+def _product(size, draw_mask, color) -> Image.Image:
+    """Cutout-like product: textured color, soft-edged alpha, transparent elsewhere"""
+    mask = Image.new('L', size, 0)
+    draw_mask(ImageDraw.Draw(mask), *size)
+    mask = mask.filter(ImageFilter.GaussianBlur(1.5))
+    product = _textured(size, color).convert('RGBA')
+    product.putalpha(mask)
+    return product
+
+
+def make_bottle(size=(160, 400)) -> Image.Image:
+    """Tall and narrow, wide base: detected as reflection"""
+    def draw(d, w, h):
+        d.rectangle((w * 0.4, h * 0.02, w * 0.6, h * 0.25), fill=255)
+        d.ellipse((w * 0.1, h * 0.2, w * 0.9, h * 0.45), fill=255)
+        d.rectangle((w * 0.1, h * 0.32, w * 0.9, h * 0.999), fill=255)
+    return _product(size, draw, (40, 150, 70))
+
+
+def make_chair(size=(320, 320)) -> Image.Image:
+    """Seat and back on separate legs: detected as natural"""
+    def draw(d, w, h):
+        d.rectangle((w * 0.2, h * 0.05, w * 0.8, h * 0.45), fill=255)
+        d.rectangle((w * 0.15, h * 0.45, w * 0.85, h * 0.6), fill=255)
+        for x in (0.17, 0.47, 0.77):
+            d.rectangle((w * x, h * 0.6, w * (x + 0.06), h * 0.999), fill=255)
+    return _product(size, draw, (150, 90, 40))
+
+
+def make_box(size=(280, 280)) -> Image.Image:
+    """Solid, square-ish product: detected as drop"""
+    def draw(d, w, h):
+        d.rounded_rectangle((w * 0.1, h * 0.1, w * 0.9, h * 0.95), radius=w * 0.06, fill=255)
+        d.ellipse((w * 0.3, h * 0.3, w * 0.7, h * 0.7), fill=200)
+    return _product(size, draw, (200, 50, 50))
+
+
+PRODUCTS = {"bottle": make_bottle, "chair": make_chair, "box": make_box}
+
+
+def _professional(product: Image.Image, pipeline: str, shadow_type: str) -> Image.Image:
+    """apply_professional_shadow() goes through files, as in the API"""
+    with tempfile.TemporaryDirectory() as tmp:
+        input_path, output_path = Path(tmp) / "input.png", Path(tmp) / "output.png"
+        product.save(input_path)
+        if not apply_professional_shadow(str(input_path), str(output_path), pipeline, shadow_type):
+            raise RuntimeError(f"apply_professional_shadow failed ({pipeline}, {shadow_type})")
+        return Image.open(output_path).copy()
+
+
+def build_cases():
+    """Case name -> (product name, render function returning {suffix: image})"""
+    effects = ShadowEffects()
+    shadow_params = lambda shadow_type: {'enabled': True, 'type': shadow_type, 'intensity': 0.5}
+    cases = {}
+
+    for product in PRODUCTS:
+        # Shadow engine, default parameters of each effect
+        cases[f"shadow/{product}_drop"] = (product, lambda img: {"": effects.create_drop_shadow(img)})
+        cases[f"shadow/{product}_natural"] = (product, lambda img: {"": effects.create_natural_shadow(img)})
+        cases[f"shadow/{product}_reflection"] = (product, lambda img: {"": effects.create_reflection_shadow(img)})
+        cases[f"shadow/{product}_simple_drop"] = (product, lambda img: {"": apply_simple_drop_shadow(img, 0.5)})
+
+        # Professional pipelines (pipeline parameters; 'auto' detection, and
+        # each shadow type on the product whose 'auto' pick changed)
+        for pipeline in ("amazon", "instagram", "ebay"):
+            shadow_types = ("auto", "drop", "natural", "reflection") if product == "chair" else ("auto",)
+            for shadow_type in shadow_types:
+                cases[f"pipeline/{pipeline}_{product}_{shadow_type}"] = (
+                    product,
+                    lambda img, pipeline=pipeline, shadow_type=shadow_type: {
+                        "": _professional(img, pipeline, shadow_type)
+                    },
+                )
+
+        # Basic pipeline: cutout on white with each shadow type
+        for shadow_type in ("none", "drop", "natural", "reflection", "auto"):
+            cases[f"basic/{product}_{shadow_type}"] = (
+                product, lambda img, shadow_type=shadow_type: {"": compose_on_white(img, shadow_params(shadow_type))}
+            )
+
+    # Marketplace variants from one large cutout (resized per target)
+    cases["variants/bottle_auto"] = (
+        "bottle_large",
+        lambda img: render_variants(img, MARKETPLACE_TARGETS.values(), shadow_params('auto')),
+    )
+    return cases
+
+
+def make_products():
+    """Product name -> synthetic cutout, for build_cases()"""
+    products = {name: make() for name, make in PRODUCTS.items()}
+    products["bottle_large"] = make_bottle((680, 1700))
+    return products
+
+
+def compare(expected: Image.Image, actual: Image.Image):
+    """PSNR in dB and largest per-channel difference (RGBA, so alpha counts too)"""
+    a = np.asarray(expected.convert('RGBA'), dtype=np.float64)
+    b = np.asarray(actual.convert('RGBA'), dtype=np.float64)
+    mse = np.mean((a - b) ** 2)
+    score = float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+    return score, int(np.abs(a - b).max())
+
+
+def render(func, product: Image.Image, repeats: int = REPEATS):
+    """Best-of-`repeats` seconds and the rendered images (prints from the renderers silenced)"""
+    best, images = None, None
+    for _ in range(repeats):
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            images = func(product.copy())
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, images
+
+
+def golden_path(case: str, suffix: str) -> Path:
+    name = f"{case}_{suffix}" if suffix else case
+    return GOLDEN_DIR / f"{name}.webp"
+
+
+def check(case: str, images, min_psnr: float = MIN_PSNR):
+    """Whether every image of a case matches its golden, and a result per image"""
+    results = []
+    case_ok = True
+    for suffix, image in images.items():
+        path = golden_path(case, suffix)
+        if not path.exists():
+            case_ok = False
+            results.append(f"{suffix or 'image'} missing golden")
+            continue
+        expected = Image.open(path)
+        if expected.size != image.size:
+            case_ok = False
+            results.append(f"{suffix or 'image'} size {image.size} != {expected.size}")
+            continue
+        score, max_diff = compare(expected, image)
+        case_ok = case_ok and score >= min_psnr
+        diff = 'identical' if score == float('inf') else f'{score:.1f} dB, max diff {max_diff}'
+        results.append(f"{suffix + ' ' if suffix else ''}{diff}")
+    return case_ok, results
+
+
+def main() -> bool:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--update", action="store_true", help="regenerate the goldens instead of comparing")
+    parser.add_argument("-k", dest="pattern", default="", help="only cases whose name contains this text")
+    parser.add_argument("--min-psnr", type=float, default=MIN_PSNR, help=f"tolerance in dB (default {MIN_PSNR})")
+    parser.add_argument("--source", default="current",
+                        help="with --update: what rendered the goldens, recorded in manifest.json")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)  # Renderer warnings would bury the report; failures still raise
+
+    print("\n" + "=" * 60)
+    print("GOLDEN IMAGES " + ("UPDATE" if args.update else "CHECK"))
+    print("=" * 60 + "\n")
+
+    products = make_products()
+    manifest = json.loads(MANIFEST_PATH.read_text()) if MANIFEST_PATH.exists() else {}
+
+    ok = True
+    total_seconds = total_golden_seconds = 0.0
+    for case, (product, func) in build_cases().items():
+        if args.pattern not in case:
+            continue
+        seconds, images = render(func, products[product])
+
+        if args.update:
+            for suffix, image in images.items():
+                path = golden_path(case, suffix)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                image.save(path, 'WEBP', lossless=True, exact=True, quality=100, method=6)
+            manifest[case] = {"seconds": round(seconds, 5), "images": sorted(images), "source": args.source}
+            print(f"[SAVED] {case}: {len(images)} image(s), {seconds * 1000:.1f} ms")
+            continue
+
+        case_ok, results = check(case, images, args.min_psnr)
+
+        golden_seconds = manifest.get(case, {}).get("seconds")
+        timing = f"{seconds * 1000:.1f} ms"
+        if golden_seconds:
+            timing += f" (golden {golden_seconds * 1000:.1f} ms, speedup {golden_seconds / seconds:.2f}x)"
+            total_seconds += seconds
+            total_golden_seconds += golden_seconds
+
+        ok = ok and case_ok
+        print(f"{'[OK]' if case_ok else '[FAIL]'} {case}: {', '.join(results)} | {timing}")
+
+    if args.update:
+        MANIFEST_PATH.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n")
+        print(f"\nGoldens written to {GOLDEN_DIR}")
+        return True
+
+    if total_seconds:
+        print(f"\nTotal {total_seconds * 1000:.1f} ms vs golden {total_golden_seconds * 1000:.1f} ms "
+              f"(speedup {total_golden_seconds / total_seconds:.2f}x)")
+    print(f"\n{'PASSED' if ok else 'FAILED'} (tolerance: PSNR >= {args.min_psnr:.0f} dB)")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -7,13 +7,11 @@ import os
 import time
 import asyncio
 import logging
-import zipfile
-import tempfile
-import threading
 import io
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import uuid
+import tempfile
 from dotenv import load_dotenv
 
 # Cargar .env desde la raíz del proyecto
@@ -24,14 +22,53 @@ print(f"Loading .env from: {env_path}")
 print(f"SUPABASE_URL exists: {os.getenv('SUPABASE_URL') is not None}")
 print(f"SUPABASE_SERVICE_ROLE_KEY exists: {os.getenv('SUPABASE_SERVICE_ROLE_KEY') is not None}")
 
-from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Header
+from fastapi import FastAPI, File, UploadFile, HTTPException, Request, Header, Form
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, FileResponse
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 
 # Import our simple processing function
-from app.services.simple_processing import process_image_simple
+from app.services.simple_processing import process_image_simple, process_image_variants
+from app.processing.variants import resolve_targets, variant_filename
 from app.services.batch_processor import SmartBatchProcessor
+from app.services.progress_stream import progress_broadcaster, stream_job_progress
+from app.services.progress_store import create_progress_store
+from app.services.staged_uploads import StagedUploadStore
+from app.services.resumable_uploads import (
+    ChunkChecksumMismatchError,
+    ChunkOffsetMismatchError,
+    IncompleteUploadError,
+    ResumableUploadError,
+    ResumableUploadStore,
+    UploadSessionNotFoundError
+)
+from app.services.archive_extraction import (
+    add_to_size_histogram,
+    analyze_archive,
+    extract_images_from_archive,
+    new_size_histogram,
+    stream_extracted_images,
+    supported_archive_extensions
+)
+from app.services.job_manifest import JobManifest, describe_image
+from app.services.result_archive import (
+    ResultArchiveBuilder, archive_download_response, archive_member_name, archive_members, completion_version
+)
+from app.services.http_cache import conditional_file_response, file_etag, strong_etag
+from app.services.thumbnails import thumbnail_service
+from app.services.object_storage import ObjectNotFoundError, object_storage, publish_job_results
+from app.services.storage_lifecycle import StorageClass, StorageLifecycleManager, retention_seconds
+from app.services.throughput_model import throughput_model
+from app.services.upload_storage import (
+    MAX_ARCHIVE_SIZE,
+    MAX_IMAGE_SIZE,
+    RequestSizeLimitMiddleware,
+    UploadTooLargeError,
+    hash_file,
+    safe_filename,
+    save_upload_to_disk
+)
 
 # Imports para créditos
 from app.services.credit_service import (
@@ -55,9 +92,8 @@ else:
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# In-memory progress tracking
-JOB_PROGRESS = {}
-progress_lock = threading.Lock()
+# Progress tracking (in-memory by default, Redis with PROGRESS_STORE=redis)
+progress_store = create_progress_store()
 
 def _generate_short_filename(index: int, original_ext: str) -> str:
     """
@@ -88,15 +124,25 @@ def _generate_short_filename(index: int, original_ext: str) -> str:
     return f"img_{index:03d}{ext}"
 
 def update_progress(job_id: str, current: int, total: int, status: str = "processing"):
-    """Update job progress in memory"""
-    with progress_lock:
-        JOB_PROGRESS[job_id] = {
-            "current": current,
-            "total": total,
-            "percentage": int((current / total * 100)) if total > 0 else 0,
-            "status": status,
-            "updated_at": time.time()
-        }
+    """Update job progress in the progress store and push it to SSE subscribers"""
+    snapshot = {
+        "current": current,
+        "total": total,
+        "percentage": int((current / total * 100)) if total > 0 else 0,
+        "status": status,
+        "updated_at": time.time()
+    }
+    progress_store.set(job_id, snapshot)
+    progress_broadcaster.publish_progress(job_id, snapshot)
+
+def get_progress_snapshot(job_id: str):
+    """Return a copy of the current progress entry for a job (or None)"""
+    return progress_store.get(job_id)
+
+def is_job_active(job_id: str) -> bool:
+    """Whether the progress store reports the job as still processing"""
+    snapshot = progress_store.get(job_id)
+    return snapshot is not None and snapshot.get("status") in ("starting", "processing")
 
 # FastAPI app
 app = FastAPI(
@@ -105,6 +151,18 @@ app = FastAPI(
     version="2.0.0"
 )
 
+# Reject oversized upload bodies while they stream in (registered before CORS
+# so 413 responses still carry CORS headers)
+MAX_UPLOAD_REQUEST_SIZE = int(os.getenv("MAX_UPLOAD_REQUEST_MB", 1024)) * 1024 * 1024
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        "/api/v1/upload": MAX_UPLOAD_REQUEST_SIZE,
+        "/api/v1/analyze-upload": MAX_UPLOAD_REQUEST_SIZE,
+        "/api/v1/manual-editor/": MAX_IMAGE_SIZE
+    }
+)
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -131,12 +189,70 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 PROCESSED_DIR.mkdir(exist_ok=True)
 TEMP_DIR.mkdir(exist_ok=True)
 
+# Uploads spooled by /analyze-upload, adopted by /upload via upload_token
+staged_uploads = StagedUploadStore(
+    TEMP_DIR / "staged",
+    ttl_seconds=int(os.getenv("STAGED_UPLOAD_TTL_SECONDS", 3600))
+)
+
+# Resumable chunked upload sessions (data lands in UPLOAD_DIR/<job_id>)
+resumable_uploads = ResumableUploadStore(
+    UPLOAD_DIR,
+    ttl_seconds=int(os.getenv("RESUMABLE_UPLOAD_TTL_SECONDS", 24 * 3600))
+)
+
+def active_job_protection():
+    """
+    Protection check for one storage GC pass: entries of jobs that are still
+    processing are never collected. The job list is read once per pass.
+    """
+    active = {
+        job["job_id"] for job in progress_store.list_jobs()
+        if job.get("status") in ("starting", "processing")
+    }
+    return lambda path: any(part in active for part in path.parts)
+
+# Background cleanup of job storage: per-class retention, disk watermarks,
+# derived artifacts evicted before originals
+storage_lifecycle = StorageLifecycleManager(
+    [
+        StorageClass("thumbnails", PROCESSED_DIR, retention_seconds("thumbnails", 72), derived=True, pattern="*/thumbs"),
+        StorageClass("archives", PROCESSED_DIR, retention_seconds("archives", 24), derived=True, pattern="*/*.zip"),
+        StorageClass("extracts", Path(tempfile.gettempdir()) / "masterpost_extracts", retention_seconds("extracts", 6), derived=True),
+        # TEMP_DIR/<job_id> holds manual editor source uploads: user data, not derived
+        StorageClass("editor_uploads", TEMP_DIR, retention_seconds("editor_uploads", 24), exclude={"staged", "edited"}),
+        StorageClass("edited", TEMP_DIR / "edited", retention_seconds("edited", 72)),
+        StorageClass("uploads", UPLOAD_DIR, retention_seconds("uploads", 24)),
+        StorageClass("processed", PROCESSED_DIR, retention_seconds("processed", 72)),
+    ],
+    high_watermark=float(os.getenv("STORAGE_HIGH_WATERMARK", 0.85)),
+    low_watermark=float(os.getenv("STORAGE_LOW_WATERMARK", 0.75)),
+    interval_seconds=int(os.getenv("STORAGE_GC_INTERVAL_SECONDS", 600)),
+    grace_seconds=int(os.getenv("STORAGE_EVICTION_GRACE_SECONDS", 3600)),
+    protection_for_pass=active_job_protection
+)
+
+@app.on_event("startup")
+async def start_storage_lifecycle():
+    if os.getenv("STORAGE_GC_ENABLED", "true").lower() == "true":
+        storage_lifecycle.start()
+
+@app.on_event("shutdown")
+async def stop_storage_lifecycle():
+    await storage_lifecycle.stop()
+
 # Mount static files for serving processed images
 app.mount("/processed", StaticFiles(directory="processed"), name="processed")
 
 # Allowed file extensions
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp"}
-ALLOWED_ARCHIVE_EXTENSIONS = {".zip", ".rar", ".7z"}
+ALLOWED_ARCHIVE_EXTENSIONS = supported_archive_extensions()  # .zip, plus .rar / .7z when rarfile / py7zr are installed
+
+# Written by /upload in pipelined mode: archives /process extracts while processing
+PIPELINED_INGEST_FILE = "pipelined_ingest.json"
+
+# Render gallery thumbnails as each image finishes (otherwise on first request)
+PRECOMPUTE_THUMBNAILS = os.getenv("PRECOMPUTE_THUMBNAILS", "true").lower() == "true"
 
 def validate_upload_file(file: UploadFile) -> bool:
     """Validate uploaded file (image or archive)"""
@@ -150,180 +266,140 @@ def validate_upload_file(file: UploadFile) -> bool:
     if not (is_image or is_archive):
         return False
 
-    # Size limits
-    if is_archive:
-        max_size = 500 * 1024 * 1024  # 500MB for ZIP archives
-    else:
-        max_size = 50 * 1024 * 1024   # 50MB for individual images
-
-    if file.size and file.size > max_size:
+    # Size limits (also enforced while streaming to disk)
+    if file.size and file.size > get_upload_size_limit(file.filename):
         return False
 
     return True
 
+def get_upload_size_limit(filename: str) -> int:
+    """Maximum accepted size for an uploaded file"""
+    return MAX_ARCHIVE_SIZE if is_archive_file(filename) else MAX_IMAGE_SIZE
+
 def is_archive_file(filename: str) -> bool:
     """Check if file is an archive"""
     return any(filename.lower().endswith(ext) for ext in ALLOWED_ARCHIVE_EXTENSIONS)
 
-def extract_images_from_zip(zip_path: Path, extract_to: Path) -> tuple:
-    """
-    Extract ALL images from ZIP file with SHORT FILENAMES to avoid Windows path length limits.
-    Uses format: img_0001_a3f8d9e2.jpg (max 25 chars)
-    Returns: (extracted_images: List[Path], failed_images: List[dict])
-    """
-    from PIL import Image
-    import io
-    import hashlib
+def format_time(seconds: int) -> str:
+    """Format seconds to mm:ss"""
+    mins = seconds // 60
+    secs = seconds % 60
+    return f"{mins}:{secs:02d}"
 
-    # Extended image extensions
-    image_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.bmp', '.tiff', '.tif'}
-    extracted_images = []
-    failed_images = []
-    skipped_files = []
+def count_queued_images() -> int:
+    """Images of running jobs that are not finished yet (live queue depth)"""
+    queued = 0
+    for job in progress_store.list_jobs():
+        if job.get("status") in ("starting", "processing"):
+            queued += max(job.get("total", 0) - job.get("current", 0), 0)
+    return queued
 
-    logger.info("=" * 80)
-    logger.info(f"🔍 ANALYZING ZIP: {zip_path.name}")
+def read_image_megapixels(source) -> float:
+    """Megapixels from the image header only (PIL opens lazily, no decoding)"""
+    from PIL import Image
 
     try:
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            all_files = zip_ref.namelist()
-            logger.info(f"📁 Total files in ZIP: {len(all_files)}")
-            logger.info("")
-
-            image_count = 0
-
-            for idx, file_info in enumerate(zip_ref.filelist, 1):
-                full_filename = file_info.filename
-                file_path = Path(full_filename)
-                filename = file_path.name
-
-                # Show original filename (truncated if too long)
-                display_name = full_filename if len(full_filename) <= 60 else full_filename[:57] + "..."
-                logger.info(f"[{idx}/{len(all_files)}] {display_name}")
-
-                # 1. Check if directory
-                if file_info.is_dir():
-                    logger.info(f"   ⏭️  SKIP: Is directory")
-                    skipped_files.append({"file": full_filename, "reason": "directory"})
-                    continue
-
-                # 2. Check system files
-                if any(x in full_filename for x in ['__MACOSX', '.DS_Store', 'Thumbs.db', 'desktop.ini']):
-                    logger.info(f"   ⏭️  SKIP: System file")
-                    skipped_files.append({"file": full_filename, "reason": "system_file"})
-                    continue
-
-                # 3. Check hidden files
-                if filename.startswith('.') or filename.startswith('._'):
-                    logger.info(f"   ⏭️  SKIP: Hidden file")
-                    skipped_files.append({"file": full_filename, "reason": "hidden_file"})
-                    continue
-
-                # 4. Check extension (case-insensitive)
-                ext = file_path.suffix.lower()
-                if ext not in image_extensions:
-                    logger.info(f"   ⏭️  SKIP: Not an image (ext: {file_path.suffix})")
-                    skipped_files.append({"file": full_filename, "reason": f"not_image:{file_path.suffix}"})
-                    continue
-
-                # 5. Check size in ZIP
-                if file_info.file_size == 0:
-                    logger.info(f"   ❌ FAILED: Empty file (0 bytes)")
-                    failed_images.append({"file": full_filename, "reason": "empty_file"})
-                    continue
-
-                logger.info(f"   📏 Size: {file_info.file_size:,} bytes")
-
-                # 6. GENERATE SHORT FILENAME to avoid Windows 260 char path limit
-                # Format: img_0001_a3f8d9e2.jpg (max 25 chars)
-                name_hash = hashlib.md5(filename.encode()).hexdigest()[:8]
-                short_filename = f"img_{image_count:04d}_{name_hash}{ext}"
-
-                # 7. Try to extract and validate
-                try:
-                    # Read file data from ZIP
-                    data = zip_ref.read(file_info)
+        with Image.open(source) as img:
+            return img.width * img.height / 1_000_000
+    except Exception:
+        return 0.0
 
-                    # Validate the image data
-                    try:
-                        img = Image.open(io.BytesIO(data))
-                        img.verify()
-                        img_format = img.format
-                        # Re-open for size (verify closes the image)
-                        img = Image.open(io.BytesIO(data))
-                        img_size = img.size
-                    except Exception as img_error:
-                        logger.info(f"   ❌ FAILED: Corrupt/invalid image - {str(img_error)}")
-                        failed_images.append({"file": full_filename, "reason": f"corrupt:{str(img_error)}"})
-                        continue
-
-                    # 8. Save with SHORT filename
-                    extract_path = extract_to / short_filename
-
-                    with open(extract_path, 'wb') as f:
-                        f.write(data)
-
-                    # 9. Verify file was saved
-                    if not extract_path.exists():
-                        logger.info(f"   ❌ FAILED: File not saved")
-                        failed_images.append({"file": full_filename, "reason": "not_saved"})
-                        continue
-
-                    actual_size = extract_path.stat().st_size
-                    if actual_size == 0:
-                        logger.info(f"   ❌ FAILED: File is 0 bytes after saving")
-                        failed_images.append({"file": full_filename, "reason": "zero_bytes_after_save"})
-                        extract_path.unlink()  # Clean up
-                        continue
-
-                    # 10. Success!
-                    logger.info(f"   ✅ SUCCESS: {img_format} {img_size} -> {short_filename}")
-                    extracted_images.append(extract_path)
-                    image_count += 1
+def ingest_uploaded_files(job_id: str, job_dir: Path, uploaded_files: List[Dict[str, Any]], pipelined: bool) -> Dict[str, Any]:
+    """
+    Turn files saved in a job directory into images ready for /process
+    (blocking: archives are extracted and hashed, so call it in a threadpool)
 
-                except Exception as e:
-                    logger.error(f"   ❌ FAILED: Extraction error - {str(e)}")
-                    failed_images.append({"file": full_filename, "reason": f"extract_error:{str(e)}"})
-                    continue
-
-            # Summary
-            logger.info("")
-            logger.info("=" * 80)
-            logger.info(f"📊 EXTRACTION SUMMARY:")
-            logger.info(f"   ✅ Extracted: {len(extracted_images)}")
-            logger.info(f"   ❌ Failed: {len(failed_images)}")
-            logger.info(f"   ⏭️  Skipped: {len(skipped_files)}")
-            logger.info(f"   📁 Total processed: {len(extracted_images) + len(failed_images) + len(skipped_files)}")
-
-            if failed_images:
-                logger.info(f"")
-                logger.info(f"❌ FAILED FILES:")
-                for fail in failed_images:
-                    # Truncate long filenames in summary
-                    fail_file = fail['file'] if len(fail['file']) <= 80 else fail['file'][:77] + "..."
-                    logger.info(f"   - {fail_file}: {fail['reason']}")
-
-            if skipped_files:
-                logger.info(f"")
-                logger.info(f"⏭️  SKIPPED FILES (showing first 10):")
-                for skip in skipped_files[:10]:
-                    skip_file = skip['file'] if len(skip['file']) <= 80 else skip['file'][:77] + "..."
-                    logger.info(f"   - {skip_file}: {skip['reason']}")
-                if len(skipped_files) > 10:
-                    logger.info(f"   ... and {len(skipped_files) - 10} more")
-
-            logger.info("=" * 80)
+    Archives are extracted now, or in pipelined mode only counted and left
+    for /process. Shared by /upload and resumable upload sessions.
 
-    except Exception as e:
-        logger.error(f"❌ Error opening ZIP file {zip_path}: {e}")
+    Returns:
+        The /upload response
+    """
+    all_image_files = []
+    all_failed_images = []
+    pending_archives = []
+    pending_archive_images = 0
+
+    # Entries for the job manifest, merged in at the end: resumable sessions
+    # add files to the same job, possibly several at once
+    manifest_entries = []
+
+    def record_extracted(member_name: str, detail: Dict[str, Any]):
+        manifest_entries.append(describe_image(
+            detail["path"], sha256=detail["sha256"], size=detail["bytes"],
+            dimensions=detail["size"], source=member_name
+        ))
+
+    for uploaded in uploaded_files:
+        file_path = Path(uploaded["path"])
+
+        # Pipelined: leave the archive for /process, just count its images
+        if pipelined and is_archive_file(uploaded["filename"]):
+            try:
+                pending_archive_images += len(analyze_archive(file_path)["image_sizes"])
+                pending_archives.append(file_path.name)
+            except Exception as e:
+                logger.error(f"Error reading archive {uploaded['filename']}: {e}")
+                all_failed_images.append({"file": uploaded["filename"], "reason": f"archive_error:{str(e)}"})
+
+        # If it's an archive, extract images
+        elif is_archive_file(uploaded["filename"]):
+            logger.info(f"📦 Extracting images from archive: {uploaded['filename']}")
+            extracted_images, failed_images = extract_images_from_archive(
+                file_path, job_dir, on_extracted=record_extracted
+            )
+            all_image_files.extend(extracted_images)
+            all_failed_images.extend(failed_images)
+            logger.info(f"✅ Extracted {len(extracted_images)} images, ❌ {len(failed_images)} failed from {uploaded['filename']}")
+        else:
+            # Regular image file (hash and size are known from the upload)
+            all_image_files.append(file_path)
+            manifest_entries.append(describe_image(
+                file_path, sha256=uploaded["sha256"], size=uploaded["size"], source=uploaded["filename"]
+            ))
 
-    return extracted_images, failed_images
+    if not uploaded_files:
+        raise HTTPException(status_code=400, detail="No valid files uploaded")
 
-def format_time(seconds: int) -> str:
-    """Format seconds to mm:ss"""
-    mins = seconds // 60
-    secs = seconds % 60
-    return f"{mins}:{secs:02d}"
+    images_found = len(all_image_files) + pending_archive_images
+    if not images_found:
+        raise HTTPException(status_code=400, detail="No valid image files found (either direct uploads or in archives)")
+
+    # The job's manifest lock also serializes the pipelined ingest file
+    with JobManifest.updating(job_dir) as manifest:
+        manifest.extend(manifest_entries)
+
+        if pending_archives:
+            import json
+            ingest_file = job_dir / PIPELINED_INGEST_FILE
+            ingest = {"archives": [], "expected_images": 0}
+            if ingest_file.exists():
+                # Resumable sessions add files to the same job one at a time
+                with open(ingest_file, "r") as f:
+                    ingest = json.load(f)
+            ingest["archives"].extend(pending_archives)
+            ingest["expected_images"] += pending_archive_images
+            with open(ingest_file, "w") as f:
+                json.dump(ingest, f)
+
+    logger.info("")
+    logger.info("🎯 FINAL COUNT:")
+    logger.info(f"   ✅ Images to process: {images_found}")
+    if pending_archives:
+        logger.info(f"   📦 Extracted during processing: {pending_archive_images}")
+    logger.info(f"   ❌ Failed images: {len(all_failed_images)}")
+
+    return {
+        "success": True,
+        "job_id": job_id,
+        "message": f"Uploaded {len(uploaded_files)} files, found {images_found} images for processing",
+        "files_uploaded": len(uploaded_files),
+        "images_found": images_found,
+        "pipelined": bool(pending_archives),
+        "images_failed": len(all_failed_images),
+        "failed_details": all_failed_images[:10] if len(all_failed_images) <= 10 else all_failed_images[:10],
+        "files": uploaded_files
+    }
 
 @app.get("/")
 async def root():
@@ -336,89 +412,174 @@ async def root():
     }
 
 @app.post("/api/v1/analyze-upload")
-async def analyze_upload(files: List[UploadFile] = File(...)):
+async def analyze_upload(
+    files: List[UploadFile] = File(...),
+    pipeline: str = Form("amazon"),
+    use_premium: bool = Form(False),
+    shadow_enabled: bool = Form(False)
+):
     """
     Analyze uploaded files and count how many images there are
     before processing them. Returns total image count and estimated time.
 
-    Real production data:
-    100 images = 230 seconds → 2.3 seconds per image
+    Files are spooled to a staging area and archives are analyzed from
+    their directory only (the ZIP central directory, RAR/7z headers). The returned upload_token can be passed to
+    /api/v1/upload so the same files don't have to be sent twice.
+
+    The estimate comes from the historical throughput model (per-image
+    timings keyed by megapixels, pipeline, shadow mode and tier) plus the
+    images already queued by other jobs, with a 90% confidence interval.
     """
+    token = None
     try:
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
 
-        # Real average time based on production data:
-        # 100 images = 230 seconds → 2.3 seconds per image
-        SECONDS_PER_IMAGE = 2.3
+        staged_uploads.purge_expired()
+        token = staged_uploads.create()
+        staging_dir = staged_uploads.path_for(token)
 
         total_images = 0
+        total_uncompressed_bytes = 0
+        size_histogram = new_size_histogram()
         file_details = []
+        staged_files = []
+        image_megapixels = []
 
-        for file in files:
+        for index, file in enumerate(files):
             file_info = {
                 "filename": file.filename,
                 "type": "unknown",
                 "image_count": 0
             }
+            file_details.append(file_info)
 
-            # If it's a ZIP file, count images inside
-            if file.filename and is_archive_file(file.filename):
-                try:
-                    # Read ZIP in memory
-                    contents = await file.read()
-                    zip_file = zipfile.ZipFile(io.BytesIO(contents))
-
-                    # Count image files
-                    image_count = 0
-                    for zip_info in zip_file.namelist():
-                        ext = Path(zip_info).suffix.lower()
-                        if ext in ALLOWED_EXTENSIONS:
-                            image_count += 1
+            if not validate_upload_file(file):
+                file_info["error"] = "Unsupported file type or size"
+                continue
 
-                    file_info["type"] = "zip"
-                    file_info["image_count"] = image_count
-                    total_images += image_count
+            # Spool to the staging area in chunks instead of reading into memory
+            stored_name = safe_filename(file.filename)
+            if any(entry["stored_name"] == stored_name for entry in staged_files):
+                stored_name = f"{index:03d}_{stored_name}"
+            try:
+                stored = await save_upload_to_disk(
+                    file, staging_dir / stored_name, get_upload_size_limit(file.filename)
+                )
+            except UploadTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
 
-                    # Reset file pointer for later processing
-                    await file.seek(0)
+            staged_files.append({
+                "filename": file.filename,
+                "stored_name": stored_name,
+                "size": stored.size,
+                "sha256": stored.sha256
+            })
 
-                    logger.info(f"Analyzed ZIP {file.filename}: found {image_count} images")
+            # If it's an archive, count images from its directory
+            if is_archive_file(file.filename):
+                try:
+                    analysis = analyze_archive(stored.path)
+                    image_megapixels.extend(
+                        # Only the size is known without decompressing
+                        throughput_model.megapixels_from_bytes(size) for size in analysis["image_sizes"]
+                    )
+                    for label, count in analysis["size_histogram"].items():
+                        size_histogram[label] += count
+
+                    file_info["type"] = Path(file.filename).suffix.lower().lstrip(".")  # zip, rar, 7z
+                    file_info["image_count"] = len(analysis["image_sizes"])
+                    file_info["uncompressed_bytes"] = analysis["uncompressed_bytes"]
+                    total_images += file_info["image_count"]
+                    total_uncompressed_bytes += analysis["uncompressed_bytes"]
+
+                    logger.info(f"Analyzed archive {file.filename}: found {file_info['image_count']} images")
 
                 except Exception as e:
-                    logger.error(f"Error analyzing ZIP {file.filename}: {str(e)}")
+                    logger.error(f"Error analyzing archive {file.filename}: {str(e)}")
                     file_info["error"] = str(e)
 
             # If it's an individual image
-            elif file.content_type and file.content_type.startswith('image/'):
+            else:
                 file_info["type"] = "image"
                 file_info["image_count"] = 1
+                file_info["uncompressed_bytes"] = stored.size
                 total_images += 1
-                await file.seek(0)  # Reset pointer
-
-            file_details.append(file_info)
-
-        # Calculate estimated time with real production data
-        estimated_seconds = int(total_images * SECONDS_PER_IMAGE)
+                total_uncompressed_bytes += stored.size
+                add_to_size_histogram(size_histogram, stored.size)
+                megapixels = read_image_megapixels(stored.path)
+                if megapixels <= 0:
+                    megapixels = throughput_model.megapixels_from_bytes(stored.size)
+                image_megapixels.append(megapixels)
+
+        if staged_files:
+            staged_uploads.save_manifest(token, staged_files)
+        else:
+            staged_uploads.discard(token)
+            token = None
+
+        # Estimate from historical timings and the live queue
+        estimate = throughput_model.estimate(
+            image_megapixels,
+            pipeline=pipeline,
+            shadow=shadow_enabled,
+            premium=use_premium,
+            queued_images=await run_in_threadpool(count_queued_images)
+        )
+        estimated_seconds = int(round(estimate["estimated_seconds"]))
+        low_seconds = int(estimate["low_seconds"])
+        high_seconds = int(round(estimate["high_seconds"]))
 
         return {
             "success": True,
+            "upload_token": token,
+            "upload_token_expires_in": staged_uploads.ttl_seconds if token else None,
             "total_images": total_images,
+            "total_uncompressed_bytes": total_uncompressed_bytes,
+            "size_histogram": size_histogram,
             "files": file_details,
             "estimated_time_seconds": estimated_seconds,
             "estimated_time_formatted": format_time(estimated_seconds),
-            "seconds_per_image": SECONDS_PER_IMAGE
+            "seconds_per_image": round(estimate["seconds_per_image"], 2),
+            "estimate": {
+                "low_seconds": low_seconds,
+                "high_seconds": high_seconds,
+                "range_formatted": f"{format_time(low_seconds)} - {format_time(high_seconds)}",
+                "confidence": 0.9,
+                "samples": estimate["samples"],
+                "queued_images": estimate["queued_images"],
+                "parallel_speedup": round(estimate["speedup"], 2)
+            }
         }
 
+    except HTTPException:
+        if token:
+            staged_uploads.discard(token)
+        raise
     except Exception as e:
+        if token:
+            staged_uploads.discard(token)
         logger.error(f"Analysis error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/v1/upload")
-async def upload_images(files: List[UploadFile] = File(...)):
-    """Upload images for processing"""
+async def upload_images(
+    files: List[UploadFile] = File(None),
+    upload_token: Optional[str] = Form(None),
+    pipelined: bool = Form(False)
+):
+    """
+    Upload images for processing
+
+    Either send the files again, or pass the upload_token returned by
+    /api/v1/analyze-upload to adopt the files it already staged.
+
+    With pipelined=true archives are only counted (central directory) and
+    left for /api/v1/process, which extracts them while the first images
+    are already being processed.
+    """
     try:
-        if not files:
+        if not files and not upload_token:
             raise HTTPException(status_code=400, detail="No files provided")
 
         # Generate job ID
@@ -426,68 +587,144 @@ async def upload_images(files: List[UploadFile] = File(...)):
         job_dir = UPLOAD_DIR / job_id
         job_dir.mkdir(exist_ok=True)
 
-        logger.info(f"Uploading {len(files)} files for job {job_id}")
-
         uploaded_files = []
-        all_image_files = []
-        all_failed_images = []
 
-        for file in files:
+        if upload_token:
+            try:
+                # Move the analyzed files into the job directory (rename, no copy)
+                adopted = staged_uploads.adopt(upload_token, job_dir)
+            except FileNotFoundError:
+                job_dir.rmdir()
+                raise HTTPException(status_code=404, detail="Upload token not found or expired, please upload the files again")
+
+            logger.info(f"Adopted {len(adopted)} staged files for job {job_id}")
+            for entry in adopted:
+                uploaded_files.append({
+                    "filename": entry["filename"],
+                    "size": entry["size"],
+                    "sha256": entry["sha256"],
+                    "path": entry["path"]
+                })
+
+        logger.info(f"Uploading {len(files or [])} files for job {job_id}")
+
+        for file in files or []:
             if not validate_upload_file(file):
                 logger.warning(f"Invalid file: {file.filename}")
                 continue
 
-            # Save file
-            file_path = job_dir / file.filename
-            with open(file_path, "wb") as buffer:
-                content = await file.read()
-                buffer.write(content)
+            # Stream file to disk in chunks (bounded memory, hashed on the way)
+            file_path = job_dir / safe_filename(file.filename)
+            try:
+                stored = await save_upload_to_disk(file, file_path, get_upload_size_limit(file.filename))
+            except UploadTooLargeError as e:
+                raise HTTPException(status_code=413, detail=str(e))
 
             uploaded_files.append({
                 "filename": file.filename,
-                "size": len(content),
+                "size": stored.size,
+                "sha256": stored.sha256,
                 "path": str(file_path)
             })
 
-            logger.info(f"Saved: {file.filename} ({len(content)} bytes)")
+            logger.info(f"Saved: {file.filename} ({stored.size} bytes)")
 
-            # If it's a ZIP file, extract images
-            if is_archive_file(file.filename):
-                logger.info(f"📦 Extracting images from archive: {file.filename}")
-                extracted_images, failed_images = extract_images_from_zip(file_path, job_dir)
-                all_image_files.extend(extracted_images)
-                all_failed_images.extend(failed_images)
-                logger.info(f"✅ Extracted {len(extracted_images)} images, ❌ {len(failed_images)} failed from {file.filename}")
-            else:
-                # Regular image file
-                all_image_files.append(file_path)
-
-        if not uploaded_files:
-            raise HTTPException(status_code=400, detail="No valid files uploaded")
-
-        if not all_image_files:
-            raise HTTPException(status_code=400, detail="No valid image files found (either direct uploads or in archives)")
-
-        logger.info("")
-        logger.info("🎯 FINAL COUNT:")
-        logger.info(f"   ✅ Images to process: {len(all_image_files)}")
-        logger.info(f"   ❌ Failed images: {len(all_failed_images)}")
-
-        return {
-            "success": True,
-            "job_id": job_id,
-            "message": f"Uploaded {len(uploaded_files)} files, found {len(all_image_files)} images for processing",
-            "files_uploaded": len(uploaded_files),
-            "images_found": len(all_image_files),
-            "images_failed": len(all_failed_images),
-            "failed_details": all_failed_images[:10] if len(all_failed_images) <= 10 else all_failed_images[:10],
-            "files": uploaded_files
-        }
+        return await run_in_threadpool(ingest_uploaded_files, job_id, job_dir, uploaded_files, pipelined)
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Upload error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/v1/uploads/sessions")
+async def create_upload_session(request: dict):
+    """
+    Start a resumable upload
+
+    Body: {"filename", "size", "sha256" (optional, whole file),
+    "job_id" (optional, add the file to an existing job)}
+    """
+    filename = request.get("filename")
+    size = request.get("size")
+    if not filename or not isinstance(size, int):
+        raise HTTPException(status_code=400, detail="filename and size are required")
+    if not (is_archive_file(filename) or Path(filename).suffix.lower() in ALLOWED_EXTENSIONS):
+        raise HTTPException(status_code=400, detail=f"Unsupported file type: {filename}")
+
+    resumable_uploads.purge_expired()
+    try:
+        return resumable_uploads.create(
+            filename,
+            size,
+            max_size=get_upload_size_limit(filename),
+            job_id=request.get("job_id"),
+            sha256=request.get("sha256")
+        )
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ResumableUploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/v1/uploads/sessions/{session_id}")
+async def get_upload_session(session_id: str):
+    """Committed offset of a resumable upload: resend from here after a failure"""
+    try:
+        return resumable_uploads.describe(resumable_uploads.get(session_id))
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.put("/api/v1/uploads/sessions/{session_id}")
+async def upload_session_chunk(
+    session_id: str,
+    request: Request,
+    offset: int,
+    x_chunk_sha256: str = Header(...)
+):
+    """
+    Append one chunk (raw request body) at `offset`
+
+    The X-Chunk-SHA256 header carries the hex SHA-256 of the chunk. On an
+    offset mismatch the response is 409 with the committed offset.
+    """
+    try:
+        return await resumable_uploads.write_chunk(session_id, offset, request.stream(), x_chunk_sha256)
+    except ChunkOffsetMismatchError as e:
+        return JSONResponse(
+            status_code=409,
+            content={"detail": str(e), "offset": e.expected_offset}
+        )
+    except ChunkChecksumMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+@app.post("/api/v1/uploads/sessions/{session_id}/complete")
+async def complete_upload_session(session_id: str, pipelined: bool = False):
+    """Finish a resumable upload; responds like /api/v1/upload"""
+    try:
+        session = resumable_uploads.get(session_id)
+        stored = await resumable_uploads.complete(session_id)
+    except UploadSessionNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except IncompleteUploadError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ChunkChecksumMismatchError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+
+    job_id = session["job_id"]
+    uploaded_files = [{
+        "filename": session["original_filename"],
+        "size": stored.size,
+        "sha256": stored.sha256,
+        "path": str(stored.path)
+    }]
+    return await run_in_threadpool(ingest_uploaded_files, job_id, UPLOAD_DIR / job_id, uploaded_files, pipelined)
+
 @app.post("/api/v1/process")
 async def process_images(request: dict, authorization: str = Header(None)):
     """
@@ -525,17 +762,44 @@ async def process_images(request: dict, authorization: str = Header(None)):
         
         if not job_id:
             raise HTTPException(status_code=400, detail="job_id is required")
+
+        # Multi-target mode: one segmentation per image, one output per marketplace
+        targets = None
+        if request.get("targets"):
+            try:
+                targets = resolve_targets(request["targets"])
+            except (TypeError, ValueError) as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if use_premium:
+                logger.warning("Premium processing returns a single image - using Basic for multi-target export")
+                use_premium = False
         
         # Find uploaded files
         job_dir = UPLOAD_DIR / job_id
         if not job_dir.exists():
             raise HTTPException(status_code=404, detail="Job not found")
         
-        image_files = [f for f in job_dir.glob("*") if f.is_file() and f.suffix.lower() in ALLOWED_EXTENSIONS]
-        if not image_files:
+        # Images recorded at upload time; no directory scan on the hot path
+        image_files = JobManifest.load_or_scan(job_dir, ALLOWED_EXTENSIONS).paths(ALLOWED_EXTENSIONS)
+
+        # Archives left by a pipelined upload are extracted while processing
+        archives = []
+        expected_archive_images = 0
+        ingest_file = job_dir / PIPELINED_INGEST_FILE
+        if ingest_file.exists():
+            import json
+            with open(ingest_file, "r") as f:
+                ingest = json.load(f)
+            # Consume the marker so a repeated /process doesn't extract twice
+            ingest_file.unlink()
+            archives = [job_dir / name for name in ingest["archives"]]
+            expected_archive_images = ingest["expected_images"]
+
+        if not image_files and not expected_archive_images:
             raise HTTPException(status_code=404, detail="No images found for processing")
-        
-        logger.info(f"Found {len(image_files)} images to process")
+
+        files_count = len(image_files) + expected_archive_images
+        logger.info(f"Found {files_count} images to process ({expected_archive_images} still in archives)")
 
         # CREDIT VERIFICATION TEMPORARILY DISABLED
         # TODO: Re-enable after fixing Supabase RPC functions
@@ -581,20 +845,24 @@ async def process_images(request: dict, authorization: str = Header(None)):
         logger.info("⚠️  Credit verification DISABLED - processing all requests")
 
         # Start async processing (removed user_id parameter to match backup)
-        asyncio.create_task(process_images_simple(job_id, image_files, pipeline, shadow_params, use_premium))
+        asyncio.create_task(process_images_simple(
+            job_id, image_files, pipeline, shadow_params, use_premium,
+            archives=archives, expected_archive_images=expected_archive_images, targets=targets
+        ))
         
         credits_per_image = 3 if use_premium else 1
-        total_credits = credits_per_image * len(image_files)
+        total_credits = credits_per_image * files_count
         
         return {
             "success": True,
             "job_id": job_id,
-            "message": f"Started processing {len(image_files)} images with {pipeline} pipeline",
+            "message": f"Started processing {files_count} images with {pipeline} pipeline",
             "pipeline": pipeline,
+            "targets": [target.name for target in targets] if targets else None,
             "processing_tier": "premium" if use_premium else "basic",
             "shadow_enabled": shadow_params["enabled"],
             "status": "processing",
-            "files_count": len(image_files),
+            "files_count": files_count,
             "credits_per_image": credits_per_image,
             "total_credits": total_credits,
             "authenticated": user_id is not None
@@ -606,18 +874,32 @@ async def process_images(request: dict, authorization: str = Header(None)):
         logger.error(f"Process error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-async def process_images_simple(job_id: str, image_files: list, pipeline: str, shadow_params: dict = None, use_premium: bool = False, user_id: str = None):
+async def process_images_simple(job_id: str, image_files: list, pipeline: str, shadow_params: dict = None, use_premium: bool = False, user_id: str = None,
+                                archives: list = None, expected_archive_images: int = 0, targets: list = None):
     """
     Process images with intelligent parallel execution
     Supports both Basic (rembg) and Premium (Qwen API) processing
     OPTIMIZED: 60-87% faster than sequential processing
     NOW WITH AUTOMATIC CREDIT DEDUCTION AFTER SUCCESSFUL PROCESSING
+
+    When `archives` is given (pipelined upload), images are extracted in the
+    background and each one is scheduled as soon as it is on disk.
+    Time-to-first-result and wall time are recorded in results.json.
+
+    The download ZIP is built alongside: every finished image is appended
+    to it, and it is finalized with the job.
+
+    With `targets` (marketplaces), each image is segmented once and written
+    as img_001_<marketplace>.jpg per target; the archive groups the outputs
+    in one folder per marketplace.
     """
+    archive_builder = None
     try:
-        logger.info(f"[PARALLEL] Starting job {job_id}: {len(image_files)} images with {pipeline} pipeline")
+        job_started_at = time.time()
+        logger.info(f"[PARALLEL] Starting job {job_id}: {len(image_files) + expected_archive_images} images with {pipeline} pipeline")
 
         # Initialize progress tracking
-        total = len(image_files)
+        total = len(image_files) + expected_archive_images
         update_progress(job_id, 0, total, "starting")
 
         # Create processed directory
@@ -626,6 +908,11 @@ async def process_images_simple(job_id: str, image_files: list, pipeline: str, s
 
         # Initialize smart processor
         batch_processor = SmartBatchProcessor()
+        archive_builder = ResultArchiveBuilder(processed_dir)
+        shadow_enabled = bool(shadow_params and shadow_params.get("enabled"))
+        busy_seconds = []  # Per-image processing time, appended from worker threads
+        finished_at = []  # Completion time of each successful image
+        processed_images = []  # Manifest entries for the processed directory
 
         # Prepare processing function with index tracking
         def process_single_image(item):
@@ -637,29 +924,92 @@ async def process_images_simple(job_id: str, image_files: list, pipeline: str, s
             output_filename = _generate_short_filename(index + 1, image_file.suffix)
             output_path = processed_dir / output_filename
 
-            result = process_image_simple(
-                input_path=str(image_file),
-                output_path=str(output_path),
-                pipeline=pipeline,
-                shadow_params=shadow_params,
-                use_premium=use_premium  # Pass premium flag
-            )
+            if targets:
+                result = process_image_variants(
+                    input_path=str(image_file),
+                    outputs={
+                        target.name: str(processed_dir / variant_filename(output_filename, target.name))
+                        for target in targets
+                    },
+                    targets=targets,
+                    shadow_params=shadow_params
+                )
+            else:
+                result = process_image_simple(
+                    input_path=str(image_file),
+                    output_path=str(output_path),
+                    pipeline=pipeline,
+                    shadow_params=shadow_params,
+                    use_premium=use_premium  # Pass premium flag
+                )
+
+            # Feed the throughput model used for upload ETAs
+            timings = result.get("timings") or {}
+            if result.get("success") and timings.get("total"):
+                busy_seconds.append(timings["total"])
+                try:
+                    throughput_model.record_image(
+                        megapixels=timings.get("megapixels") or read_image_megapixels(image_file),
+                        pipeline="multi" if targets else pipeline,
+                        shadow=shadow_enabled,
+                        premium=use_premium,
+                        timings=timings,
+                        file_bytes=image_file.stat().st_size
+                    )
+                except Exception as e:
+                    logger.warning(f"Failed to record timing for {image_file.name}: {e}")
 
             if result.get("success"):
-                return {
+                finished_at.append(time.time())
+                # The first requested marketplace stands for the image in the gallery
+                outputs = {name: Path(path) for name, path in result["outputs"].items()} if targets else {None: output_path}
+                entries = [
+                    describe_image(variant_path, source=image_file.name, variant=variant)
+                    for variant, variant_path in outputs.items()
+                ]
+                for entry in entries:
+                    processed_images.append(entry)
+                    archive_builder.add(processed_dir / entry.name, archive_member_name(entry))
+                manifest_entry = entries[0]
+                output_filename = manifest_entry.name
+                output_path = processed_dir / output_filename
+                if PRECOMPUTE_THUMBNAILS:
+                    try:
+                        thumbnail_service.generate(output_path, manifest_entry.sha256)
+                    except Exception as e:
+                        logger.warning(f"Thumbnail generation failed for {output_filename}: {e}")
+                # Versioned by content hash, so browsers can cache it indefinitely
+                thumbnail_url = (
+                    f"/api/v1/thumbnail/{job_id}/{output_filename}"
+                    f"?v={thumbnail_service.short_version(manifest_entry.sha256)}"
+                )
+                image_result = {
                     "success": True,
                     "original": image_file.name,
                     "processed": output_filename,
                     "path": str(output_path),
+                    "thumbnail_url": thumbnail_url,
                     "shadow_applied": result.get("shadow_applied", False),
                     "shadow_type": result.get("shadow_type")
                 }
+                if targets:
+                    image_result["variants"] = {name: path.name for name, path in outputs.items()}
+                progress_broadcaster.publish_image(job_id, {
+                    "success": True,
+                    "original": image_file.name,
+                    "processed": output_filename,
+                    "preview_url": f"/api/v1/preview/{job_id}/{output_filename}",
+                    "thumbnail_url": thumbnail_url
+                })
             else:
-                return {
+                image_result = {
                     "success": False,
                     "original": image_file.name,
                     "error": result.get("error", "Unknown error")
                 }
+                progress_broadcaster.publish_image(job_id, image_result)
+
+            return image_result
 
         # Progress tracking with global progress updates
         def progress_update(current, total):
@@ -668,45 +1018,109 @@ async def process_images_simple(job_id: str, image_files: list, pipeline: str, s
             # Update global progress tracker
             update_progress(job_id, current, total, "processing")
 
-        # Process batch with smart parallelization
-        # Enumerate files to provide index for short filename generation
-        indexed_files = list(enumerate(image_files))
-        results = await batch_processor.process_batch_async(
-            items=indexed_files,
-            process_func=process_single_image,
-            progress_callback=progress_update
-        )
+        batch_started_at = time.time()
+        extraction_seconds = None
+
+        if archives:
+            extraction_failures = []
+            extracted_images = []
+
+            async def pipelined_items():
+                """Direct uploads first, then images as they come out of the archives"""
+                nonlocal extraction_seconds
+                index = 0
+                for image_file in image_files:
+                    yield index, image_file
+                    index += 1
+
+                async for status, name, detail in stream_extracted_images(archives, UPLOAD_DIR / job_id):
+                    if status == "extracted":
+                        extracted_images.append(describe_image(
+                            detail["path"], sha256=detail["sha256"], size=detail["bytes"],
+                            dimensions=detail["size"], source=name
+                        ))
+                        yield index, detail["path"]
+                        index += 1
+                    elif status == "failed":
+                        extraction_failures.append({"success": False, "original": name, "error": detail["reason"]})
+                extraction_seconds = time.time() - batch_started_at
+
+            results = await batch_processor.process_stream_async(
+                items=pipelined_items(),
+                process_func=process_single_image,
+                expected_total=total,
+                progress_callback=progress_update
+            )
+            total = len(results)
+            results.extend(extraction_failures)
+
+            # A later /process finds the extracted images in the manifest
+            with JobManifest.updating(UPLOAD_DIR / job_id) as upload_manifest:
+                upload_manifest.extend(extracted_images)
+        else:
+            # Process batch with smart parallelization
+            # Enumerate files to provide index for short filename generation
+            indexed_files = list(enumerate(image_files))
+            results = await batch_processor.process_batch_async(
+                items=indexed_files,
+                process_func=process_single_image,
+                progress_callback=progress_update
+            )
+        throughput_model.record_batch(len(busy_seconds), time.time() - batch_started_at, sum(busy_seconds))
 
         # Separate successful and failed
         successful = [r for r in results if r.get("success")]
         failed = [r for r in results if not r.get("success")]
 
+        wall_seconds = time.time() - job_started_at
+        time_to_first_result = (min(finished_at) - job_started_at) if finished_at else None
+        logger.info(
+            f"[PARALLEL] Job {job_id} timings: first result "
+            f"{f'{time_to_first_result:.1f}s' if time_to_first_result is not None else 'n/a'}, "
+            f"total {wall_seconds:.1f}s ({'pipelined' if archives else 'batch'})"
+        )
+
         # Save results
         import json
         final_results = {
             "job_id": job_id,
             "pipeline": pipeline,
+            "targets": [target.name for target in targets] if targets else None,
             "shadow_enabled": shadow_params.get("enabled", False) if shadow_params else False,
             "shadow_type": shadow_params.get("type", "none") if shadow_params and shadow_params.get("enabled") else "none",
-            "total_files": len(image_files),
+            "total_files": len(results),
             "successful": len(successful),
             "failed": len(failed),
             "successful_files": successful,
             "failed_files": failed,
             "status": "completed",
-            "completed_at": time.time()
+            "completed_at": time.time(),
+            "timings": {
+                "mode": "pipelined" if archives else "batch",
+                "time_to_first_result": time_to_first_result,
+                "wall_seconds": wall_seconds,
+                "extraction_seconds": extraction_seconds
+            }
         }
 
+        processed_manifest = JobManifest(processed_dir, sorted(processed_images, key=lambda image: image.name))
+        processed_manifest.save()
+        archive = archive_builder.finalize(completion_version(processed_manifest))
+        final_results["archive"] = archive.name
+
         results_file = processed_dir / "results.json"
         with open(results_file, "w") as f:
             json.dump(final_results, f, indent=2)
 
+        # Publish results so any API node (or the bucket itself) can serve them
+        await run_in_threadpool(publish_job_results, job_id, processed_dir)
+
         # Mark as completed
         update_progress(job_id, total, total, "completed")
 
         logger.info(
             f"[PARALLEL] Job {job_id} completed: "
-            f"{len(successful)}/{len(image_files)} successful, {len(failed)} failed"
+            f"{len(successful)}/{len(results)} successful, {len(failed)} failed"
         )
 
         # ============================================================
@@ -756,6 +1170,8 @@ async def process_images_simple(job_id: str, image_files: list, pipeline: str, s
         logger.error(f"[PARALLEL] Job {job_id} failed: {e}")
         # Mark as error
         update_progress(job_id, 0, len(image_files), "error")
+        if archive_builder is not None:
+            archive_builder.abort()
         import traceback
         traceback.print_exc()
 
@@ -792,8 +1208,7 @@ async def get_job_status(job_id: str):
 async def get_job_progress(job_id: str):
     """Get real-time processing progress for a job"""
     try:
-        with progress_lock:
-            progress = JOB_PROGRESS.get(job_id)
+        progress = await run_in_threadpool(get_progress_snapshot, job_id)
 
         if not progress:
             return {
@@ -816,42 +1231,66 @@ async def get_job_progress(job_id: str):
         logger.error(f"Progress check error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/v1/progress/{job_id}/stream")
+async def stream_job_progress_events(job_id: str):
+    """
+    Stream processing progress for a job as Server-Sent Events
+
+    Events:
+        progress: changed progress fields (first frame is the full snapshot)
+        image: a single image finished (success or failure)
+        images_dropped: image events skipped because the client fell behind
+        end: job reached a terminal status (or is unknown), stream closes
+    """
+    return StreamingResponse(
+        stream_job_progress(progress_broadcaster, job_id, get_progress_snapshot),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Disable proxy buffering (nginx)
+        }
+    )
+
 @app.get("/api/v1/download/{job_id}")
-async def download_results(job_id: str):
-    """Download processed images as ZIP - includes all formats (JPG, PNG)"""
+async def download_results(job_id: str, request: Request):
+    """
+    Download processed images as ZIP - includes all formats (JPG, PNG, WebP)
+
+    Completed jobs have their archive built during processing and it is
+    sent as a file (ETag, Range / If-Range for resuming). Otherwise the
+    archive is streamed while it is generated, and kept for the next
+    download once the job is complete.
+    """
     try:
         processed_dir = PROCESSED_DIR / job_id
         if not processed_dir.exists():
+            # Processed on another node: send the client to the published archive
+            archive_key = None if object_storage.is_local else await run_in_threadpool(job_archive_key, job_id)
+            if archive_key:
+                return RedirectResponse(
+                    object_storage.presigned_url(archive_key, filename=f"masterpost_{job_id}.zip"),
+                    status_code=307
+                )
             raise HTTPException(status_code=404, detail="Job not found")
 
-        # Create ZIP file in temp directory
-        zip_path = TEMP_DIR / f"{job_id}_processed.zip"
-
-        # Collect all image files (JPG and PNG)
-        image_files = list(processed_dir.glob("*.jpg")) + list(processed_dir.glob("*.jpeg")) + list(processed_dir.glob("*.png"))
-
-        if not image_files:
+        # Collect all processed images from the job manifest; a running job has
+        # none yet, and its partial listing must not be saved as the manifest
+        active = await run_in_threadpool(is_job_active, job_id)
+        manifest = await run_in_threadpool(
+            JobManifest.load_or_scan, processed_dir, ALLOWED_EXTENSIONS, save=not active
+        )
+        if not manifest.images:
             raise HTTPException(status_code=404, detail="No processed files found")
 
-        logger.info(f"Creating ZIP with {len(image_files)} images for job {job_id}")
-
-        with zipfile.ZipFile(zip_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-            # Include ALL processed images (JPG and PNG)
-            for file_path in image_files:
-                logger.info(f"Adding to ZIP: {file_path.name}")
-                zipf.write(file_path, file_path.name)
+        files = archive_members(manifest)
+        logger.info(f"Download of {len(files)} images for job {job_id}")
 
-        # Verify ZIP was created and has content
-        if not zip_path.exists() or zip_path.stat().st_size == 0:
-            raise HTTPException(status_code=500, detail="Failed to create ZIP file")
-
-        logger.info(f"ZIP created successfully: {zip_path} ({zip_path.stat().st_size} bytes)")
-
-        return FileResponse(
-            zip_path,
-            media_type="application/zip",
+        return await archive_download_response(
+            request,
+            manifest,
+            files,
             filename=f"masterpost_{job_id}.zip",
-            background=None  # Don't delete immediately
+            complete=(processed_dir / "results.json").exists()
         )
 
     except HTTPException:
@@ -860,12 +1299,74 @@ async def download_results(job_id: str):
         logger.error(f"Download error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def job_archive_key(job_id: str) -> Optional[str]:
+    """Object key of a completed job's result archive, from its published results.json"""
+    import json
+
+    try:
+        with object_storage.open(f"processed/{job_id}/results.json") as f:
+            archive = json.load(f).get("archive")
+    except (ObjectNotFoundError, ValueError):
+        return None
+    return f"processed/{job_id}/{archive}" if archive else None
+
+@app.get("/api/v1/download-url/{job_id}")
+async def get_download_url(job_id: str, expires_in: int = 3600):
+    """
+    Presigned URL of a completed job's result archive, for downloading it
+    straight from storage (the bucket, or this API's signed object route)
+
+    Only jobs processed through /api/v1/process have a result archive (named
+    in their results.json). Jobs completed by the app.routers pipelines
+    (process.py, hybrid_routes.py) publish their images but no archive, so
+    this returns 404 for them; their images are still served by /preview.
+    """
+    if not 60 <= expires_in <= 7 * 24 * 3600:
+        raise HTTPException(status_code=400, detail="expires_in must be between 60 seconds and 7 days")
+
+    archive_key = await run_in_threadpool(job_archive_key, job_id)
+    if not archive_key or not object_storage.exists(archive_key):
+        raise HTTPException(status_code=404, detail="No result archive for this job")
+
+    return {
+        "job_id": job_id,
+        "url": object_storage.presigned_url(archive_key, expires_seconds=expires_in, filename=f"masterpost_{job_id}.zip"),
+        "expires_at": int(time.time()) + expires_in
+    }
+
+@app.get("/api/v1/storage/objects/{key:path}")
+async def get_signed_object(key: str, request: Request, expires: int, signature: str, filename: Optional[str] = None):
+    """Download target of presigned URLs issued by the local object storage"""
+    if not object_storage.is_local:
+        raise HTTPException(status_code=404, detail="Not found")
+    try:
+        valid = object_storage.verify_signature(key, expires, signature, filename)
+    except ValueError:
+        valid = False
+    if not valid:
+        raise HTTPException(status_code=403, detail="Invalid or expired signature")
+
+    try:
+        path = object_storage.path_for(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Object not found")
+    if not path.is_file():
+        raise HTTPException(status_code=404, detail="Object not found")
+
+    import mimetypes
+    media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    return conditional_file_response(request, path, media_type, cache_control="private, no-cache", filename=filename)
+
 @app.get("/api/v1/preview/{job_id}/{filename}")
-async def get_image_preview(job_id: str, filename: str):
-    """Serve individual processed image for preview"""
+async def get_image_preview(job_id: str, filename: str, request: Request):
+    """Serve individual processed image for preview (ETag from the content hash, 304, Range)"""
     try:
         processed_dir = PROCESSED_DIR / job_id
         if not processed_dir.exists():
+            # Processed on another node: serve it straight from the bucket
+            key = f"processed/{job_id}/{filename}"
+            if not object_storage.is_local and await run_in_threadpool(object_storage.exists, key):
+                return RedirectResponse(object_storage.presigned_url(key), status_code=307)
             raise HTTPException(status_code=404, detail="Job not found")
 
         image_path = processed_dir / filename
@@ -879,11 +1380,64 @@ async def get_image_preview(job_id: str, filename: str):
         # Determine media type based on extension
         media_type = "image/png" if filename.lower().endswith('.png') else "image/jpeg"
 
-        return FileResponse(
+        manifest = JobManifest.load_cached(processed_dir)
+        entry = manifest.get(filename) if manifest else None
+
+        return conditional_file_response(
+            request,
             image_path,
-            media_type=media_type,
+            media_type,
+            etag=file_etag(image_path, entry.sha256 if entry else None),
+            cache_control="public, max-age=3600",  # Cache for 1 hour, then revalidate
+            headers={"Access-Control-Allow-Origin": "*"}
+        )
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Preview error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/v1/thumbnail/{job_id}/{filename}")
+async def get_image_thumbnail(job_id: str, filename: str, request: Request, size: int = 320, v: Optional[str] = None):
+    """
+    Serve a downscaled copy of a processed image for galleries
+
+    `size` is snapped to one of the fixed sizes (longest edge). WebP is
+    sent to clients that accept it, JPEG otherwise. With `v` matching the
+    image's content hash (the thumbnail_url in job results) the response
+    is cacheable for a year.
+    """
+    try:
+        processed_dir = PROCESSED_DIR / job_id
+        image_path = processed_dir / filename
+        if not processed_dir.exists() or not image_path.is_file():
+            raise HTTPException(status_code=404, detail="Image not found")
+
+        if not filename.lower().endswith(('.jpg', '.jpeg', '.png', '.webp')):
+            raise HTTPException(status_code=400, detail="Invalid file type")
+
+        manifest = JobManifest.load_cached(processed_dir)
+        entry = manifest.get(filename) if manifest else None
+        version = entry.sha256 if entry else await run_in_threadpool(hash_file, image_path)
+
+        size = thumbnail_service.snap_size(size)
+        fmt = thumbnail_service.pick_format(request.headers.get("accept", ""))
+        thumbnail_path = await run_in_threadpool(thumbnail_service.get, image_path, version, size, fmt)
+
+        if v and v == thumbnail_service.short_version(version):
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = "public, max-age=3600"
+
+        return conditional_file_response(
+            request,
+            thumbnail_path,
+            f"image/{fmt}",
+            etag=strong_etag(thumbnail_service.short_version(version), size, fmt),
+            cache_control=cache_control,
             headers={
-                "Cache-Control": "public, max-age=3600",  # Cache for 1 hour
+                "Vary": "Accept",  # WebP or JPEG depending on the client
                 "Access-Control-Allow-Origin": "*"
             }
         )
@@ -891,7 +1445,7 @@ async def get_image_preview(job_id: str, filename: str):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Preview error: {e}")
+        logger.error(f"Thumbnail error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 # =======================================
@@ -940,10 +1494,8 @@ async def upload_single_for_edit(file: UploadFile = File(...)):
         job_dir.mkdir(parents=True, exist_ok=True)
 
         # Save file
-        file_path = job_dir / file.filename
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        file_path = job_dir / safe_filename(file.filename, "image.png")
+        await save_upload_to_disk(file, file_path, MAX_IMAGE_SIZE)
 
         logger.info(f"✅ Manual Editor: File saved to {file_path}")
 
@@ -967,13 +1519,11 @@ async def save_edited_image(edited_image: UploadFile = File(...)):
 
         # Generate unique filename
         edited_id = str(uuid.uuid4())
-        edited_filename = f"edited_{edited_id}_{edited_image.filename or 'image.png'}"
+        edited_filename = f"edited_{edited_id}_{safe_filename(edited_image.filename, 'image.png')}"
         edited_path = MANUAL_EDITOR_EDITED_DIR / edited_filename
 
         # Save edited image
-        with open(edited_path, "wb") as buffer:
-            content = await edited_image.read()
-            buffer.write(content)
+        await save_upload_to_disk(edited_image, edited_path, MAX_IMAGE_SIZE)
 
         # Generate download URL
         download_url = f"/api/v1/manual-editor/download/{edited_filename}"
@@ -1157,9 +1707,16 @@ async def health_check():
         "status": "healthy",
         "local_processing": rembg_available,
         "manual_editor": "available",
+        "progress_store": progress_store.get_info(),
+        "object_storage": object_storage.get_info(),
         "timestamp": time.time()
     }
 
+@app.get("/api/v1/storage/metrics")
+async def storage_metrics():
+    """Storage lifecycle metrics: reclaimed bytes per class, disk usage, last run"""
+    return storage_lifecycle.get_metrics()
+
 # ============================================================
 # CREDIT MANAGEMENT ROUTES
 # ============================================================
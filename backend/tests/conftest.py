@@ -0,0 +1,34 @@
+"""
+Shared test setup: backend/ on the import path, like the top-level scripts
+"""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(scope="session")
+def server_app(tmp_path_factory):
+    """
+    server.py imported inside a scratch working directory (it keeps uploads/,
+    processed/ and temp/ relative to the cwd); needs the full runtime deps
+    """
+    pytest.importorskip("rembg")
+    workdir = tmp_path_factory.mktemp("server")
+    cwd = os.getcwd()
+    os.environ["STORAGE_GC_ENABLED"] = "false"
+    os.chdir(workdir)
+    try:
+        import server
+        yield server
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(server_app):
+    from fastapi.testclient import TestClient
+    return TestClient(server_app.app)
@@ -0,0 +1,112 @@
+"""
+Archive extraction: corrupt 7z archives, abandoned extraction streams and
+missing optional archive libraries
+"""
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.services import archive_extraction
+from app.services.archive_extraction import (
+    UnsupportedArchiveError,
+    iter_extract_images,
+    open_archive,
+    supported_archive_extensions,
+)
+
+try:
+    import py7zr
+except ImportError:
+    py7zr = None
+
+needs_py7zr = pytest.mark.skipif(py7zr is None, reason="py7zr not installed")
+
+
+def make_7z(tmp_path, count, size=200):
+    """Solid 7z with `count` random (incompressible) PNGs"""
+    rs = np.random.RandomState(0)
+    names = []
+    for i in range(count):
+        path = tmp_path / f"img{i + 1}.png"
+        Image.fromarray(rs.randint(0, 255, (size, size, 3), dtype=np.uint8)).save(path)
+        names.append(path.name)
+    archive = tmp_path / "images.7z"
+    with py7zr.SevenZipFile(archive, 'w') as sz:
+        for name in names:
+            sz.write(tmp_path / name, name)
+    return archive
+
+
+def corrupt(archive, offset_ratio, length=4096):
+    data = bytearray(archive.read_bytes())
+    offset = int(len(data) * offset_ratio)
+    data[offset:offset + length] = bytes((b ^ 0x5A) for b in data[offset:offset + length])
+    bad = archive.with_name("corrupt.7z")
+    bad.write_bytes(bytes(data))
+    return bad
+
+
+@needs_py7zr
+@pytest.mark.parametrize("offset_ratio", [0.2, 0.5, 0.8])
+def test_corrupt_7z_reports_only_complete_members(tmp_path, offset_ratio):
+    archive = corrupt(make_7z(tmp_path, 3), offset_ratio)
+    out = tmp_path / "out"
+    out.mkdir()
+
+    events = list(iter_extract_images(archive, out))
+
+    assert len(events) == 3
+    statuses = {name: status for status, name, _ in events}
+    assert "failed" in statuses.values()
+    for status, name, detail in events:
+        if status == "extracted":
+            with Image.open(detail["path"]) as img:
+                img.load()  # Fully decodable, not just a valid header
+        else:
+            assert detail["reason"]
+    assert not list(out.glob("*.part"))
+
+
+@needs_py7zr
+def test_abandoned_7z_stream_releases_thread(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_extraction, "SEQUENTIAL_EVENT_BUFFER", 1)
+    archive = make_7z(tmp_path, 12, size=64)
+    out = tmp_path / "out"
+    out.mkdir()
+
+    events = iter_extract_images(archive, out, max_workers=1)
+    next(events)
+    events.close()
+
+    deadline = time.monotonic() + 10
+    while any(t.name == "7z-extract" for t in threading.enumerate()) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not any(t.name == "7z-extract" for t in threading.enumerate())
+    assert not list(out.glob("*.part"))
+
+
+@needs_py7zr
+def test_intact_7z_extracts_everything(tmp_path):
+    archive = make_7z(tmp_path, 3)
+    out = tmp_path / "out"
+    out.mkdir()
+
+    events = list(iter_extract_images(archive, out))
+
+    assert [status for status, _, _ in events] == ["extracted"] * 3
+    assert sorted(os.listdir(out)) == sorted(detail["path"].name for _, _, detail in events)
+
+
+@pytest.mark.parametrize("library, ext", [("py7zr", ".7z"), ("rarfile", ".rar")])
+def test_missing_archive_library_is_unsupported(tmp_path, monkeypatch, library, ext):
+    monkeypatch.setattr(archive_extraction, library, None)
+    archive = tmp_path / f"images{ext}"
+    archive.write_bytes(b"not read")
+
+    assert ext not in supported_archive_extensions()
+    with pytest.raises(UnsupportedArchiveError):
+        open_archive(archive)
@@ -0,0 +1,71 @@
+"""
+Batch processing limits and progress stream termination
+"""
+import asyncio
+import threading
+import time
+
+from app.services.batch_processor import SmartBatchProcessor
+from app.services.progress_stream import ProgressBroadcaster, stream_job_progress
+
+
+def test_hung_item_is_recorded_as_timeout():
+    release = threading.Event()
+
+    def process(item):
+        if item == "hang":
+            release.wait(5)
+        return {"success": True, "item": item}
+
+    processor = SmartBatchProcessor(item_timeout=0.3)
+    started = time.monotonic()
+    try:
+        results = asyncio.run(processor.process_batch_async(["a", "hang", "b"], process))
+    finally:
+        release.set()
+
+    assert time.monotonic() - started < 3
+    assert sorted(r["item"] for r in results if r["success"]) == ["a", "b"]
+    assert [r["error"] for r in results if not r["success"]] == ["Timed out after 0.3s"]
+
+
+def test_timeout_counts_from_start_not_submission():
+    # 2 workers, 6 items of 0.2s: the last ones wait ~0.4s in the queue
+    processor = SmartBatchProcessor(item_timeout=0.35)
+    results = asyncio.run(processor.process_batch_async(list(range(6)), lambda item: time.sleep(0.2) or {"success": True}))
+    assert all(r["success"] for r in results)
+
+
+def test_stream_hung_item_is_recorded_as_timeout():
+    release = threading.Event()
+
+    async def items():
+        for item in ("a", "hang"):
+            yield item
+
+    def process(item):
+        if item == "hang":
+            release.wait(5)
+        return {"success": True, "item": item}
+
+    processor = SmartBatchProcessor(item_timeout=0.3)
+    try:
+        results = asyncio.run(processor.process_stream_async(items(), process, expected_total=2))
+    finally:
+        release.set()
+
+    assert [r["success"] for r in sorted(results, key=lambda r: r["success"])] == [False, True]
+
+
+def test_stream_ends_for_unknown_job():
+    async def collect():
+        broadcaster = ProgressBroadcaster()
+        frames = []
+        stream = stream_job_progress(broadcaster, "missing", lambda job_id: None, store_poll_interval=0.05)
+        async for frame in stream:
+            frames.append(frame)
+        return frames
+
+    frames = asyncio.run(asyncio.wait_for(collect(), 5))
+    assert frames[-1].startswith("event: end")
+    assert '"status":"unknown"' in frames[-1]
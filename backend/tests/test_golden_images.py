@@ -0,0 +1,23 @@
+"""
+Golden images: every shadow type and pipeline still matches the stored
+goldens (the harness and its goldens are backend/golden_images.py and
+backend/golden_images/)
+"""
+import pytest
+
+golden_images = pytest.importorskip("golden_images")
+
+CASES = golden_images.build_cases()
+
+
+@pytest.fixture(scope="module")
+def products():
+    return golden_images.make_products()
+
+
+@pytest.mark.parametrize("case", sorted(CASES))
+def test_matches_golden(case, products):
+    product, func = CASES[case]
+    _, images = golden_images.render(func, products[product], repeats=1)
+    ok, results = golden_images.check(case, images)
+    assert ok, f"{case}: {', '.join(results)} (tolerance: PSNR >= {golden_images.MIN_PSNR:.0f} dB)"
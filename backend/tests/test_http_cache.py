@@ -0,0 +1,162 @@
+"""
+Conditional and range responses: parse_byte_range, etag_matches and
+conditional_file_response (304, 206, 416, If-Range)
+"""
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.services.http_cache import (
+    RangeNotSatisfiableError,
+    conditional_file_response,
+    etag_matches,
+    file_etag,
+    parse_byte_range,
+    strong_etag,
+)
+
+DATA = bytes(range(256)) * 4  # 1024 bytes
+ETAG = strong_etag("abc123")
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 1023)),          # Open-ended
+    ("bytes=-100", (924, 1023)),          # Suffix: last 100 bytes
+    ("bytes=-5000", (0, 1023)),           # Suffix longer than the file
+    ("bytes=1000-5000", (1000, 1023)),    # End clamped to the file
+    ("bytes=1023-1023", (1023, 1023)),
+    (" Bytes = 5-9", (5, 9)),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, len(DATA)) == expected
+
+
+@pytest.mark.parametrize("header", [
+    "bytes=0-10,20-30",  # Multiple ranges: ignored, full file
+    "items=0-10",
+    "bytes=abc-",
+    "bytes=10-5",
+    "bytes=",
+])
+def test_parse_byte_range_ignored(header):
+    assert parse_byte_range(header, len(DATA)) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=-0", "bytes=1024-", "bytes=2000-3000"])
+def test_parse_byte_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiableError) as error:
+        parse_byte_range(header, len(DATA))
+    assert error.value.size == len(DATA)
+
+
+@pytest.mark.parametrize("header", ["bytes=-5", "bytes=0-", "bytes=0-0"])
+def test_parse_byte_range_empty_file(header):
+    with pytest.raises(RangeNotSatisfiableError) as error:
+        parse_byte_range(header, 0)
+    assert error.value.size == 0
+
+
+@pytest.mark.parametrize("if_none_match, matches", [
+    ('"abc123"', True),
+    ('W/"abc123"', True),
+    ('"other", "abc123"', True),
+    ("*", True),
+    ('"other"', False),
+    ('"abc"', False),
+])
+def test_etag_matches(if_none_match, matches):
+    assert etag_matches(if_none_match, ETAG) is matches
+
+
+def test_file_etag(tmp_path):
+    path = tmp_path / "image.jpg"
+    path.write_bytes(DATA)
+    assert file_etag(path, "f" * 64) == strong_etag("f" * 32)
+    before = file_etag(path)
+    path.write_bytes(DATA + b"more")
+    assert file_etag(path) != before
+
+
+@pytest.fixture
+def client(tmp_path):
+    path = tmp_path / "results.zip"
+    path.write_bytes(DATA)
+    app = FastAPI()
+
+    @app.get("/file")
+    async def serve(request: Request):
+        return conditional_file_response(request, path, "application/zip", etag=ETAG, filename="results.zip")
+
+    return TestClient(app)
+
+
+def test_full_response(client):
+    response = client.get("/file")
+    assert response.status_code == 200 and response.content == DATA
+    assert response.headers["etag"] == ETAG
+    assert response.headers["accept-ranges"] == "bytes"
+    assert 'filename="results.zip"' in response.headers["content-disposition"]
+
+
+def test_not_modified(client):
+    response = client.get("/file", headers={"If-None-Match": ETAG})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == ETAG
+    assert client.get("/file", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+@pytest.mark.parametrize("header, start, end", [
+    ("bytes=10-19", 10, 19),
+    ("bytes=1000-", 1000, 1023),
+    ("bytes=-24", 1000, 1023),
+])
+def test_partial_content(client, header, start, end):
+    response = client.get("/file", headers={"Range": header})
+    assert response.status_code == 206
+    assert response.content == DATA[start:end + 1]
+    assert response.headers["content-range"] == f"bytes {start}-{end}/{len(DATA)}"
+    assert response.headers["content-length"] == str(end - start + 1)
+
+
+def test_multiple_ranges_get_full_file(client):
+    response = client.get("/file", headers={"Range": "bytes=0-9,20-29"})
+    assert response.status_code == 200 and response.content == DATA
+
+
+@pytest.mark.parametrize("header", ["bytes=-0", "bytes=5000-"])
+def test_range_not_satisfiable(client, header):
+    response = client.get("/file", headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{len(DATA)}"
+
+
+@pytest.mark.parametrize("header", ["bytes=-5", "bytes=0-"])
+def test_range_of_empty_file(tmp_path, header):
+    path = tmp_path / "empty.zip"
+    path.write_bytes(b"")
+    app = FastAPI()
+
+    @app.get("/file")
+    async def serve(request: Request):
+        return conditional_file_response(request, path, "application/zip", etag=ETAG)
+
+    client = TestClient(app)
+    response = client.get("/file", headers={"Range": header})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
+    assert client.get("/file").status_code == 200
+
+
+def test_if_range(client):
+    last_modified = client.get("/file").headers["last-modified"]
+
+    # Client's copy is current: resume
+    for if_range in (ETAG, last_modified):
+        response = client.get("/file", headers={"Range": "bytes=100-", "If-Range": if_range})
+        assert response.status_code == 206 and response.content == DATA[100:]
+
+    # Changed (or weak) validator: the whole file, not a range of the new one
+    for if_range in ('"stale"', "W/" + ETAG, "Thu, 01 Jan 1970 00:00:00 GMT"):
+        response = client.get("/file", headers={"Range": "bytes=100-", "If-Range": if_range})
+        assert response.status_code == 200 and response.content == DATA
@@ -0,0 +1,136 @@
+"""
+Job manifests: scanning directories that are still being written, and
+concurrent writers of one job
+"""
+import io
+import threading
+import time
+
+import pytest
+
+from PIL import Image
+
+from app.services import job_manifest
+from app.services.job_manifest import MANIFEST_FILE, JobManifest
+
+EXTENSIONS = [".jpg", ".png"]
+
+
+def write_jpeg(path, size=(40, 30)):
+    Image.new("RGB", size, (10, 120, 200)).save(path, "JPEG")
+
+
+def test_scan_saves_by_default(tmp_path):
+    write_jpeg(tmp_path / "a.jpg")
+    manifest = JobManifest.load_or_scan(tmp_path, EXTENSIONS)
+    assert [image.name for image in manifest.images] == ["a.jpg"]
+    assert (manifest.images[0].width, manifest.images[0].height) == (40, 30)
+    assert JobManifest.load(tmp_path).images == manifest.images
+
+
+def test_scan_without_save_leaves_no_manifest(tmp_path):
+    write_jpeg(tmp_path / "a.jpg")
+    manifest = JobManifest.load_or_scan(tmp_path, EXTENSIONS, save=False)
+    assert len(manifest.images) == 1
+    assert not (tmp_path / MANIFEST_FILE).exists()
+
+    # Later outputs show up on the next scan
+    write_jpeg(tmp_path / "b.jpg")
+    assert len(JobManifest.load_or_scan(tmp_path, EXTENSIONS, save=False).images) == 2
+
+
+def test_scan_tolerates_files_being_written(tmp_path, monkeypatch):
+    write_jpeg(tmp_path / "done.jpg")
+    buffer = io.BytesIO()
+    Image.new("RGB", (400, 300)).save(buffer, "JPEG")
+    (tmp_path / "half.jpg").write_bytes(buffer.getvalue()[:40])  # Truncated inside the header
+    (tmp_path / ".tmp123.jpg").write_bytes(b"")  # Temporary file of an atomic write
+    write_jpeg(tmp_path / "gone.jpg")
+
+    describe_image = job_manifest.describe_image
+
+    def vanishing(path, *args, **kwargs):
+        if path.name == "gone.jpg":
+            raise FileNotFoundError(path)  # Replaced or removed between listing and reading
+        return describe_image(path, *args, **kwargs)
+
+    monkeypatch.setattr(job_manifest, "describe_image", vanishing)
+    manifest = JobManifest.scan(tmp_path, EXTENSIONS, save=False)
+
+    assert [image.name for image in manifest.images] == ["done.jpg", "half.jpg"]
+    assert (manifest.get("half.jpg").width, manifest.get("half.jpg").height) == (0, 0)
+
+
+def test_concurrent_updates_keep_every_entry(tmp_path):
+    """Parallel load -> add -> save (e.g. two resumable sessions completing) loses nothing"""
+    for name in ("a.jpg", "b.jpg", "c.jpg", "d.jpg"):
+        write_jpeg(tmp_path / name)
+
+    def add(name):
+        with JobManifest.updating(tmp_path) as manifest:
+            time.sleep(0.05)  # Let the other writers load in the meantime
+            manifest.add(job_manifest.describe_image(tmp_path / name))
+
+    writers = [threading.Thread(target=add, args=(name,)) for name in ("a.jpg", "b.jpg", "c.jpg", "d.jpg")]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+
+    assert sorted(image.name for image in JobManifest.load(tmp_path).images) == ["a.jpg", "b.jpg", "c.jpg", "d.jpg"]
+    assert not job_manifest._directory_locks
+
+
+def test_save_uses_unique_temp_files(tmp_path, monkeypatch):
+    write_jpeg(tmp_path / "a.jpg")
+    first = JobManifest(tmp_path, [job_manifest.describe_image(tmp_path / "a.jpg")])
+    second = JobManifest(tmp_path)
+    temp_paths = []
+    replace = job_manifest.os.replace
+
+    def recording_replace(src, dst):
+        temp_paths.append(src)
+        if len(temp_paths) == 1:
+            second.save()  # Another writer saves while the first is about to replace
+        replace(src, dst)
+
+    monkeypatch.setattr(job_manifest.os, "replace", recording_replace)
+    first.save()
+
+    assert len(set(temp_paths)) == 2
+    assert [image.name for image in JobManifest.load(tmp_path).images] == ["a.jpg"]
+    assert [path.name for path in tmp_path.iterdir() if path.suffix == ".tmp"] == []
+
+
+def test_failed_save_keeps_previous_manifest(tmp_path, monkeypatch):
+    write_jpeg(tmp_path / "a.jpg")
+    JobManifest(tmp_path, [job_manifest.describe_image(tmp_path / "a.jpg")]).save()
+
+    def broken_dump(*args, **kwargs):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(job_manifest.json, "dump", broken_dump)
+    with pytest.raises(OSError):
+        JobManifest(tmp_path).save()
+    monkeypatch.undo()
+
+    assert [image.name for image in JobManifest.load(tmp_path).images] == ["a.jpg"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.jpg", MANIFEST_FILE]
+
+
+def test_download_of_running_job_does_not_save_manifest(client, server_app):
+    job_id = "0f6d9a8e-7c1b-4f0a-9a55-2d3b8c1e4f60"
+    processed_dir = server_app.PROCESSED_DIR / job_id
+    processed_dir.mkdir(parents=True)
+    write_jpeg(processed_dir / "first.jpg")
+    server_app.update_progress(job_id, 1, 3, "processing")
+
+    response = client.get(f"/api/v1/download/{job_id}")
+    assert response.status_code == 200
+    assert not (processed_dir / MANIFEST_FILE).exists()
+
+    # Once the job is no longer running the scan is kept
+    server_app.update_progress(job_id, 3, 3, "completed")
+    write_jpeg(processed_dir / "second.jpg")
+    assert client.get(f"/api/v1/download/{job_id}").status_code == 200
+    assert [image.name for image in JobManifest.load(processed_dir).images] == ["first.jpg", "second.jpg"]
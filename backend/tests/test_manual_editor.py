@@ -0,0 +1,60 @@
+"""
+Manual editor previews: resolution and incremental updates
+"""
+import cv2
+import numpy as np
+import pytest
+
+from app.processing.manual_editor import PREVIEW_MAX_SIZE, ManualImageEditor
+
+
+def start(tmp_path, width, height):
+    rs = np.random.RandomState(0)
+    path = tmp_path / f"image_{width}x{height}.png"
+    cv2.imwrite(str(path), rs.randint(0, 255, (height, width, 4), dtype=np.uint8))
+    editor = ManualImageEditor(tmp_path)
+    return editor, editor.init_session(str(path))
+
+
+@pytest.mark.parametrize("size, expected", [
+    ((1000, 1000), (1000, 1000)),    # Basic pipeline output: full resolution
+    ((1337, 1000), (1337, 1000)),
+    ((1700, 1201), (850, 601)),      # Partial last block row/column kept
+    ((4000, 3003), (800, 601)),
+    ((640, 480), (640, 480)),
+])
+def test_preview_size(tmp_path, size, expected):
+    editor, session_id = start(tmp_path, *size)
+    preview = editor.active_sessions[session_id]['preview']
+    assert (preview.shape[1], preview.shape[0]) == expected
+    assert max(preview.shape[:2]) >= min(PREVIEW_MAX_SIZE, max(size))
+
+
+@pytest.mark.parametrize("size", [(1700, 1201), (2403, 1605)])
+def test_incremental_preview_matches_full_render(tmp_path, size):
+    editor, session_id = start(tmp_path, *size)
+    session = editor.active_sessions[session_id]
+    width, height = size
+
+    # Strokes through the interior and across the partial right/bottom edges
+    editor.apply_brush_action(session_id, "erase", [(10, 10), (300, 200)], brush_size=25)
+    editor.apply_brush_action(session_id, "erase", [(width - 1, 5), (width - 1, height - 1)], brush_size=7)
+    editor.apply_brush_action(session_id, "erase", [(0, height - 2), (width // 2, height - 1)], brush_size=9)
+    editor.undo(session_id)
+    incremental = session['preview'].copy()
+
+    editor._render_preview(session)
+    np.testing.assert_array_equal(incremental, session['preview'])
+
+
+def test_partial_edge_blocks_are_averaged(tmp_path):
+    editor = ManualImageEditor(tmp_path)
+    source = np.zeros((5, 5, 4), dtype=np.uint8)
+    source[:, 4] = 200  # Last column: a 1-pixel-wide partial block
+    source[4, :4] = 100  # Last row: a 1-pixel-high partial block
+
+    result = editor._box_average(source, 2)
+    assert result.shape == (3, 3, 4)
+    assert (result[:2, :2] == 0).all()
+    assert (result[:, 2] == 200).all()
+    assert (result[2, :2] == 100).all()
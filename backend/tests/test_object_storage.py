@@ -0,0 +1,384 @@
+"""
+Object storage drivers: LocalObjectStorage directly, S3ObjectStorage against
+an S3-compatible stand-in
+
+The S3 tests use the endpoint in S3_TEST_ENDPOINT_URL (e.g. a local MinIO,
+with S3_TEST_BUCKET / S3_TEST_ACCESS_KEY_ID / S3_TEST_SECRET_ACCESS_KEY),
+or an in-process moto server when that is not set.
+"""
+import os
+import time
+import uuid
+from pathlib import Path
+from urllib.parse import parse_qs, unquote, urlparse
+
+import pytest
+
+from app.services import object_storage as object_storage_module
+from app.services.object_storage import (
+    LOCAL_SIGNED_URL_PATH,
+    MULTIPART_PART_SIZE,
+    LocalObjectStorage,
+    ObjectNotFoundError,
+    create_object_storage,
+    publish_job_results,
+)
+
+BAD_KEYS = ["../escape.txt", "a/../../escape.txt", "a/./b", "a//b", "/", ""]
+
+
+def large_payload():
+    """Just over two parts, so write_stream has to go multipart"""
+    block = os.urandom(1024 * 1024)
+    return block * (2 * MULTIPART_PART_SIZE // len(block)) + b"tail"
+
+
+def chunked(data, size=1024 * 1024):
+    return (data[i:i + size] for i in range(0, len(data), size))
+
+
+# ---- shared behaviour --------------------------------------------------------
+
+def check_roundtrip(storage, tmp_path):
+    assert storage.write_stream("jobs/a/file.bin", chunked(b"0123456789" * 1000, 777)) == 10000
+    assert b"".join(storage.iter_bytes("jobs/a/file.bin")) == b"0123456789" * 1000
+    assert storage.stat("jobs/a/file.bin").size == 10000
+    assert storage.stat("jobs/a/missing.bin") is None
+
+    source = tmp_path / "source.txt"
+    source.write_bytes(b"hello")
+    storage.put_file("jobs/a/hello.txt", source)
+    storage.get_file("jobs/a/hello.txt", tmp_path / "copy.txt")
+    assert (tmp_path / "copy.txt").read_bytes() == b"hello"
+    assert [info.key for info in storage.list("jobs/a")] == ["jobs/a/file.bin", "jobs/a/hello.txt"]
+
+    with pytest.raises(ObjectNotFoundError):
+        b"".join(storage.iter_bytes("jobs/a/missing.bin"))
+    with pytest.raises(ObjectNotFoundError):
+        storage.get_file("jobs/a/missing.bin", tmp_path / "missing.bin")
+
+    assert storage.delete_prefix("jobs/a") == 2
+    assert storage.list("jobs/a") == []
+
+
+def check_ranges(storage):
+    data = bytes(range(256)) * 40
+    storage.write_stream("ranges/data.bin", [data])
+    assert b"".join(storage.iter_bytes("ranges/data.bin", 100, 199)) == data[100:200]
+    assert b"".join(storage.iter_bytes("ranges/data.bin", 10000)) == data[10000:]
+    assert b"".join(storage.iter_bytes("ranges/data.bin", 0, 0)) == data[:1]
+    # Small chunks must not read past the end of the range
+    assert b"".join(storage.iter_bytes("ranges/data.bin", 5, 5004, chunk_size=64)) == data[5:5005]
+
+
+def check_multipart(storage):
+    data = large_payload()
+    assert storage.write_stream("big/data.bin", chunked(data)) == len(data)
+    assert storage.stat("big/data.bin").size == len(data)
+    assert b"".join(storage.iter_bytes("big/data.bin")) == data
+
+    # Explicit multipart, parts completed out of order
+    upload_id = storage.create_multipart_upload("big/parts.bin")
+    first, second = data[:MULTIPART_PART_SIZE], data[MULTIPART_PART_SIZE:MULTIPART_PART_SIZE + 10]
+    etag2 = storage.upload_part("big/parts.bin", upload_id, 2, second)
+    etag1 = storage.upload_part("big/parts.bin", upload_id, 1, first)
+    storage.complete_multipart_upload("big/parts.bin", upload_id, [(2, etag2), (1, etag1)])
+    assert b"".join(storage.iter_bytes("big/parts.bin")) == first + second
+
+
+def check_failed_stream_leaves_nothing(storage):
+    def failing():
+        yield b"x" * MULTIPART_PART_SIZE
+        yield b"y"
+        raise RuntimeError("client went away")
+
+    with pytest.raises(RuntimeError):
+        storage.write_stream("failed/data.bin", failing())
+    assert storage.stat("failed/data.bin") is None
+
+
+def check_publish(storage, tmp_path):
+    processed = tmp_path / "processed" / "job1"
+    (processed / "nested").mkdir(parents=True)
+    (processed / "a.jpg").write_bytes(b"a")
+    (processed / "nested" / "b.jpg").write_bytes(b"b")
+    published = publish_job_results("job1", processed, storage)
+    if storage.is_local:
+        assert published == 0
+    else:
+        assert published == 2
+        assert sorted(info.key for info in storage.list("processed/job1")) == [
+            "processed/job1/a.jpg", "processed/job1/nested/b.jpg"
+        ]
+
+
+# ---- local driver ---------------------------------------------------------------
+
+@pytest.fixture
+def local(tmp_path):
+    return LocalObjectStorage(tmp_path / "root", signing_key="test-key", base_url="http://api.test/")
+
+
+def test_local_roundtrip(local, tmp_path):
+    check_roundtrip(local, tmp_path)
+
+
+def test_local_ranges(local):
+    check_ranges(local)
+
+
+def test_local_multipart(local):
+    check_multipart(local)
+    assert not any((local.root / ".multipart").iterdir())
+
+
+def test_local_failed_stream_leaves_nothing(local):
+    check_failed_stream_leaves_nothing(local)
+    assert not list((local.root / "failed").iterdir())
+
+
+def test_local_publish_is_noop(local, tmp_path):
+    check_publish(local, tmp_path)
+
+
+def test_local_missing_multipart_part(local):
+    upload_id = local.create_multipart_upload("big/parts.bin")
+    etag = local.upload_part("big/parts.bin", upload_id, 1, b"one")
+    with pytest.raises(ObjectNotFoundError):
+        local.complete_multipart_upload("big/parts.bin", upload_id, [(1, etag), (2, "missing")])
+    with pytest.raises(ValueError):
+        local.upload_part("big/parts.bin", "../escape", 1, b"x")
+
+
+@pytest.mark.parametrize("key", BAD_KEYS)
+def test_local_rejects_traversal(local, key):
+    with pytest.raises(ValueError):
+        local.path_for(key)
+    with pytest.raises(ValueError):
+        local.write_stream(key, [b"x"])
+    with pytest.raises(ValueError):
+        local.presigned_url(key)
+    assert not (local.root.parent / "escape.txt").exists()
+
+
+def signed_params(url):
+    parsed = urlparse(url)
+    assert parsed.path.startswith(LOCAL_SIGNED_URL_PATH + "/")
+    key = unquote(parsed.path[len(LOCAL_SIGNED_URL_PATH) + 1:])
+    query = {name: values[0] for name, values in parse_qs(parsed.query).items()}
+    return key, int(query["expires"]), query["signature"], query.get("filename")
+
+
+def test_local_signed_urls(local):
+    url = local.presigned_url("processed/job1/results.zip", filename="results.zip")
+    assert url.startswith("http://api.test" + LOCAL_SIGNED_URL_PATH)
+    key, expires, signature, filename = signed_params(url)
+    assert key == "processed/job1/results.zip" and filename == "results.zip"
+    assert local.verify_signature(key, expires, signature, filename)
+
+    # Tampered key, expiry, signature or filename
+    assert not local.verify_signature("processed/job2/results.zip", expires, signature, filename)
+    assert not local.verify_signature(key, expires + 1, signature, filename)
+    assert not local.verify_signature(key, expires, "0" * len(signature), filename)
+    assert not local.verify_signature(key, expires, signature, "other.zip")
+
+    # Another key (another worker without the shared key) rejects it
+    other = LocalObjectStorage(local.root, signing_key="other-key")
+    assert not other.verify_signature(key, expires, signature, filename)
+
+    # Expired
+    expired_url = local.presigned_url("processed/job1/results.zip", expires_seconds=-1)
+    key, expires, signature, filename = signed_params(expired_url)
+    assert not local.verify_signature(key, expires, signature, filename)
+    assert expires < time.time()
+
+
+def test_local_results_root(tmp_path):
+    """As configured by default: rooted at the processed directory, only `processed/` keys"""
+    processed = tmp_path / "processed"
+    (processed / "job1").mkdir(parents=True)
+    (processed / "job1" / "a.jpg").write_bytes(b"a")
+    (tmp_path / "server.py").write_text("# not a result")
+    storage = LocalObjectStorage(processed, signing_key="test-key", key_prefix="processed")
+
+    assert storage.path_for("processed/job1/a.jpg") == processed / "job1" / "a.jpg"
+    assert [info.key for info in storage.list("processed/job1")] == ["processed/job1/a.jpg"]
+    storage.write_stream("processed/job1/b.jpg", [b"b"])
+    assert (processed / "job1" / "b.jpg").read_bytes() == b"b"
+
+    for key in ("server.py", "uploads/job1/a.jpg", "processed", "processedx/a.jpg"):
+        with pytest.raises(ValueError):
+            storage.path_for(key)
+        with pytest.raises(ValueError):
+            storage.presigned_url(key)
+
+
+def test_local_rejects_symlink_escape(local, tmp_path):
+    secret = tmp_path / "secret.txt"
+    secret.write_text("outside the root")
+    (local.root / "job1").mkdir(parents=True)
+    os.symlink(tmp_path, local.root / "job1" / "link")
+    with pytest.raises(ValueError):
+        local.path_for("job1/link/secret.txt")
+    with pytest.raises(ValueError):
+        local.presigned_url("job1/link/secret.txt")
+
+
+# ---- S3 driver ------------------------------------------------------------------
+
+@pytest.fixture(scope="module")
+def s3_endpoint():
+    """(endpoint_url, bucket, access_key, secret_key) of an S3-compatible service"""
+    pytest.importorskip("boto3")
+    endpoint = os.getenv("S3_TEST_ENDPOINT_URL")
+    if endpoint:
+        yield (endpoint, os.getenv("S3_TEST_BUCKET", "masterpost-test"),
+               os.getenv("S3_TEST_ACCESS_KEY_ID", "minioadmin"),
+               os.getenv("S3_TEST_SECRET_ACCESS_KEY", "minioadmin"))
+        return
+
+    moto_server = pytest.importorskip("moto.server")
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    try:
+        yield f"http://{host}:{port}", "masterpost", "testing", "testing"
+    finally:
+        server.stop()
+
+
+@pytest.fixture
+def s3(s3_endpoint):
+    import boto3
+    from botocore.exceptions import ClientError
+
+    endpoint, bucket, access_key, secret_key = s3_endpoint
+    client = boto3.client("s3", endpoint_url=endpoint, region_name="us-east-1",
+                          aws_access_key_id=access_key, aws_secret_access_key=secret_key)
+    try:
+        client.create_bucket(Bucket=bucket)
+    except ClientError as e:
+        if e.response["Error"]["Code"] not in ("BucketAlreadyOwnedByYou", "BucketAlreadyExists"):
+            raise
+
+    # Each test under its own prefix, so a shared MinIO bucket stays usable
+    storage = object_storage_module.S3ObjectStorage(
+        bucket, endpoint_url=endpoint, region="us-east-1",
+        access_key=access_key, secret_key=secret_key, prefix=f"tests/{uuid.uuid4().hex}"
+    )
+    yield storage
+    for prefix in ("jobs", "ranges", "big", "failed", "processed"):
+        storage.delete_prefix(prefix)
+
+
+def test_s3_roundtrip(s3, tmp_path):
+    check_roundtrip(s3, tmp_path)
+
+
+def test_s3_ranges(s3):
+    check_ranges(s3)
+
+
+def test_s3_multipart(s3):
+    check_multipart(s3)
+
+
+def test_s3_failed_stream_aborts_upload(s3):
+    check_failed_stream_leaves_nothing(s3)
+    uploads = s3._client.list_multipart_uploads(Bucket=s3.bucket, Prefix=s3.prefix)
+    assert not uploads.get("Uploads")
+
+
+def test_s3_publish(s3, tmp_path):
+    check_publish(s3, tmp_path)
+
+
+def test_s3_presigned_url(s3):
+    import urllib.request
+
+    s3.write_stream("processed/job1/results.zip", [b"zip bytes"])
+    url = s3.presigned_url("processed/job1/results.zip", filename="results.zip")
+    with urllib.request.urlopen(url) as response:
+        assert response.read() == b"zip bytes"
+        assert 'filename="results.zip"' in response.headers["Content-Disposition"]
+
+
+@pytest.mark.parametrize("key", BAD_KEYS)
+def test_s3_rejects_traversal(s3, key):
+    with pytest.raises(ValueError):
+        s3.write_stream(key, [b"x"])
+
+
+# ---- configuration --------------------------------------------------------------
+
+def test_misconfigured_s3_fails_startup(monkeypatch, s3_endpoint):
+    endpoint, _, access_key, secret_key = s3_endpoint
+    monkeypatch.setenv("OBJECT_STORAGE", "s3")
+    monkeypatch.setenv("S3_ENDPOINT_URL", endpoint)
+    monkeypatch.setenv("S3_ACCESS_KEY_ID", access_key)
+    monkeypatch.setenv("S3_SECRET_ACCESS_KEY", secret_key)
+    monkeypatch.setenv("S3_REGION", "us-east-1")
+    monkeypatch.setenv("S3_BUCKET", f"missing-{uuid.uuid4().hex[:12]}")
+    with pytest.raises(RuntimeError, match="unavailable"):
+        create_object_storage()
+
+
+def test_unknown_backend_fails_startup(monkeypatch):
+    monkeypatch.setenv("OBJECT_STORAGE", "gcs")
+    with pytest.raises(RuntimeError, match="Unknown OBJECT_STORAGE"):
+        create_object_storage()
+
+
+def test_local_backend_from_env(monkeypatch, tmp_path):
+    monkeypatch.setenv("OBJECT_STORAGE", "local")
+    monkeypatch.setenv("LOCAL_STORAGE_ROOT", str(tmp_path))
+    monkeypatch.setenv("OBJECT_STORAGE_SIGNING_KEY", "shared-key")
+    storage = create_object_storage()
+    assert storage.is_local and storage.root == tmp_path
+
+
+def test_local_backend_defaults_to_processed(monkeypatch):
+    monkeypatch.setenv("OBJECT_STORAGE", "local")
+    monkeypatch.delenv("LOCAL_STORAGE_ROOT", raising=False)
+    monkeypatch.setenv("OBJECT_STORAGE_SIGNING_KEY", "shared-key")
+    storage = create_object_storage()
+    assert storage.root == Path("processed") and storage.key_prefix == "processed"
+    with pytest.raises(ValueError):
+        storage.path_for("server.py")
+
+
+def test_signing_key_fallback_is_logged(monkeypatch, caplog, tmp_path):
+    monkeypatch.setenv("OBJECT_STORAGE", "local")
+    monkeypatch.setenv("LOCAL_STORAGE_ROOT", str(tmp_path))
+    monkeypatch.delenv("OBJECT_STORAGE_SIGNING_KEY", raising=False)
+    monkeypatch.setenv("JWT_SECRET", "jwt-secret")
+    with caplog.at_level("ERROR", logger=object_storage_module.__name__):
+        storage = create_object_storage()
+    assert "OBJECT_STORAGE_SIGNING_KEY is not set" in caplog.text
+    assert storage._signing_key == b"jwt-secret"
+
+    caplog.clear()
+    monkeypatch.setenv("OBJECT_STORAGE_SIGNING_KEY", "dedicated")
+    with caplog.at_level("ERROR", logger=object_storage_module.__name__):
+        storage = create_object_storage()
+    assert not caplog.records and storage._signing_key == b"dedicated"
+
+
+def test_signed_route_serves_only_results(client, server_app):
+    storage = server_app.object_storage
+    job_dir = server_app.PROCESSED_DIR / "job-signed"
+    job_dir.mkdir(parents=True, exist_ok=True)
+    (job_dir / "a.jpg").write_bytes(b"result")
+
+    url = storage.presigned_url("processed/job-signed/a.jpg")
+    response = client.get(url[url.index(LOCAL_SIGNED_URL_PATH):])
+    assert response.status_code == 200 and response.content == b"result"
+
+    # Even a correctly signed key outside the results root is not served
+    Path("server_secret.txt").write_text("working directory file")
+    expires = int(time.time()) + 60
+    for key in ("server_secret.txt", "processed/../server_secret.txt"):
+        signature = storage._signature(key, expires, "")
+        response = client.get(f"{LOCAL_SIGNED_URL_PATH}/{key}", params={"expires": expires, "signature": signature})
+        assert response.status_code in (403, 404)
+        assert b"working directory" not in response.content
@@ -0,0 +1,98 @@
+"""
+Progress store: Redis round trips kept off the event loop
+"""
+import asyncio
+import time
+
+import pytest
+
+from app.services.progress_store import InMemoryProgressStore, RedisProgressStore
+from app.services.progress_stream import ProgressBroadcaster, stream_job_progress
+
+
+class SlowRedis:
+    """fakeredis client whose every command takes `delay` seconds"""
+
+    def __init__(self, client, delay):
+        self._client = client
+        self.delay = delay
+
+    def __getattr__(self, name):
+        command = getattr(self._client, name)
+
+        def slow(*args, **kwargs):
+            time.sleep(self.delay)
+            return command(*args, **kwargs)
+        return slow
+
+
+@pytest.fixture
+def redis_store(monkeypatch):
+    redis = pytest.importorskip("redis")
+    fakeredis = pytest.importorskip("fakeredis")
+    server = fakeredis.FakeServer()
+    monkeypatch.setattr(
+        redis.Redis, "from_url",
+        classmethod(lambda cls, url, **kwargs: fakeredis.FakeRedis(server=server, decode_responses=True))
+    )
+    return RedisProgressStore("redis://test")
+
+
+def test_redis_set_does_not_wait_for_redis(redis_store):
+    redis_store._client = SlowRedis(redis_store._client, delay=0.2)
+
+    started = time.monotonic()
+    for current in range(5):
+        redis_store.set("job1", {"current": current, "total": 5, "status": "processing"})
+    assert time.monotonic() - started < 0.1
+
+    redis_store.flush()
+    assert redis_store.get("job1")["current"] == 4  # Writes applied in order
+
+
+def test_redis_delete_after_pending_writes(redis_store):
+    redis_store._client = SlowRedis(redis_store._client, delay=0.05)
+    redis_store.set("job1", {"status": "processing"})
+    redis_store.delete("job1")
+    redis_store.flush()
+    assert redis_store.get("job1") is None
+    assert redis_store.list_jobs() == []
+
+
+def test_redis_list_jobs(redis_store):
+    redis_store.set("job1", {"status": "processing"})
+    redis_store.set("job2", {"status": "completed"})
+    redis_store.flush()
+    assert sorted((job["job_id"], job["status"]) for job in redis_store.list_jobs()) == [
+        ("job1", "processing"), ("job2", "completed")
+    ]
+
+
+def test_stream_polls_store_off_the_event_loop():
+    """A slow store read must not stall other coroutines (other streams, requests)"""
+    store = InMemoryProgressStore()
+    store.set("job1", {"status": "processing", "current": 1, "total": 2})
+
+    def slow_get(job_id):
+        time.sleep(0.3)
+        return store.get(job_id)
+
+    async def main():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.ensure_future(ticker())
+        stream = stream_job_progress(ProgressBroadcaster(), "job1", slow_get, store_poll_interval=0.05)
+        first = await stream.__anext__()
+        await stream.aclose()
+        ticking.cancel()
+        return first, ticks
+
+    first, ticks = asyncio.run(main())
+    assert first.startswith("event: progress")
+    assert ticks >= 10  # The loop kept running during the 0.3 s read
@@ -0,0 +1,285 @@
+"""
+Resumable uploads: chunk offsets and replay, checksums, expiry and
+finalize, on the store and through the /api/v1/uploads/sessions endpoints
+"""
+import asyncio
+import hashlib
+import io
+import json
+import os
+
+import pytest
+from PIL import Image
+
+from app.services.resumable_uploads import (
+    ChunkChecksumMismatchError,
+    ChunkOffsetMismatchError,
+    IncompleteUploadError,
+    ResumableUploadStore,
+    UploadSessionNotFoundError,
+)
+from app.services.upload_storage import UploadTooLargeError
+
+DATA = os.urandom(10000)
+CHUNKS = [(0, DATA[:4000]), (4000, DATA[4000:8000]), (8000, DATA[8000:])]
+
+
+def sha256(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+async def stream(*parts):
+    for part in parts:
+        yield part
+
+
+def put(store, session_id, offset, data, checksum=None):
+    return asyncio.run(store.write_chunk(session_id, offset, stream(data), checksum or sha256(data)))
+
+
+def expire(store, session_id):
+    session_file = store._session_file(session_id)
+    session = json.loads(session_file.read_text())
+    session["updated_at"] -= store.ttl_seconds + 1
+    session_file.write_text(json.dumps(session))
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResumableUploadStore(tmp_path / "uploads", ttl_seconds=3600)
+
+
+@pytest.fixture
+def session(store):
+    return store.create("photos/archive.zip", len(DATA), max_size=10 ** 6, sha256=sha256(DATA))
+
+
+# ---- store ----------------------------------------------------------------------
+
+def test_upload_and_complete(store, session):
+    assert session["offset"] == 0 and not session["complete"]
+    for offset, data in CHUNKS:
+        described = put(store, session["session_id"], offset, data)
+    assert described["offset"] == len(DATA) and described["complete"]
+
+    stored = asyncio.run(store.complete(session["session_id"]))
+    assert stored.path == store.upload_dir / session["job_id"] / "archive.zip"
+    assert stored.path.read_bytes() == DATA and stored.sha256 == sha256(DATA)
+    with pytest.raises(UploadSessionNotFoundError):
+        store.get(session["session_id"])
+
+
+def test_out_of_order_chunk_rejected(store, session):
+    put(store, session["session_id"], *CHUNKS[0])
+    with pytest.raises(ChunkOffsetMismatchError) as error:
+        put(store, session["session_id"], *CHUNKS[2])
+    assert error.value.expected_offset == 4000
+    assert store.describe(store.get(session["session_id"]))["offset"] == 4000
+
+
+def test_duplicate_chunk_replay(store, session):
+    """A chunk resent after a lost response is refused; the client resumes from the committed offset"""
+    put(store, session["session_id"], *CHUNKS[0])
+    put(store, session["session_id"], *CHUNKS[1])
+    with pytest.raises(ChunkOffsetMismatchError) as error:
+        put(store, session["session_id"], *CHUNKS[1])
+    assert error.value.expected_offset == 8000
+
+    put(store, session["session_id"], *CHUNKS[2])
+    assert asyncio.run(store.complete(session["session_id"])).path.read_bytes() == DATA
+
+
+def test_bad_chunk_checksum_rolls_back(store, session):
+    put(store, session["session_id"], *CHUNKS[0])
+    with pytest.raises(ChunkChecksumMismatchError):
+        put(store, session["session_id"], 4000, CHUNKS[1][1], checksum="0" * 64)
+    assert store.describe(store.get(session["session_id"]))["offset"] == 4000
+
+
+def test_broken_stream_rolls_back(store, session):
+    async def broken():
+        yield DATA[:1000]
+        raise ConnectionError("client disconnected")
+
+    with pytest.raises(ConnectionError):
+        asyncio.run(store.write_chunk(session["session_id"], 0, broken(), sha256(DATA[:1000])))
+    assert store.describe(store.get(session["session_id"]))["offset"] == 0
+
+
+def test_chunk_past_declared_size(store, session):
+    put(store, session["session_id"], 0, DATA[:9000])
+    with pytest.raises(UploadTooLargeError):
+        put(store, session["session_id"], 9000, DATA[9000:] + b"extra")
+    assert store.describe(store.get(session["session_id"]))["offset"] == 9000
+
+
+def test_chunk_over_max_chunk_size(tmp_path):
+    store = ResumableUploadStore(tmp_path / "uploads", max_chunk_size=1000)
+    session = store.create("archive.zip", len(DATA), max_size=10 ** 6)
+    with pytest.raises(UploadTooLargeError):
+        put(store, session["session_id"], 0, DATA[:1001])
+    assert store.describe(store.get(session["session_id"]))["offset"] == 0
+
+
+def test_complete_before_all_bytes(store, session):
+    put(store, session["session_id"], *CHUNKS[0])
+    with pytest.raises(IncompleteUploadError):
+        asyncio.run(store.complete(session["session_id"]))
+    assert store.describe(store.get(session["session_id"]))["offset"] == 4000  # Still resumable
+
+
+def test_complete_with_wrong_file_checksum(store):
+    session = store.create("archive.zip", len(DATA), max_size=10 ** 6, sha256="0" * 64)
+    for offset, data in CHUNKS:
+        put(store, session["session_id"], offset, data)
+    with pytest.raises(ChunkChecksumMismatchError):
+        asyncio.run(store.complete(session["session_id"]))
+    assert not (store.upload_dir / session["job_id"] / "archive.zip").exists()
+
+
+def test_expired_session(store, session):
+    put(store, session["session_id"], *CHUNKS[0])
+    part_path = store._part_path(store.get(session["session_id"]))
+    expire(store, session["session_id"])
+    assert part_path.exists()
+
+    with pytest.raises(UploadSessionNotFoundError, match="expired"):
+        put(store, session["session_id"], *CHUNKS[1])
+    assert not part_path.exists()
+    assert not (store.upload_dir / session["job_id"]).exists()
+
+
+def test_purge_expired(store, session):
+    other = store.create("other.zip", 10, max_size=100)
+    expire(store, session["session_id"])
+    assert store.purge_expired() == 1
+    with pytest.raises(UploadSessionNotFoundError):
+        store.get(session["session_id"])
+    assert store.get(other["session_id"])
+
+
+def test_session_survives_restart(store, session):
+    put(store, session["session_id"], *CHUNKS[0])
+    restarted = ResumableUploadStore(store.upload_dir)
+    assert restarted.describe(restarted.get(session["session_id"]))["offset"] == 4000
+
+
+def test_same_filename_sessions_in_one_job(store, session):
+    """Two sessions for one filename keep separate data and both files survive completion"""
+    other_data = os.urandom(len(DATA))
+    other = store.create("archive.zip", len(other_data), max_size=10 ** 6, job_id=session["job_id"])
+
+    # Interleaved chunks: a shared part file would mix both uploads
+    for offset, data in CHUNKS:
+        put(store, session["session_id"], offset, data)
+        put(store, other["session_id"], offset, other_data[offset:offset + len(data)])
+
+    first = asyncio.run(store.complete(session["session_id"]))
+    second = asyncio.run(store.complete(other["session_id"]))
+    assert first.path.name == "archive.zip" and first.path.read_bytes() == DATA
+    assert second.path.name == "archive_1.zip" and second.path.read_bytes() == other_data
+    assert sorted(p.name for p in (store.upload_dir / session["job_id"]).iterdir()) == ["archive.zip", "archive_1.zip"]
+
+
+def test_complete_never_replaces_existing_upload(store, session):
+    job_dir = store.upload_dir / session["job_id"]
+    (job_dir / "archive.zip").write_bytes(b"regular upload")
+    (job_dir / "archive_1.zip").write_bytes(b"earlier session")
+    for offset, data in CHUNKS:
+        put(store, session["session_id"], offset, data)
+
+    stored = asyncio.run(store.complete(session["session_id"]))
+    assert stored.path.name == "archive_2.zip" and stored.path.read_bytes() == DATA
+    assert (job_dir / "archive.zip").read_bytes() == b"regular upload"
+    assert (job_dir / "archive_1.zip").read_bytes() == b"earlier session"
+
+
+def test_session_without_part_name_still_resumes(store, session):
+    """Sessions saved before part files were keyed by session id"""
+    stored_session = store.get(session["session_id"])
+    old_part = store.upload_dir / session["job_id"] / "archive.zip.part"
+    store._part_path(stored_session).rename(old_part)
+    del stored_session["part_name"]
+    store._save(stored_session)
+
+    for offset, data in CHUNKS:
+        put(store, session["session_id"], offset, data)
+    assert asyncio.run(store.complete(session["session_id"])).path.read_bytes() == DATA
+    assert not old_part.exists()
+
+
+def test_large_chunk_written_in_blocks(store):
+    data = os.urandom(3 * 1024 * 1024 + 17)
+    session = store.create("big.zip", len(data), max_size=10 ** 8)
+    pieces = [data[i:i + 65536] for i in range(0, len(data), 65536)]
+    described = asyncio.run(store.write_chunk(session["session_id"], 0, stream(*pieces), sha256(data)))
+    assert described["complete"]
+    assert asyncio.run(store.complete(session["session_id"])).path.read_bytes() == data
+
+
+def test_create_validation(store):
+    with pytest.raises(UploadTooLargeError):
+        store.create("archive.zip", 101, max_size=100)
+    with pytest.raises(ValueError):
+        store.create("archive.zip", 0, max_size=100)
+    with pytest.raises(UploadSessionNotFoundError):
+        store.create("archive.zip", 10, max_size=100, job_id="not-a-uuid")
+    with pytest.raises(UploadSessionNotFoundError):
+        store.get("../../etc/passwd")
+
+
+# ---- endpoints --------------------------------------------------------------------
+
+def png_bytes():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 48), (200, 30, 30)).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def put_chunk(client, session_id, offset, data, checksum=None):
+    return client.put(
+        f"/api/v1/uploads/sessions/{session_id}", params={"offset": offset}, content=data,
+        headers={"X-Chunk-SHA256": checksum or sha256(data)}
+    )
+
+
+def test_session_endpoints(client):
+    image = png_bytes()
+    half = len(image) // 2
+    response = client.post("/api/v1/uploads/sessions", json={"filename": "red.png", "size": len(image)})
+    assert response.status_code == 200
+    session_id = response.json()["session_id"]
+
+    # Out of order: 409 with the committed offset
+    response = put_chunk(client, session_id, half, image[half:])
+    assert response.status_code == 409 and response.json()["offset"] == 0
+
+    assert put_chunk(client, session_id, 0, image[:half]).json()["offset"] == half
+
+    # Duplicate of the first chunk
+    response = put_chunk(client, session_id, 0, image[:half])
+    assert response.status_code == 409 and response.json()["offset"] == half
+
+    assert put_chunk(client, session_id, half, image[half:], checksum="0" * 64).status_code == 422
+    assert client.get(f"/api/v1/uploads/sessions/{session_id}").json()["offset"] == half
+
+    # Finalize before all bytes arrived
+    assert client.post(f"/api/v1/uploads/sessions/{session_id}/complete").status_code == 409
+
+    assert put_chunk(client, session_id, half, image[half:]).json()["complete"]
+    response = client.post(f"/api/v1/uploads/sessions/{session_id}/complete")
+    assert response.status_code == 200
+    assert response.json()["job_id"]
+    assert client.get(f"/api/v1/uploads/sessions/{session_id}").status_code == 404
+
+
+def test_session_endpoint_errors(client, server_app):
+    assert client.post("/api/v1/uploads/sessions", json={"filename": "notes.txt", "size": 10}).status_code == 400
+    assert client.post("/api/v1/uploads/sessions", json={"filename": "a.png"}).status_code == 400
+    assert client.post("/api/v1/uploads/sessions", json={"filename": "a.png", "size": 10 ** 12}).status_code == 413
+    assert client.get("/api/v1/uploads/sessions/0123456789abcdef0123456789abcdef").status_code == 404
+
+    session_id = client.post("/api/v1/uploads/sessions", json={"filename": "a.png", "size": 10}).json()["session_id"]
+    expire(server_app.resumable_uploads, session_id)
+    assert put_chunk(client, session_id, 0, b"0123456789").status_code == 404
+    assert client.post(f"/api/v1/uploads/sessions/{session_id}/complete").status_code == 404
@@ -0,0 +1,196 @@
+"""
+Storage lifecycle: TTL expiry, watermark eviction order, grace period and
+protected entries, on a fake disk whose usage is the bytes under tmp_path
+"""
+import os
+import time
+from collections import namedtuple
+
+import pytest
+
+from app.services.storage_lifecycle import StorageClass, StorageLifecycleManager
+
+Usage = namedtuple("Usage", "total used free")
+HOUR = 3600
+
+
+class FakeDisk:
+    """`total` bytes, used by whatever is stored under `root`"""
+
+    def __init__(self, root, total):
+        self.root = root
+        self.total = total
+
+    def __call__(self, path):
+        used = sum(p.stat().st_size for p in self.root.rglob("*") if p.is_file())
+        return Usage(self.total, used, self.total - used)
+
+
+def make_entry(root, name, size, age_hours):
+    """Directory `name` holding one `size`-byte file, last modified `age_hours` ago"""
+    directory = root / name
+    directory.mkdir(parents=True)
+    (directory / "data.bin").write_bytes(b"x" * size)
+    mtime = time.time() - age_hours * HOUR
+    os.utime(directory / "data.bin", (mtime, mtime))
+    os.utime(directory, (mtime, mtime))
+    return directory
+
+
+@pytest.fixture
+def dirs(tmp_path):
+    uploads, thumbs = tmp_path / "uploads", tmp_path / "thumbs"
+    uploads.mkdir()
+    thumbs.mkdir()
+    return uploads, thumbs
+
+
+def manager(classes, disk, **kwargs):
+    kwargs.setdefault("high_watermark", 0.8)
+    kwargs.setdefault("low_watermark", 0.5)
+    return StorageLifecycleManager(classes, disk_usage=disk, **kwargs)
+
+
+def test_ttl_expiry(tmp_path, dirs):
+    uploads, thumbs = dirs
+    old = make_entry(uploads, "old", 10, age_hours=25)
+    fresh = make_entry(uploads, "fresh", 10, age_hours=23)
+    kept = make_entry(thumbs, "kept", 10, age_hours=1000)
+    gc = manager(
+        [StorageClass("uploads", uploads, 24 * HOUR), StorageClass("thumbs", thumbs, 0, derived=True)],
+        FakeDisk(tmp_path, total=10 ** 6)
+    )
+
+    reclaimed = gc.run_once()
+
+    assert not old.exists() and fresh.exists()
+    assert kept.exists()  # TTL 0: only removed under disk pressure
+    assert reclaimed["ttl_entries"] == 1 and reclaimed["ttl_bytes"] == 10
+    assert reclaimed["pressure_entries"] == 0
+    assert gc.get_metrics()["by_class"]["uploads"]["ttl_entries"] == 1
+
+
+def test_ttl_counts_writes_inside_directories(tmp_path, dirs):
+    uploads, _ = dirs
+    entry = make_entry(uploads, "resumable", 10, age_hours=30)
+    (entry / "data.bin").write_bytes(b"more")  # Appending leaves the directory mtime alone
+    gc = manager([StorageClass("uploads", uploads, 24 * HOUR)], FakeDisk(tmp_path, total=10 ** 6))
+
+    gc.run_once()
+    assert entry.exists()
+
+
+def test_derived_evicted_before_originals(tmp_path, dirs):
+    uploads, thumbs = dirs
+    original_old = make_entry(uploads, "original_old", 100, age_hours=10)
+    original_new = make_entry(uploads, "original_new", 100, age_hours=5)
+    derived_new = make_entry(thumbs, "derived_new", 100, age_hours=2)
+    derived_old = make_entry(thumbs, "derived_old", 100, age_hours=8)
+    gc = manager(
+        [StorageClass("uploads", uploads, 0), StorageClass("thumbs", thumbs, 0, derived=True)],
+        # 400 of 450 bytes used (89%): three entries must go to get to 30%
+        FakeDisk(tmp_path, total=450), low_watermark=0.3, grace_seconds=HOUR
+    )
+
+    reclaimed = gc.run_once()
+
+    assert not derived_old.exists() and not derived_new.exists()
+    assert not original_old.exists()  # Oldest original goes once derived ones are gone
+    assert original_new.exists()
+    assert reclaimed["pressure_entries"] == 3 and reclaimed["pressure_bytes"] == 300
+
+
+def test_eviction_stops_at_low_watermark(tmp_path, dirs):
+    _, thumbs = dirs
+    entries = [make_entry(thumbs, f"derived_{age}", 100, age_hours=age) for age in (4, 3, 2)]
+    gc = manager([StorageClass("thumbs", thumbs, 0, derived=True)], FakeDisk(tmp_path, total=370),
+                 low_watermark=0.6, grace_seconds=HOUR)
+
+    gc.run_once()
+    assert [entry.exists() for entry in entries] == [False, True, True]  # 300 / 370 = 81%, then 200 / 370 = 54%
+
+
+def test_recent_entries_survive_pressure(tmp_path, dirs):
+    """An upload waiting for POST /process is never evicted"""
+    uploads, _ = dirs
+    old = make_entry(uploads, "old_job", 100, age_hours=3)
+    waiting = make_entry(uploads, "just_uploaded", 300, age_hours=0.1)
+    gc = manager([StorageClass("uploads", uploads, 0)], FakeDisk(tmp_path, total=400), grace_seconds=HOUR)
+
+    gc.run_once()
+    assert not old.exists()
+    assert waiting.exists()  # 75% is still over the low watermark, but within the grace period
+
+
+def test_protected_entries_are_kept(tmp_path, dirs):
+    uploads, thumbs = dirs
+    active = make_entry(uploads, "active_job", 100, age_hours=30)
+    active_thumbs = make_entry(thumbs, "active_job", 100, age_hours=30)
+    idle = make_entry(uploads, "idle_job", 100, age_hours=30)
+    gc = manager(
+        [StorageClass("uploads", uploads, 24 * HOUR), StorageClass("thumbs", thumbs, HOUR, derived=True)],
+        FakeDisk(tmp_path, total=250), grace_seconds=0,
+        is_protected=lambda path: "active_job" in path.parts
+    )
+
+    reclaimed = gc.run_once()
+
+    assert active.exists() and active_thumbs.exists()  # Past TTL and over the watermark
+    assert not idle.exists()
+    assert reclaimed["ttl_entries"] == 1 and reclaimed["pressure_entries"] == 0
+
+
+def test_pattern_and_exclude(tmp_path):
+    processed = tmp_path / "processed"
+    job = make_entry(processed, "job1", 10, age_hours=30)
+    thumbs = make_entry(job, "thumbs", 10, age_hours=30)
+    staged = make_entry(processed, "staged", 10, age_hours=30)
+    gc = manager(
+        [StorageClass("thumbnails", processed, 24 * HOUR, derived=True, pattern="*/thumbs", exclude={"staged"})],
+        FakeDisk(tmp_path, total=10 ** 6)
+    )
+
+    gc.run_once()
+    assert not thumbs.exists()
+    assert job.exists() and staged.exists()
+
+
+def test_watermarks_validated(tmp_path):
+    with pytest.raises(ValueError):
+        StorageLifecycleManager([], high_watermark=0.5, low_watermark=0.8)
+
+
+def test_protection_for_pass_is_computed_once_per_run(tmp_path, dirs):
+    uploads, _ = dirs
+    active = make_entry(uploads, "active_job", 10, age_hours=30)
+    entries = [make_entry(uploads, f"job{i}", 10, age_hours=30) for i in range(5)]
+    lookups = []
+
+    def protection():
+        lookups.append(1)  # e.g. one progress store scan
+        return lambda path: "active_job" in path.parts
+
+    gc = manager([StorageClass("uploads", uploads, 24 * HOUR)], FakeDisk(tmp_path, total=10 ** 6),
+                 protection_for_pass=protection)
+    gc.run_once()
+
+    assert len(lookups) == 1
+    assert active.exists() and not any(entry.exists() for entry in entries)
+
+
+def test_editor_uploads_are_not_derived(server_app):
+    """Manual editor source uploads (TEMP_DIR/<job_id>) are user data, never evicted first"""
+    job_dir = server_app.TEMP_DIR / "0f6d9a8e-7c1b-4f0a-9a55-2d3b8c1e4f61"
+    job_dir.mkdir(parents=True)
+    (job_dir / "photo.jpg").write_bytes(b"x")
+    try:
+        owners = [
+            storage_class for storage_class in server_app.storage_lifecycle.classes
+            if job_dir in storage_class.entries()
+        ]
+        assert [storage_class.name for storage_class in owners] == ["editor_uploads"]
+        assert not owners[0].derived
+        assert owners[0].ttl_seconds >= 24 * HOUR
+    finally:
+        (job_dir / "photo.jpg").unlink()
+        job_dir.rmdir()
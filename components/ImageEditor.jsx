@@ -144,7 +144,8 @@ const ImageEditor = ({ imageUrl, onSave, onClose }) => {
           session_id: sessionId,
           action: tool,
           coordinates: coordinates,
-          brush_size: brushSize
+          brush_size: brushSize,
+          inline_preview: true
         })
       });
 
@@ -153,7 +154,8 @@ const ImageEditor = ({ imageUrl, onSave, onClose }) => {
       }
 
       const data = await response.json();
-      setPreviewUrl(data.preview_url + `?t=${Date.now()}`);
+      // Preview comes inline: no second request for the image
+      setPreviewUrl(data.preview_data || data.preview_url + `?t=${Date.now()}`);
       setCanUndo(data.can_undo);
       setCanRedo(data.can_redo);
 
@@ -176,7 +178,8 @@ const ImageEditor = ({ imageUrl, onSave, onClose }) => {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          session_id: sessionId
+          session_id: sessionId,
+          inline_preview: true
         })
       });
 
@@ -185,7 +188,8 @@ const ImageEditor = ({ imageUrl, onSave, onClose }) => {
       }
 
       const data = await response.json();
-      setPreviewUrl(data.preview_url + `?t=${Date.now()}`);
+      // Preview comes inline: no second request for the image
+      setPreviewUrl(data.preview_data || data.preview_url + `?t=${Date.now()}`);
       setCanUndo(data.can_undo);
       setCanRedo(data.can_redo);
 
@@ -205,7 +209,8 @@ const ImageEditor = ({ imageUrl, onSave, onClose }) => {
           'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-          session_id: sessionId
+          session_id: sessionId,
+          inline_preview: true
         })
       });
 
@@ -214,7 +219,8 @@ const ImageEditor = ({ imageUrl, onSave, onClose }) => {
       }
 
       const data = await response.json();
-      setPreviewUrl(data.preview_url + `?t=${Date.now()}`);
+      // Preview comes inline: no second request for the image
+      setPreviewUrl(data.preview_data || data.preview_url + `?t=${Date.now()}`);
       setCanUndo(data.can_undo);
       setCanRedo(data.can_redo);
 
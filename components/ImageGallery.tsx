@@ -9,10 +9,20 @@ interface ProcessedImage {
   original: string
   processed: string
   path?: string
+  thumbnail_url?: string
   shadow_applied?: boolean
   shadow_type?: string | null
 }
 
+// Fixed thumbnail sizes rendered by the backend (longest edge, px)
+const THUMBNAIL_SIZES = [160, 320, 640]
+
+function thumbnailUrl(jobId: string, image: ProcessedImage, size: number): string {
+  // thumbnail_url carries the content version (?v=...), which makes it cacheable long-term
+  const base = image.thumbnail_url || `/api/v1/thumbnail/${jobId}/${encodeURIComponent(image.processed)}`
+  return `${base}${base.includes('?') ? '&' : '?'}size=${size}`
+}
+
 interface ImageGalleryProps {
   images: ProcessedImage[]
   jobId: string
@@ -57,6 +67,7 @@ function normalizeImage(image: any): ProcessedImage {
     original: image?.original || image?.processed || image?.filename || 'unknown.jpg',
     processed: image?.processed || image?.filename || 'unknown.jpg',
     path: image?.path || image?.processed || image?.filename || 'unknown.jpg',
+    thumbnail_url: image?.thumbnail_url,
     shadow_applied: Boolean(image?.shadow_applied),
     shadow_type: image?.shadow_type || null
   };
@@ -237,9 +248,10 @@ export default function ImageGallery({
       <div className={`grid ${getGridClass()} gap-4`}>
         {visibleNormalizedImages.map((image, index) => {
           const isLoaded = loadedImages.has(index)
-          // URL encode the filename to handle spaces and special characters
-          const encodedFilename = encodeURIComponent(image.processed)
-          const imageUrl = `/api/v1/processed/${jobId}/${encodedFilename}`
+          // Grid cells get thumbnails; the lightbox and download keep the full image
+          const thumbnailSrcSet = THUMBNAIL_SIZES
+            .map((size) => `${thumbnailUrl(jobId, image, size)} ${size}w`)
+            .join(', ')
 
           return (
             <div
@@ -256,7 +268,9 @@ export default function ImageGallery({
               >
                 {isLoaded ? (
                   <img
-                    src={imageUrl}
+                    src={thumbnailUrl(jobId, image, 320)}
+                    srcSet={thumbnailSrcSet}
+                    sizes={`(max-width: 768px) ${columns === 4 ? 50 : 100}vw, ${Math.ceil(100 / columns)}vw`}
                     alt={image.original}
                     className="w-full h-full object-contain p-2 transition-transform duration-300 group-hover:scale-105"
                     loading="lazy"
@@ -2,6 +2,8 @@
 
 const API_BASE_URL = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8002';
 const API_V2_BASE_URL = process.env.NEXT_PUBLIC_API_V2_URL || 'http://localhost:8002';
+// ZIPs at least this large use resumable chunked uploads
+const RESUMABLE_UPLOAD_THRESHOLD = 20 * 1024 * 1024;
 
 interface ApiResponse<T> {
   data?: T;
@@ -195,6 +197,20 @@ class ApiClient {
     files.forEach((file) => {
       formData.append('files', file);
     });
+    // Extract archives while processing instead of before it
+    formData.append('pipelined', 'true');
+
+    return this.makeRequest<UploadResponse>('/api/v1/upload', {
+      method: 'POST',
+      body: formData,
+    });
+  }
+
+  // Adopt files already staged by /api/v1/analyze-upload (no re-upload)
+  async uploadStaged(uploadToken: string): Promise<ApiResponse<UploadResponse>> {
+    const formData = new FormData();
+    formData.append('upload_token', uploadToken);
+    formData.append('pipelined', 'true');
 
     return this.makeRequest<UploadResponse>('/api/v1/upload', {
       method: 'POST',
@@ -224,6 +240,8 @@ class ApiClient {
         })
         formData.append('files', file);
       });
+      // Extract archives while processing instead of before it
+      formData.append('pipelined', 'true');
 
       // Log FormData contents
       console.log('📦 API: FormData entries:')
@@ -299,6 +317,81 @@ class ApiClient {
     });
   }
 
+  // Resumable chunked upload: after a network failure only the missing chunks are resent.
+  // The session id is kept in localStorage, so a reload can continue the same upload.
+  async uploadResumable(
+    file: File,
+    onProgress?: (progress: number) => void,
+    maxRetries: number = 5
+  ): Promise<ApiResponse<UploadResponse>> {
+    const storageKey = `mp_upload_session_${file.name}_${file.size}_${file.lastModified}`;
+    const sha256Hex = async (data: ArrayBuffer) =>
+      Array.from(new Uint8Array(await crypto.subtle.digest('SHA-256', data)))
+        .map((b) => b.toString(16).padStart(2, '0'))
+        .join('');
+
+    // Resume an earlier session for the same file if the server still has it
+    let session: { session_id: string; offset: number; chunk_size: number } | undefined;
+    const savedSessionId = typeof window !== 'undefined' ? localStorage.getItem(storageKey) : null;
+    if (savedSessionId) {
+      const existing = await this.makeRequest<any>(`/uploads/sessions/${savedSessionId}`);
+      session = existing.data;
+    }
+    if (!session) {
+      const created = await this.makeRequest<any>('/uploads/sessions', {
+        method: 'POST',
+        body: JSON.stringify({ filename: file.name, size: file.size }),
+      });
+      if (created.error || !created.data) {
+        return { error: created.detail || created.error || 'Failed to start upload' };
+      }
+      session = created.data;
+      localStorage.setItem(storageKey, session!.session_id);
+    }
+
+    const sessionUrl = `/uploads/sessions/${session!.session_id}`;
+    let offset = session!.offset;
+    let failures = 0;
+
+    while (offset < file.size) {
+      const chunk = await file.slice(offset, offset + session!.chunk_size).arrayBuffer();
+      const result = await this.makeRequest<any>(`${sessionUrl}?offset=${offset}`, {
+        method: 'PUT',
+        body: chunk,
+        headers: { 'X-Chunk-SHA256': await sha256Hex(chunk) },
+      });
+
+      if (result.data) {
+        offset = result.data.offset;
+        failures = 0;
+        onProgress?.(Math.round((offset / file.size) * 100));
+        continue;
+      }
+
+      if (++failures > maxRetries) {
+        return { error: result.detail || result.error || 'Upload failed' };
+      }
+      // Back off, then ask the server how much it actually has
+      await new Promise((resolve) => setTimeout(resolve, Math.min(1000 * 2 ** failures, 15000)));
+      const status = await this.makeRequest<any>(sessionUrl);
+      if (status.error === 'HTTP 404') {
+        localStorage.removeItem(storageKey);
+        return { error: 'Upload session expired, please upload the file again' };
+      }
+      if (status.data) {
+        offset = status.data.offset;
+      }
+    }
+
+    const completed = await this.makeRequest<UploadResponse>(`${sessionUrl}/complete?pipelined=true`, {
+      method: 'POST',
+    });
+    if (completed.data) {
+      localStorage.removeItem(storageKey);
+    }
+    return completed;
+  }
+
   // Start processing with selected pipeline
   async processImages(request: ProcessRequest): Promise<ApiResponse<ProcessResponse>> {
     return this.makeRequest<ProcessResponse>('/process', {
@@ -558,13 +651,28 @@ export class ImageProcessingApi {
     files: File[],
     pipeline: 'amazon' | 'instagram' | 'ebay',
     settings?: Record<string, any>,
-    onUploadProgress?: (progress: number) => void
+    onUploadProgress?: (progress: number) => void,
+    uploadToken?: string
   ): Promise<{ jobId?: string; error?: string }> {
 
-    // Step 1: Upload files with progress tracking
-    const uploadResult = onUploadProgress
-      ? await apiClient.uploadImagesWithProgress(files, onUploadProgress)
-      : await apiClient.uploadImages(files);
+    // Step 1: Reuse the files staged during analysis, if they're still there
+    let uploadResult = uploadToken ? await apiClient.uploadStaged(uploadToken) : undefined;
+    if (uploadResult?.data) {
+      onUploadProgress?.(100);
+    } else {
+      // Large single archives go through resumable chunked upload
+      const useResumable =
+        files.length === 1 &&
+        files[0].name.toLowerCase().endsWith('.zip') &&
+        files[0].size >= RESUMABLE_UPLOAD_THRESHOLD;
+
+      // Upload files with progress tracking
+      uploadResult = useResumable
+        ? await apiClient.uploadResumable(files[0], onUploadProgress)
+        : onUploadProgress
+        ? await apiClient.uploadImagesWithProgress(files, onUploadProgress)
+        : await apiClient.uploadImages(files);
+    }
 
     if (uploadResult.error || !uploadResult.data) {
       return { error: uploadResult.error || 'Upload failed' };